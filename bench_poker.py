@@ -0,0 +1,225 @@
+"""Benchmark the hot paths of poker.py.
+
+Every benchmark replays a fixed, seeded workload and reports operations
+per second, best of --repeat runs. With --memory the bytes each kind of
+game state object holds are measured too. Results are written as JSON.
+Given a --baseline file from an earlier commit, any benchmark whose
+throughput fell, or object that grew, by more than --threshold fails the
+run with exit status 1.
+
+    python bench_poker.py --output bench.json
+    python bench_poker.py --baseline bench.json --threshold 0.15
+    python bench_poker.py --memory --only poker_hand
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from poker import (Deck, Enemy, GameStats, HeadlessPoker, Item, PokerHand, RoguelikePoker, card_views,
+                   hand_evaluator, simulate_runs)
+
+SEED = 1016
+
+def _spots(count, board_size, seed=SEED):
+    """count distinct (hole cards, board) deals"""
+    rng = random.Random(f"{seed}:{board_size}")
+    spots = set()
+    while len(spots) < count:
+        cards = rng.sample(range(52), 2 + board_size)
+        spots.add((tuple(cards[:2]), tuple(cards[2:])))
+    return sorted(spots)
+
+def _game(strength_model="equity"):
+    game = RoguelikePoker(seed=SEED)
+    game.strength_model = strength_model
+    return game
+
+def bench_poker_hand():
+    hands = [card_views(random.Random(i).sample(range(52), 5)) for i in range(2000)]
+
+    def run():
+        for cards in hands:
+            PokerHand(cards)
+    return len(hands), run
+
+def bench_get_best_hand():
+    game = _game()
+    spots = _spots(2000, 5)
+
+    def run():
+        game.hand_cache.clear()
+        for hole, board in spots:
+            game.community_cards = array('B', board)
+            game.get_best_hand(hole)
+    return len(spots), run
+
+def _bench_strength(board_sizes, count):
+    game = _game()
+    spots = [spot for size in board_sizes for spot in _spots(count, size)]
+
+    def run():
+        game.hand_cache.clear()
+        for hole, board in spots:
+            game.community_cards = array('B', board)
+            game.evaluate_hand_strength(hole)
+    return len(spots), run
+
+def bench_strength_preflop():
+    return _bench_strength((0,), 1000)
+
+def bench_strength_postflop():
+    # Flop and turn spots run Monte Carlo rollouts, river ones exact enumeration
+    return _bench_strength((3, 4, 5), 40)
+
+def bench_deck():
+    deck = Deck(random.Random(SEED))
+    dealt = array('B')
+
+    def run():
+        # A full heads-up hand: two holes, then a burn before each street
+        for _ in range(5000):
+            deck.reset()
+            del dealt[:]
+            for count in (2, 2, 1, 3, 1, 1, 1, 1):
+                deck.deal_into(dealt, count)
+    return 5000, run
+
+def bench_headless_hands():
+    hands = simulate_runs(20, seed=SEED).hands
+
+    def run():
+        simulate_runs(20, seed=SEED)
+    return hands, run
+
+BENCHMARKS = {
+    "poker_hand": bench_poker_hand,
+    "get_best_hand": bench_get_best_hand,
+    "strength_preflop": bench_strength_preflop,
+    "strength_postflop": bench_strength_postflop,
+    "deck_reset_draw": bench_deck,
+    "headless_hands": bench_headless_hands,
+}
+
+def memory_poker_hand():
+    return lambda i: hand_evaluator.best_hand(random.Random(i).sample(range(52), 7))
+
+def memory_enemy():
+    return lambda i: Enemy("Bandit", 1 + i % 10, random)
+
+def memory_item():
+    return lambda i: Item("Coin Pouch", "Grants 25 chips", "chip_bonus", 25)
+
+def memory_game_stats():
+    return lambda i: GameStats()
+
+def memory_hand_state():
+    """snapshot() of a hand in progress, on each street in turn"""
+    game = HeadlessPoker(seed=SEED)
+    enemy = game.create_enemy()
+    deals = (game.deal_flop, game.deal_turn, game.deal_river)
+
+    def make(i):
+        if i % 4 == 0:
+            game._start_hand(enemy)
+        else:
+            deals[i % 4 - 1]()
+        return game.snapshot(enemy)
+    return make
+
+# Each returns a function making the i-th object of its kind
+MEMORY_BENCHMARKS = {
+    "poker_hand": memory_poker_hand,
+    "enemy": memory_enemy,
+    "item": memory_item,
+    "game_stats": memory_game_stats,
+    "hand_state": memory_hand_state,
+}
+
+def footprint(name, count=10000):
+    """Average bytes allocated for, and kept alive by, one of count objects"""
+    make = MEMORY_BENCHMARKS[name]()
+    objects = [None] * count
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objects[i] = make(i)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size / count
+
+def run_benchmarks(names, repeat):
+    hand_evaluator.precompute()
+    results = {}
+    for name in names:
+        ops, run = BENCHMARKS[name]()
+        run()  # warm caches that live across runs, like the evaluator's rank table
+        best = min(_timed(run) for _ in range(repeat))
+        results[name] = {"ops": ops, "seconds": best, "ops_per_sec": ops / best}
+    return results
+
+def _timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+def regressions(results, baseline, threshold):
+    """(name, baseline ops/sec, current ops/sec) for each benchmark slower than allowed"""
+    slower = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before and result["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            slower.append((name, before["ops_per_sec"], result["ops_per_sec"]))
+    return slower
+
+def memory_regressions(memory, baseline, threshold):
+    """(name, baseline bytes, current bytes) for each object larger than allowed"""
+    return [(name, baseline["memory"][name], size) for name, size in memory.items()
+            if name in baseline.get("memory", {}) and size > baseline["memory"][name] * (1 + threshold)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed throughput drop against the baseline, as a fraction")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark; the best counts")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS) + [
+                            name for name in MEMORY_BENCHMARKS if name not in BENCHMARKS],
+                        help="benchmarks to run, and with --memory objects to measure; all by default")
+    parser.add_argument("--memory", action="store_true", help="also measure bytes per game state object")
+    args = parser.parse_args()
+    only = args.only or [*BENCHMARKS, *MEMORY_BENCHMARKS]
+
+    results = run_benchmarks([name for name in BENCHMARKS if name in only], args.repeat)
+    for name, result in results.items():
+        print(f"{name:<18} {result['ops_per_sec']:>14,.0f} ops/sec  "
+              f"({result['ops']:,} ops in {result['seconds']:.3f}s)")
+    memory = {name: footprint(name) for name in MEMORY_BENCHMARKS if name in only} if args.memory else {}
+    for name, size in memory.items():
+        print(f"{name:<18} {size:>14,.0f} bytes each")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "seed": SEED, "repeat": args.repeat, "results": results, "memory": memory}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = regressions(results, baseline, args.threshold)
+        for name, before, after in slower:
+            print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} ops/sec ({after / before - 1:+.1%})")
+        larger = memory_regressions(memory, baseline, args.threshold)
+        for name, before, after in larger:
+            print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} bytes ({after / before - 1:+.1%})")
+        if slower or larger:
+            sys.exit(1)
+        print(f"No benchmark fell more than {args.threshold:.0%} below the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Measure how long poker.py takes to start, against a budget.
+
+Every figure comes from fresh interpreters, best of --repeat runs. The
+first table is Python's `-X importtime` report for `import poker`, the
+modules with the most import time of their own first. The second times
+what a headless simulation needs: the import, building a HeadlessPoker
+and its first and second hands, plus building the interactive
+RoguelikePoker. If the import, the HeadlessPoker and its first hand take
+longer than --budget milliseconds together, the run exits with status 1.
+
+    python bench_startup.py
+    python bench_startup.py --budget 40 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+SEED = 1016
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter and prints a JSON object of seconds per step
+PROBE = """
+import json, time
+start = time.perf_counter()
+import poker
+steps = {"import": time.perf_counter() - start}
+start = time.perf_counter()
+game = poker.HeadlessPoker(seed=%d)
+steps["headless_init"] = time.perf_counter() - start
+for name in ("first_hand", "second_hand"):
+    start = time.perf_counter()
+    game.play_hand(game.create_enemy())
+    steps[name] = time.perf_counter() - start
+start = time.perf_counter()
+poker.RoguelikePoker(seed=%d)
+steps["interactive_init"] = time.perf_counter() - start
+print(json.dumps(steps))
+""" % (SEED, SEED)
+
+# The steps --budget covers: what a headless simulation waits for before it is playing
+BUDGET_STEPS = ("import", "headless_init", "first_hand")
+
+def _run(args, workdir):
+    # Run outside the package so RoguelikePoker reads no saved history
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_DIR, os.environ.get("PYTHONPATH")])))
+    return subprocess.run([sys.executable, *args], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True)
+
+def import_times(repeat, workdir):
+    """{module: (self seconds, cumulative seconds)}, best of repeat `-X importtime` runs"""
+    best = {}
+    for _ in range(repeat):
+        for line in _run(["-X", "importtime", "-c", "import poker"], workdir).stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue  # the column header
+            own, cumulative = int(fields[0]) / 1e6, int(fields[1]) / 1e6
+            name = fields[2].strip()
+            if name not in best or cumulative < best[name][1]:
+                best[name] = (own, cumulative)
+    return best
+
+def step_times(repeat, workdir):
+    """{step: seconds} for the steps in PROBE, each the best of repeat runs"""
+    best = {}
+    for _ in range(repeat):
+        for name, seconds in json.loads(_run(["-c", PROBE], workdir).stdout).items():
+            best[name] = min(seconds, best.get(name, seconds))
+    return best
+
+def bytecode_cached() -> bool:
+    """Whether poker.py has an up-to-date .pyc; without one every import compiles it again"""
+    from importlib.util import cache_from_source
+    source = os.path.join(PACKAGE_DIR, "poker.py")
+    try:
+        return os.path.getmtime(cache_from_source(source)) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=50.0,
+                        help="milliseconds allowed for " + ", ".join(BUDGET_STEPS) + " together")
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters started per measurement; the best counts")
+    parser.add_argument("--top", type=int, default=12, help="modules listed from the import report")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        modules = import_times(args.repeat, workdir)
+        steps = step_times(args.repeat, workdir)
+
+    print(f"{'module':<28} {'self ms':>8} {'total ms':>9}")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{name:<28} {own * 1e3:>8.2f} {cumulative * 1e3:>9.2f}")
+    print()
+    for name, seconds in steps.items():
+        print(f"{name:<28} {seconds * 1e3:>8.2f} ms")
+
+    cached = bytecode_cached()
+    if not cached:
+        print("\npoker.py has no up-to-date bytecode cache, so each import above compiled it "
+              "(is PYTHONDONTWRITEBYTECODE set?); run `python -m compileall poker.py` first")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "seed": SEED,
+                       "repeat": args.repeat, "bytecode_cached": cached, "steps": steps,
+                       "modules": {name: {"self": own, "cumulative": cumulative}
+                                   for name, (own, cumulative) in modules.items()}}, f, indent=2)
+
+    total = sum(steps[name] for name in BUDGET_STEPS) * 1e3
+    if total > args.budget:
+        print(f"\nOVER BUDGET: {' + '.join(BUDGET_STEPS)} took {total:.1f} ms, budget {args.budget:.0f} ms")
+        sys.exit(1)
+    print(f"\nReady to simulate in {total:.1f} ms, within the {args.budget:.0f} ms budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Build poker_data/preflop_equity.bin for poker.py.
+
+Runs a seeded Monte Carlo rollout for each of the 169 canonical starting
+hands against one random opponent and writes the equities in the binary
+format PreflopTable memory-maps at runtime.
+
+    python build_preflop_table.py --trials 50000
+"""
+import argparse
+import random
+import time
+
+from poker import (EquityEngine, PREFLOP_TABLE_PATH, PreflopTable,
+                   starting_hand_index, starting_hand_name)
+
+def representative_cards(index):
+    """One concrete pair of card ints for a canonical starting hand"""
+    row, col = divmod(index, 13)
+    high, low = 13 - min(row, col), 13 - max(row, col)
+    if row < col:  # suited
+        return [high - 1, low - 1]
+    return [high - 1, 13 + low - 1]
+
+def build_table(trials, seed):
+    random.seed(seed)
+    engine = EquityEngine(iterations=trials, time_budget=None, batch_size=256)
+    equities = []
+    for index in range(169):
+        cards = representative_cards(index)
+        assert starting_hand_index(*cards) == index
+        equities.append(engine.equity(cards).equity)
+    return equities
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=50000, help="rollouts per starting hand")
+    parser.add_argument("--seed", type=int, default=169)
+    parser.add_argument("--output", default=PREFLOP_TABLE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    equities = build_table(args.trials, args.seed)
+    PreflopTable.write(args.output, equities, args.trials)
+
+    ranked = sorted(range(169), key=equities.__getitem__, reverse=True)
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.1f}s")
+    print("Best:  " + ", ".join(f"{starting_hand_name(i)} {equities[i]:.3f}" for i in ranked[:5]))
+    print("Worst: " + ", ".join(f"{starting_hand_name(i)} {equities[i]:.3f}" for i in ranked[-5:]))
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,33 @@ import time
 import os
 import sys
 from enum import Enum
+from math import comb
+from array import array
+from bisect import bisect_left
 from collections import Counter
+from itertools import combinations, combinations_with_replacement
 from typing import List, Dict, Tuple, Optional
-import json
-from datetime import datetime
+import mmap
+import struct
+import zlib
+
+# NumPy only speeds up batch paths and takes longer to import than the rest
+# of the game together, so it is imported by numpy_available() on first use
+np = None
+_numpy_checked = False
+
+def numpy_available() -> bool:
+    """Import NumPy on the first call and bind it to np; False if it isn't installed"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        # Checked only once np is bound, so a caller racing warm_up() never sees False by mistake
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _numpy_checked = True
+    return np is not None
 
 # Color codes for terminal
 class Colors:
@@ -28,18 +51,71 @@ class Colors:
     CLUBS = '\033[90m'     # Black
     SPADES = '\033[90m'    # Black
 
+class Renderer:
+    """Terminal output for the interactive game.
+
+    Text is collected into a frame and reaches the terminal in one write when
+    the game pauses or waits for input. Screens are cleared with ANSI codes
+    instead of running `clear`. Every animation delay is multiplied by
+    delay_scale, and 0 turns animation off, so scripted sessions run at CPU
+    speed.
+    """
+
+    CLEAR = "\033[H\033[2J"
+
+    def __init__(self, delay_scale: float = 1.0, stream=None):
+        self.delay_scale = delay_scale
+        self.stream = stream
+        self.frame = []
+
+    def write(self, *values, sep=" ", end="\n"):
+        self.frame.append(sep.join(map(str, values)) + end)
+
+    def clear(self):
+        self.frame.append(self.CLEAR)
+
+    def flush(self):
+        stream = self.stream or sys.stdout
+        if self.frame:
+            stream.write("".join(self.frame))
+            self.frame.clear()
+        stream.flush()
+
+    def pause(self, seconds: float):
+        if self.delay_scale > 0:
+            self.flush()
+            time.sleep(seconds * self.delay_scale)
+
+    def input(self, prompt: str = "") -> str:
+        self.flush()
+        return input(prompt)
+
+    def slow_print(self, text, delay=0.03):
+        if self.delay_scale <= 0:
+            self.write(text)
+            return
+        self.flush()
+        stream = self.stream or sys.stdout
+        for char in text:
+            stream.write(char)
+            stream.flush()
+            time.sleep(delay * self.delay_scale)
+        stream.write("\n")
+
+    def animated_text(self, text, color=Colors.WHITE):
+        self.write(f"{color}{text}{Colors.END}")
+        self.pause(0.5)
+
+renderer = Renderer()
+
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    renderer.clear()
 
 def slow_print(text, delay=0.03):
-    for char in text:
-        print(char, end='', flush=True)
-        time.sleep(delay)
-    print()
+    renderer.slow_print(text, delay)
 
 def animated_text(text, color=Colors.WHITE):
-    print(f"{color}{text}{Colors.END}")
-    time.sleep(0.5)
+    renderer.animated_text(text, color)
 
 class Suit(Enum):
     HEARTS = "♥"
@@ -47,10 +123,25 @@ class Suit(Enum):
     CLUBS = "♣"
     SPADES = "♠"
 
+SUITS = list(Suit)
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+
+RANK_NAMES = {1: "A", 11: "J", 12: "Q", 13: "K"}
+
 class Card:
+    """Rendering view over an integer card (see CARD_VIEWS)"""
+    __slots__ = ("index",)
+
     def __init__(self, rank: int, suit: Suit):
-        self.rank = rank
-        self.suit = suit
+        self.index = SUIT_INDEX[suit] * 13 + rank - 1
+
+    @property
+    def rank(self) -> int:
+        return self.index % 13 + 1
+
+    @property
+    def suit(self) -> Suit:
+        return SUITS[self.index // 13]
     
     def get_color(self):
         if self.suit in [Suit.HEARTS, Suit.DIAMONDS]:
@@ -59,29 +150,77 @@ class Card:
             return Colors.CLUBS
     
     def __str__(self):
-        rank_names = {1: "A", 11: "J", 12: "Q", 13: "K"}
-        rank_str = rank_names.get(self.rank, str(self.rank))
-        color = self.get_color()
-        return f"{color}{rank_str}{self.suit.value}{Colors.END}"
+        return CARD_LABELS[self.index]
     
     def get_ascii_card(self):
-        rank_names = {1: "A", 11: "J", 12: "Q", 13: "K"}
-        rank_str = rank_names.get(self.rank, str(self.rank)).rjust(2)
-        color = self.get_color()
+        return list(CARD_ART[self.index])
+    
+    def render_label(self, colored: bool = True) -> str:
+        color, end = (self.get_color(), Colors.END) if colored else ("", "")
+        return f"{color}{RANK_NAMES.get(self.rank, str(self.rank))}{self.suit.value}{end}"
+    
+    def render_art(self, colored: bool = True) -> List[str]:
+        rank_str = RANK_NAMES.get(self.rank, str(self.rank)).rjust(2)
+        color, end = (self.get_color(), Colors.END) if colored else ("", "")
         
         return [
             "┌─────────┐",
-            f"│{color}{rank_str}{Colors.END}       │",
+            f"│{color}{rank_str}{end}       │",
             "│         │",
-            f"│    {color}{self.suit.value}{Colors.END}    │",
+            f"│    {color}{self.suit.value}{end}    │",
             "│         │",
-            f"│       {color}{rank_str}{Colors.END}│",
+            f"│       {color}{rank_str}{end}│",
             "└─────────┘"
         ]
     
     def __repr__(self):
         return str(self)
 
+# Cards are ints 0..51 encoded as suit_index * 13 + (rank - 1), the order
+# a new Deck starts in. Each suit is a 13-bit block of a
+# 52-bit hand mask, so per-suit and per-rank masks are shifts and ORs.
+# Decks, hands and boards are int buffers (array('B'), lists or NumPy
+# arrays); Card objects are only looked up from CARD_VIEWS for display.
+FULL_DECK = array('B', range(52))
+CARD_RANKS = array('B', [card % 13 + 1 for card in range(52)])
+CARD_SUITS = array('B', [card // 13 for card in range(52)])
+CARD_BITS = [1 << card for card in range(52)]
+RANK_BITS = [1 << (card % 13) for card in range(52)]
+SUIT_BLOCK = 0x1FFF
+SUIT_MASKS = [SUIT_BLOCK << (13 * suit) for suit in range(4)]
+CARD_VIEWS = tuple(Card(rank, suit) for suit in SUITS for rank in range(1, 14))
+
+# Every card's label and 7-line art, rendered once with and without color.
+# CARD_CELLS hold the art lines with the gap that follows each card in a row.
+CARD_LABELS = tuple(card.render_label() for card in CARD_VIEWS)
+CARD_LABELS_PLAIN = tuple(card.render_label(colored=False) for card in CARD_VIEWS)
+CARD_ART = tuple(tuple(card.render_art()) for card in CARD_VIEWS)
+CARD_ART_PLAIN = tuple(tuple(card.render_art(colored=False)) for card in CARD_VIEWS)
+CARD_CELLS = tuple(tuple(line + " " for line in art) for art in CARD_ART)
+CARD_CELLS_PLAIN = tuple(tuple(line + " " for line in art) for art in CARD_ART_PLAIN)
+
+def render_card_row(cards, colored: bool = True) -> str:
+    """Cards side by side as one block of text, one join per art line"""
+    cells = CARD_CELLS if colored else CARD_CELLS_PLAIN
+    return "\n".join(map("".join, zip(*[cells[card] for card in cards])))
+
+def cards_to_mask(cards) -> int:
+    mask = 0
+    for card in cards:
+        mask |= CARD_BITS[card]
+    return mask
+
+def suit_rank_mask(mask: int, suit: int) -> int:
+    """13-bit rank mask of the cards of one suit in a hand mask"""
+    return (mask >> (13 * suit)) & SUIT_BLOCK
+
+def rank_mask(mask: int) -> int:
+    """13-bit mask of the ranks present in any suit of a hand mask"""
+    return (mask | (mask >> 13) | (mask >> 26) | (mask >> 39)) & SUIT_BLOCK
+
+def card_views(cards) -> List[Card]:
+    return [CARD_VIEWS[card] for card in cards]
+
 class HandRank(Enum):
     HIGH_CARD = 1
     PAIR = 2
@@ -95,28 +234,66 @@ class HandRank(Enum):
     ROYAL_FLUSH = 10
 
 class Deck:
-    def __init__(self):
-        self.cards = []
-        self.reset()
-    
+    """One preallocated permutation of the 52 cards, shuffled as it is dealt.
+
+    Cards come off the end of the buffer. Each card dealt is one step of a
+    Fisher-Yates shuffle over the cards still below the cursor, so reset()
+    only moves the cursor back and a hand costs O(cards dealt). Whatever
+    order the last hand left behind is as good a starting permutation as
+    any other.
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self._random = self.rng.random
+        self.cards = array('B', FULL_DECK)
+        self.cursor = len(self.cards)
+
     def reset(self):
-        self.cards = [Card(rank, suit) for suit in Suit for rank in range(1, 14)]
-        self.shuffle()
-    
+        self.cursor = len(self.cards)
+
     def shuffle(self):
-        random.shuffle(self.cards)
-    
+        self.rng.shuffle(self.cards)
+        self.cursor = len(self.cards)
+
+    def __len__(self):
+        return self.cursor
+
+    def deal_into(self, target, count=1):
+        """Append the next count cards to target, an array or list"""
+        cards, random_ = self.cards, self._random
+        top = self.cursor
+        bottom = max(top - count, 0)
+        while top > bottom:
+            top -= 1
+            # Scaling a 53-bit float is biased by under 2**-47 and twice as fast as randrange
+            pick = int(random_() * (top + 1))
+            card = cards[pick]
+            cards[pick] = cards[top]
+            cards[top] = card
+            target.append(card)
+        self.cursor = top
+
     def draw(self, count=1):
-        drawn = []
-        for _ in range(min(count, len(self.cards))):
-            if self.cards:
-                drawn.append(self.cards.pop())
+        drawn = array('B')
+        self.deal_into(drawn, count)
         return drawn
 
 class PokerHand:
-    def __init__(self, cards: List[Card]):
-        self.cards = sorted(cards, key=lambda x: x.rank, reverse=True)
-        self.rank, self.value = self._evaluate()
+    """Five cards, highest rank first, and their packed score (see pack_hand_score)"""
+    __slots__ = ("cards", "score")
+
+    def __init__(self, cards: List[Card], score: Optional[int] = None):
+        self.cards = tuple(sorted(cards, key=lambda x: x.rank, reverse=True))
+        self.score = pack_hand_score(*self._evaluate()) if score is None else score
+
+    @property
+    def rank(self) -> HandRank:
+        return HandRank(self.score >> 20)
+
+    @property
+    def value(self) -> List[int]:
+        return unpack_hand_score(self.score)[1]
     
     def _evaluate(self) -> Tuple[HandRank, List[int]]:
         ranks = [card.rank for card in self.cards]
@@ -168,9 +345,7 @@ class PokerHand:
         return sorted_ranks[-1] - sorted_ranks[0] == 4
     
     def __gt__(self, other):
-        if self.rank != other.rank:
-            return self.rank.value > other.rank.value
-        return self.value > other.value
+        return self.score > other.score
     
     def get_colored_name(self):
         colors = {
@@ -191,7 +366,876 @@ class PokerHand:
     def __str__(self):
         return f"{self.get_colored_name()}: {' '.join(str(card) for card in self.cards)}"
 
+# Number of tie-break values PokerHand._evaluate returns for each rank
+HAND_VALUE_LENGTHS = {
+    HandRank.HIGH_CARD: 5,
+    HandRank.PAIR: 4,
+    HandRank.TWO_PAIR: 3,
+    HandRank.THREE_KIND: 3,
+    HandRank.STRAIGHT: 1,
+    HandRank.FLUSH: 5,
+    HandRank.FULL_HOUSE: 2,
+    HandRank.FOUR_KIND: 2,
+    HandRank.STRAIGHT_FLUSH: 1,
+    HandRank.ROYAL_FLUSH: 1
+}
+
+# Rank groups that make up the five cards of each paired hand type
+HAND_GROUP_SIZES = {
+    HandRank.HIGH_CARD: [1, 1, 1, 1, 1],
+    HandRank.PAIR: [2, 1, 1, 1],
+    HandRank.TWO_PAIR: [2, 2, 1],
+    HandRank.THREE_KIND: [3, 1, 1],
+    HandRank.FULL_HOUSE: [3, 2],
+    HandRank.FOUR_KIND: [4, 1]
+}
+
+WHEEL_MASK = (1 << 12) | 0b1111  # 13-4-3-2-1, scored as a 4-high straight
+
+def pack_hand_score(rank: HandRank, value: List[int]) -> int:
+    """Pack a (rank, value) pair into an int that orders like PokerHand.__gt__"""
+    score = rank.value
+    for i in range(5):
+        score = (score << 4) | (value[i] if i < len(value) else 0)
+    return score
+
+def unpack_hand_score(score: int) -> Tuple[HandRank, List[int]]:
+    rank = HandRank(score >> 20)
+    return rank, [(score >> (16 - 4 * i)) & 0xF for i in range(HAND_VALUE_LENGTHS[rank])]
+
+def _straight_high(rank_mask: int) -> int:
+    for high in range(13, 4, -1):
+        window = 0x1F << (high - 5)
+        if rank_mask & window == window:
+            return high
+    if rank_mask & WHEEL_MASK == WHEEL_MASK:
+        return 4
+    return 0
+
+def _top_ranks(rank_mask: int, count: int) -> List[int]:
+    ranks = []
+    for rank in range(13, 0, -1):
+        if rank_mask & (1 << (rank - 1)):
+            ranks.append(rank)
+            if len(ranks) == count:
+                break
+    return ranks
+
+def _score_rank_counts(counts: List[int]) -> int:
+    """Best non-flush score for a multiset of ranks (counts indexed by rank - 1)"""
+    present, quads, trips, pairs = [], [], [], []
+    rank_mask = 0
+    for rank in range(13, 0, -1):
+        count = counts[rank - 1]
+        if count:
+            present.append(rank)
+            rank_mask |= 1 << (rank - 1)
+            if count == 4:
+                quads.append(rank)
+            elif count == 3:
+                trips.append(rank)
+            elif count == 2:
+                pairs.append(rank)
+
+    if quads:
+        kicker = next(rank for rank in present if rank != quads[0])
+        return pack_hand_score(HandRank.FOUR_KIND, [quads[0], kicker])
+
+    if trips:
+        fillers = [rank for rank in present if rank != trips[0] and counts[rank - 1] >= 2]
+        if fillers:
+            return pack_hand_score(HandRank.FULL_HOUSE, [trips[0], fillers[0]])
+
+    high = _straight_high(rank_mask)
+    if high:
+        return pack_hand_score(HandRank.STRAIGHT, [high])
+
+    if trips:
+        kickers = [rank for rank in present if rank != trips[0]][:2]
+        return pack_hand_score(HandRank.THREE_KIND, [trips[0]] + kickers)
+
+    if len(pairs) >= 2:
+        kicker = next(rank for rank in present if rank not in pairs[:2])
+        return pack_hand_score(HandRank.TWO_PAIR, pairs[:2] + [kicker])
+
+    if pairs:
+        kickers = [rank for rank in present if rank != pairs[0]][:3]
+        return pack_hand_score(HandRank.PAIR, [pairs[0]] + kickers)
+
+    return pack_hand_score(HandRank.HIGH_CARD, present[:5])
+
+def _score_flush_mask(rank_mask: int) -> int:
+    """Best score for the ranks held in a single suit (five or more of them)"""
+    high = _straight_high(rank_mask)
+    if high == 13:
+        return pack_hand_score(HandRank.ROYAL_FLUSH, [14])
+    if high:
+        return pack_hand_score(HandRank.STRAIGHT_FLUSH, [high])
+    return pack_hand_score(HandRank.FLUSH, _top_ranks(rank_mask, 5))
+
+# Per-card weight: a base-5 digit per rank in the low 32 bits (at most four
+# cards share a rank) plus a 4-bit suit counter per suit above them.
+_CARD_WEIGHTS = [5 ** (card % 13) + (1 << (32 + 4 * (card // 13))) for card in range(52)]
+
+class HandEvaluator:
+    """Scores 5-7 integer-encoded cards without enumerating 5-card combinations.
+
+    Non-flush hands are looked up by the multiset of their ranks, flushes by
+    the 13-bit rank mask of the flush suit. The flush table is built on the
+    first flush; rank entries are filled as they are first seen, or all at
+    once with precompute().
+    """
+
+    def __init__(self):
+        self._rank_scores = {}
+        self._flush_scores = None
+
+    def _build_flush_table(self):
+        self._flush_scores = [
+            _score_flush_mask(mask) if mask.bit_count() >= 5 else 0 for mask in range(1 << 13)
+        ]
+
+    def _score_rank_key(self, key: int) -> int:
+        counts = []
+        for _ in range(13):
+            key, count = divmod(key, 5)
+            counts.append(count)
+        return _score_rank_counts(counts)
+
+    def precompute(self):
+        """Fill every 5-7 card rank entry (about 74k of them) up front"""
+        if self._flush_scores is None:
+            self._build_flush_table()
+        for total in (5, 6, 7):
+            for ranks in combinations_with_replacement(range(13), total):
+                counts = [0] * 13
+                for rank_index in ranks:
+                    counts[rank_index] += 1
+                if max(counts) <= 4:
+                    self._rank_scores[sum(5 ** r for r in ranks)] = _score_rank_counts(counts)
+
+    def score(self, cards) -> int:
+        """Packed score of the best 5-card hand among 5-7 card ints"""
+        total = sum(map(_CARD_WEIGHTS.__getitem__, cards))
+        suit_counts = total >> 32
+        # A nibble of 5 or more overflows into its high bit once 3 is added
+        if (suit_counts + 0x3333) & 0x8888:
+            if self._flush_scores is None:
+                self._build_flush_table()
+            suit = 0
+            while (suit_counts >> (4 * suit)) & 0xF < 5:
+                suit += 1
+            return self._flush_scores[suit_rank_mask(cards_to_mask(cards), suit)]
+
+        key = total & 0xFFFFFFFF
+        score = self._rank_scores.get(key)
+        if score is None:
+            score = self._rank_scores[key] = self._score_rank_key(key)
+        return score
+
+    def score_total(self, total: int, mask: int) -> int:
+        """score() for cards given as their summed _CARD_WEIGHTS and card mask.
+
+        Both sums are plain additions, so callers enumerating runouts can
+        build them up incrementally instead of re-adding every card.
+        """
+        suit_counts = total >> 32
+        if (suit_counts + 0x3333) & 0x8888:
+            if self._flush_scores is None:
+                self._build_flush_table()
+            suit = 0
+            while (suit_counts >> (4 * suit)) & 0xF < 5:
+                suit += 1
+            return self._flush_scores[suit_rank_mask(mask, suit)]
+
+        key = total & 0xFFFFFFFF
+        score = self._rank_scores.get(key)
+        if score is None:
+            score = self._rank_scores[key] = self._score_rank_key(key)
+        return score
+
+    def score_holdings(self, total: int, mask: int, holdings) -> List[int]:
+        """Scores of one shared board, given as (total, mask), completed by
+        each (total, mask) pair in holdings"""
+        # Without three of a suit on the board no holding can make a flush
+        if ((total >> 32) + 0x5555) & 0x8888:
+            score_total = self.score_total
+            return [score_total(total + pair_total, mask | pair_mask) for pair_total, pair_mask in holdings]
+        rank_scores = self._rank_scores
+        scores = []
+        for pair_total, _ in holdings:
+            key = (total + pair_total) & 0xFFFFFFFF
+            score = rank_scores.get(key)
+            if score is None:
+                score = rank_scores[key] = self._score_rank_key(key)
+            scores.append(score)
+        return scores
+
+    def evaluate(self, cards) -> Tuple[HandRank, List[int]]:
+        return unpack_hand_score(self.score(cards))
+
+    def best_five(self, cards) -> List[int]:
+        """The five card ints that make up the best hand among 5-7 cards"""
+        rank, value = self.evaluate(cards)
+
+        pool = list(cards)
+        if rank in (HandRank.FLUSH, HandRank.STRAIGHT_FLUSH, HandRank.ROYAL_FLUSH):
+            flush_suit = Counter(CARD_SUITS[card] for card in pool).most_common(1)[0][0]
+            pool = [card for card in pool if CARD_SUITS[card] == flush_suit]
+
+        if rank in (HandRank.STRAIGHT, HandRank.STRAIGHT_FLUSH, HandRank.ROYAL_FLUSH):
+            high = 13 if rank == HandRank.ROYAL_FLUSH else value[0]
+            wanted = [13, 1, 2, 3, 4] if high == 4 else list(range(high - 4, high + 1))
+            return [next(card for card in pool if CARD_RANKS[card] == r) for r in wanted]
+        if rank == HandRank.FLUSH:
+            return sorted(pool, key=CARD_RANKS.__getitem__, reverse=True)[:5]
+
+        five = []
+        for group_rank, size in zip(value, HAND_GROUP_SIZES[rank]):
+            five.extend([card for card in pool if CARD_RANKS[card] == group_rank][:size])
+        return five
+
+    def best_hand(self, cards) -> PokerHand:
+        """PokerHand for the best five cards, built from shared Card views"""
+        return PokerHand(card_views(self.best_five(cards)), self.score(cards))
+
+hand_evaluator = HandEvaluator()
+
+def warm_up():
+    """Import NumPy and fill the evaluator's tables, about half a second of
+    work that would otherwise land on the first decisions of a game"""
+    numpy_available()
+    hand_evaluator.precompute()
+
+def verify_hand_evaluator(seven_card_samples: int = 20000) -> int:
+    """Check HandEvaluator against PokerHand on every 5-card hand.
+
+    Also compares random 7-card hands against the 21-combination search.
+    Returns the number of hands checked and raises AssertionError on the
+    first mismatch.
+    """
+    checked = 0
+    for combo in combinations(range(52), 5):
+        expected = PokerHand(card_views(combo))
+        rank, value = hand_evaluator.evaluate(combo)
+        assert (rank, value) == (expected.rank, expected.value), (combo, rank, value)
+        checked += 1
+
+    for _ in range(seven_card_samples):
+        combo = random.sample(range(52), 7)
+        best = None
+        for five in combinations(combo, 5):
+            hand = PokerHand(card_views(five))
+            if best is None or hand > best:
+                best = hand
+        rank, value = hand_evaluator.evaluate(combo)
+        assert (rank, value) == (best.rank, best.value), (combo, rank, value)
+        fast_best = hand_evaluator.best_hand(combo)
+        assert (fast_best.rank, fast_best.value) == (best.rank, best.value), combo
+        checked += 1
+
+    return checked
+
+_batch_tables = None
+
+def _get_batch_tables():
+    """13-bit rank-mask lookup tables for score_batch, built on first use"""
+    global _batch_tables
+    if _batch_tables is None:
+        if hand_evaluator._flush_scores is None:
+            hand_evaluator._build_flush_table()
+        masks = range(1 << 13)
+        _batch_tables = (
+            np.array([mask.bit_count() for mask in masks], dtype=np.int64),
+            np.array([mask.bit_length() for mask in masks], dtype=np.int64),  # top rank, 0 if empty
+            np.array([_straight_high(mask) for mask in masks], dtype=np.int64),
+            np.array(hand_evaluator._flush_scores, dtype=np.int64),
+        )
+    return _batch_tables
+
+def _pack_batch(rank: HandRank, *values):
+    score = rank.value
+    for i in range(5):
+        score = (score << 4) | (values[i] if i < len(values) else 0)
+    return score
+
+def score_batch(cards, chunk_size: int = 1 << 16):
+    """Packed scores for an (N, 5..7) array of card ints, matching HandEvaluator.score.
+
+    Rank histograms, flush masks and straight masks are built column by
+    column with array operations; there is no per-hand Python loop.
+    Requires NumPy.
+    """
+    if not numpy_available():
+        raise RuntimeError("score_batch requires NumPy")
+    cards = np.asarray(cards, dtype=np.int64)
+    if len(cards) > chunk_size:
+        return np.concatenate([score_batch(cards[i:i + chunk_size], chunk_size)
+                               for i in range(0, len(cards), chunk_size)])
+
+    popcount, top, straight_high, flush_scores = _get_batch_tables()
+    rows = np.arange(len(cards))
+    ranks = cards % 13
+    suits = cards // 13
+
+    counts = np.zeros((len(cards), 13), dtype=np.int8)
+    suit_masks = np.zeros((len(cards), 4), dtype=np.int64)
+    for column in range(cards.shape[1]):
+        counts[rows, ranks[:, column]] += 1
+        suit_masks[rows, suits[:, column]] |= 1 << ranks[:, column]
+
+    rank_bits = 1 << np.arange(13, dtype=np.int64)
+    present = (counts >= 1) @ rank_bits
+    paired = (counts >= 2) @ rank_bits
+    tripled = (counts >= 3) @ rank_bits
+    quads = (counts == 4) @ rank_bits
+
+    def bit(rank):
+        return np.where(rank > 0, 1 << np.maximum(rank - 1, 0), 0)
+
+    def top_ranks(mask, count):
+        ranks_out = []
+        for _ in range(count):
+            rank = top[mask]
+            ranks_out.append(rank)
+            mask = mask & ~bit(rank)
+        return ranks_out
+
+    # Candidate scores per hand type, zero where the type isn't made
+    quad_rank = top[quads]
+    score = np.where(quads > 0, _pack_batch(HandRank.FOUR_KIND, quad_rank, top[present & ~bit(quad_rank)]), 0)
+
+    trip_rank = top[tripled]
+    filler = top[paired & ~bit(trip_rank)]
+    score = np.maximum(score, np.where((trip_rank > 0) & (filler > 0),
+                                       _pack_batch(HandRank.FULL_HOUSE, trip_rank, filler), 0))
+
+    suit_counts = popcount[suit_masks]
+    flush_masks = suit_masks[rows, suit_counts.argmax(axis=1)]
+    score = np.maximum(score, np.where(suit_counts.max(axis=1) >= 5, flush_scores[flush_masks], 0))
+
+    straight = straight_high[present]
+    score = np.maximum(score, np.where(straight > 0, _pack_batch(HandRank.STRAIGHT, straight), 0))
+
+    kickers = top_ranks(present & ~bit(trip_rank), 2)
+    score = np.maximum(score, np.where(trip_rank > 0, _pack_batch(HandRank.THREE_KIND, trip_rank, *kickers), 0))
+
+    high_pair, low_pair = top_ranks(paired, 2)
+    kicker = top[present & ~bit(high_pair) & ~bit(low_pair)]
+    score = np.maximum(score, np.where(low_pair > 0, _pack_batch(HandRank.TWO_PAIR, high_pair, low_pair, kicker), 0))
+
+    kickers = top_ranks(present & ~bit(high_pair), 3)
+    score = np.maximum(score, np.where(high_pair > 0, _pack_batch(HandRank.PAIR, high_pair, *kickers), 0))
+
+    return np.maximum(score, _pack_batch(HandRank.HIGH_CARD, *top_ranks(present, 5)))
+
+def evaluate_batch(cards) -> Tuple["np.ndarray", "np.ndarray"]:
+    """HandRank values and packed tie-break values for an (N, 5..7) array of card ints"""
+    scores = score_batch(cards)
+    return scores >> 20, scores & 0xFFFFF
+
+def verify_batch_evaluator(samples: int = 200000) -> int:
+    """Compare score_batch with PokerHand on random 5-card hands and with
+    HandEvaluator on random 6- and 7-card hands"""
+    if not numpy_available():
+        raise RuntimeError("verify_batch_evaluator requires NumPy")
+    generator = np.random.default_rng(random.getrandbits(64))
+    for size in (5, 6, 7):
+        hands = np.argsort(generator.random((samples, 52)), axis=1)[:, :size]
+        ranks, values = evaluate_batch(hands)
+        for hand, rank, value in zip(hands.tolist(), ranks.tolist(), values.tolist()):
+            if size == 5:
+                expected = PokerHand(card_views(hand)).score
+            else:
+                expected = hand_evaluator.score(hand)
+            assert (rank << 20) | value == expected, hand
+    return 3 * samples
+
+class EquityResult:
+    """Win/tie/loss probabilities of one hand against the field.
+
+    mode is "exact" when every runout and opponent holding was counted and
+    "monte_carlo" when they were sampled.
+    """
+    def __init__(self, wins: int, ties: int, losses: int, mode: str = "monte_carlo"):
+        total = max(wins + ties + losses, 1)
+        self.mode = mode
+        self.samples = wins + ties + losses
+        self.win = wins / total
+        self.tie = ties / total
+        self.loss = losses / total
+
+    @property
+    def equity(self) -> float:
+        return self.win + self.tie / 2
+
+    def __repr__(self):
+        return (f"EquityResult(win={self.win:.3f}, tie={self.tie:.3f}, loss={self.loss:.3f}, "
+                f"samples={self.samples}, mode={self.mode!r})")
+
+class EquityEngine:
+    """Monte Carlo equity from random runouts of the board and opponent hole cards.
+
+    Rollouts stop at `iterations` samples or once `time_budget` seconds have
+    passed, whichever comes first. With NumPy installed each batch is sampled
+    with Generator.permuted and scored in bulk by score_batch; otherwise
+    rows come from rng.sample and HandEvaluator.score. Only an iteration
+    bound (time_budget=None) gives results that replay exactly from a seed.
+
+    Against one opponent, spots with at most exact_threshold (runout,
+    opponent holding) states are enumerated exactly instead. By default
+    that is only the river (990 holdings): the turn (46 rivers x 990) takes
+    about 20 ms to enumerate, where sampling it takes a few.
+    """
+
+    def __init__(self, evaluator: HandEvaluator = hand_evaluator, iterations: int = 2000,
+                 time_budget: Optional[float] = 0.003, batch_size: int = 64,
+                 numpy_batch_size: int = 512, rng=None, exact_threshold: int = 1000):
+        self.rng = rng or random
+        self.exact_threshold = exact_threshold
+        self.evaluator = evaluator
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+        self.numpy_batch_size = numpy_batch_size
+
+    def _python_batches(self, hole_cards, board, unseen, missing, needed, samples):
+        score = self.evaluator.score
+        while samples > 0:
+            wins = ties = losses = 0
+            count = min(self.batch_size, samples)
+            samples -= count
+            for _ in range(count):
+                row = self.rng.sample(unseen, needed)
+                runout = board + row[:missing]
+                hero = score(hole_cards + runout)
+                villain = max(score(row[i:i + 2] + runout) for i in range(missing, needed, 2))
+                if hero > villain:
+                    wins += 1
+                elif hero == villain:
+                    ties += 1
+                else:
+                    losses += 1
+            yield wins, ties, losses
+
+    def _numpy_batches(self, hole_cards, board, unseen, missing, needed, samples):
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        size = min(self.numpy_batch_size, samples)
+        pool = np.tile(np.array(unseen, dtype=np.int64), (size, 1))
+        known_board = np.tile(np.array(board, dtype=np.int64).reshape(1, -1), (size, 1))
+        hero_hole = np.tile(np.array(hole_cards, dtype=np.int64), (size, 1))
+        while samples > 0:
+            generator.permuted(pool, axis=1, out=pool)
+            full_board = np.concatenate([known_board, pool[:, :missing]], axis=1)
+            hero = score_batch(np.concatenate([hero_hole, full_board], axis=1))
+            villain = np.max([score_batch(np.concatenate([pool[:, i:i + 2], full_board], axis=1))
+                              for i in range(missing, needed, 2)], axis=0)
+            if samples < size:  # the last batch only counts the rows still wanted
+                hero, villain = hero[:samples], villain[:samples]
+            samples -= size
+            yield int((hero > villain).sum()), int((hero == villain).sum()), int((hero < villain).sum())
+
+    def _exact_counts(self, hole_cards, board, unseen, missing) -> Tuple[int, int, int]:
+        score_total = self.evaluator.score_total
+        weights = _CARD_WEIGHTS
+        board_total = sum(weights[card] for card in board)
+        board_mask = cards_to_mask(board)
+        hole_total = sum(weights[card] for card in hole_cards)
+        hole_mask = cards_to_mask(hole_cards)
+        holdings = [(weights[a] + weights[b], CARD_BITS[a] | CARD_BITS[b]) for a, b in combinations(unseen, 2)]
+
+        wins = ties = losses = 0
+        for runout in combinations(unseen, missing):
+            runout_mask = cards_to_mask(runout)
+            total = board_total + sum(weights[card] for card in runout)
+            mask = board_mask | runout_mask
+            hero = score_total(total + hole_total, mask | hole_mask)
+            live = holdings if not runout_mask else [pair for pair in holdings if not pair[1] & runout_mask]
+            villains = self.evaluator.score_holdings(total, mask, live)
+            below = sum(villain < hero for villain in villains)
+            level = villains.count(hero)
+            wins += below
+            ties += level
+            losses += len(villains) - below - level
+        return wins, ties, losses
+
+    def exact_states(self, board_cards: int, opponents: int = 1) -> Optional[int]:
+        """Number of (runout, holding) states exact enumeration would visit, None if unsupported"""
+        if opponents != 1:
+            return None
+        unseen = 50 - board_cards
+        missing = 5 - board_cards
+        return comb(unseen, missing) * comb(unseen - missing, 2)
+
+    def equity(self, hole_cards, board=(), opponents: int = 1,
+               iterations: Optional[int] = None, time_budget: Optional[float] = None,
+               exact: Optional[bool] = None) -> EquityResult:
+        """Equity of hole_cards on board against `opponents` random hands.
+
+        exact=None enumerates whenever the spot is within exact_threshold,
+        True forces enumeration (one opponent only) and False always samples.
+        """
+        if exact is None:
+            states = self.exact_states(len(board), opponents)
+            exact = states is not None and states <= self.exact_threshold
+        if exact:
+            if opponents != 1:
+                raise ValueError("Exact enumeration supports a single opponent")
+            known_mask = cards_to_mask([*hole_cards, *board])
+            unseen = [card for card in range(52) if not known_mask & CARD_BITS[card]]
+            return EquityResult(*self._exact_counts(list(hole_cards), list(board), unseen, 5 - len(board)),
+                                mode="exact")
+
+        iterations = self.iterations if iterations is None else iterations
+        time_budget = self.time_budget if time_budget is None else time_budget
+        deadline = time.perf_counter() + time_budget if time_budget else None
+
+        hole_cards = list(hole_cards)
+        board = list(board)
+        known_mask = cards_to_mask(hole_cards + board)
+        unseen = [card for card in range(52) if not known_mask & CARD_BITS[card]]
+        missing = 5 - len(board)
+        needed = missing + 2 * opponents
+        batches = self._numpy_batches if numpy_available() else self._python_batches
+
+        wins = ties = losses = 0
+        for batch_wins, batch_ties, batch_losses in batches(hole_cards, board, unseen, missing, needed, iterations):
+            wins += batch_wins
+            ties += batch_ties
+            losses += batch_losses
+            if deadline and time.perf_counter() >= deadline:
+                break
+
+        return EquityResult(wins, ties, losses)
+
+def starting_hand_index(card_a: int, card_b: int) -> int:
+    """Index of a starting hand in the 13x13 grid of canonical hands.
+
+    Pairs sit on the diagonal, suited hands above it and offsuit hands below,
+    with the highest rank in row/column 0.
+    """
+    high, low = sorted((CARD_RANKS[card_a], CARD_RANKS[card_b]), reverse=True)
+    if CARD_SUITS[card_a] == CARD_SUITS[card_b]:
+        return (13 - high) * 13 + (13 - low)
+    return (13 - low) * 13 + (13 - high)
+
+def starting_hand_name(index: int) -> str:
+    rank_names = {**RANK_NAMES, 10: "T"}  # one letter per rank, as in CARD_CODES
+    row, col = divmod(index, 13)
+    high, low = 13 - min(row, col), 13 - max(row, col)
+    name = rank_names.get(high, str(high)) + rank_names.get(low, str(low))
+    if row == col:
+        return name
+    return name + ("s" if row < col else "o")
+
+PREFLOP_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "poker_data", "preflop_equity.bin")
+PREFLOP_MAGIC = b"PFEQ"
+PREFLOP_HEADER = struct.Struct("<4sHHI")  # magic, version, hand count, trials per hand
+
+class PreflopTable:
+    """Heads-up equity of the 169 starting hands, memory-mapped on first lookup.
+
+    The file is written by build_preflop_table.py: a PREFLOP_HEADER followed by
+    169 little-endian float32 equities in starting_hand_index order.
+    """
+
+    def __init__(self, path: str = PREFLOP_TABLE_PATH):
+        self.path = path
+        self._data = None
+        self._missing = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            self._missing = True
+            return
+        # A truncated or padded file counts as missing rather than failing mid-game
+        if len(data) != PREFLOP_HEADER.size + 4 * 169:
+            data.close()
+            self._missing = True
+            return
+        magic, version, count, _ = PREFLOP_HEADER.unpack_from(data)
+        if magic != PREFLOP_MAGIC or version != 1 or count != 169:
+            data.close()
+            self._missing = True
+            return
+        self._data = data
+
+    def available(self) -> bool:
+        if self._data is None and not self._missing:
+            self._load()
+        return self._data is not None
+
+    def equity(self, card_a: int, card_b: int) -> float:
+        if not self.available():
+            raise FileNotFoundError(self.path)
+        offset = PREFLOP_HEADER.size + 4 * starting_hand_index(card_a, card_b)
+        return struct.unpack_from("<f", self._data, offset)[0]
+
+    @staticmethod
+    def write(path: str, equities: List[float], trials: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(PREFLOP_HEADER.pack(PREFLOP_MAGIC, 1, len(equities), trials))
+            f.write(struct.pack(f"<{len(equities)}f", *equities))
+
+preflop_table = PreflopTable()
+
+STRATEGY_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "poker_data", "cfr_strategy.bin")
+STRATEGY_MAGIC = b"CFRS"
+STRATEGY_HEADER = struct.Struct("<4sHBBBI")  # magic, version, streets, buckets, bet sizes, iterations
+STRATEGY_STREETS = 4
+STRATEGY_BET_SIZES = (0.5, 1.0, 2.0)  # bets the trainer's player makes, as fractions of the pot
+STRATEGY_ACTIONS = ("fold", "call", "raise")
+CFR_ENEMY_TYPES = ("Dragon", "Lich")
+
+def street_index(board) -> int:
+    """0 preflop, 1 flop, 2 turn, 3 river"""
+    return max(len(board) - 2, 0)
+
+def strategy_strength(hole_cards, board) -> float:
+    """What StrategyTable buckets: preflop equity, then the made hand's packed score scaled below 1"""
+    if not board:
+        return heuristic_hand_strength(hole_cards, board)
+    return hand_evaluator.score([*hole_cards, *board]) / (1 << 24)
+
+def bet_size_index(pot: int, to_call: int) -> int:
+    """Nearest STRATEGY_BET_SIZES entry to a bet of to_call, where pot already includes it"""
+    ratio = to_call / max(pot - to_call, 1)
+    return bisect_left([0.71, 1.41], ratio)  # geometric midpoints of the sizes
+
+class StrategyTable:
+    """Enemy strategies from train_cfr.py, memory-mapped on first lookup.
+
+    Hands are bucketed by strategy_strength. The file is a STRATEGY_HEADER,
+    then (buckets - 1) float32 bucket edges per street, then for every (street, bucket, bet size) the enemy's answer
+    to a bet as two little-endian uint16: P(fold) and P(fold) + P(call),
+    scaled to 65535. Raise takes the rest. A decision is one bisect for the
+    bucket and one unpack.
+    """
+
+    def __init__(self, path: str = STRATEGY_TABLE_PATH):
+        self.path = path
+        self._data = None
+        self._missing = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            self._missing = True
+            return
+        if len(data) < STRATEGY_HEADER.size:
+            data.close()
+            self._missing = True
+            return
+        magic, version, streets, buckets, sizes, self.iterations = STRATEGY_HEADER.unpack_from(data)
+        # Header, bucket edges, then two uint16 per (street, bucket, bet size)
+        expected = STRATEGY_HEADER.size + 4 * streets * (buckets - 1) + 4 * streets * buckets * sizes
+        if (magic != STRATEGY_MAGIC or version != 1 or streets != STRATEGY_STREETS
+                or sizes != len(STRATEGY_BET_SIZES) or buckets < 1 or len(data) != expected):
+            data.close()
+            self._missing = True
+            return
+        self.buckets = buckets
+        edges = struct.unpack_from(f"<{streets * (buckets - 1)}f", data, STRATEGY_HEADER.size)
+        self.edges = [edges[street * (buckets - 1):(street + 1) * (buckets - 1)] for street in range(streets)]
+        self._offset = STRATEGY_HEADER.size + 4 * len(edges)
+        self._data = data
+
+    def available(self) -> bool:
+        if self._data is None and not self._missing:
+            self._load()
+        return self._data is not None
+
+    def bucket(self, street: int, strength: float) -> int:
+        return bisect_left(self.edges[street], strength)
+
+    def action(self, street: int, strength: float, pot: int, to_call: int, roll: float) -> str:
+        """Enemy answer to a bet, picked with roll in [0, 1)"""
+        if not self.available():
+            raise FileNotFoundError(self.path)
+        index = (street * self.buckets + self.bucket(street, strength)) * len(STRATEGY_BET_SIZES)
+        fold, call = struct.unpack_from("<2H", self._data, self._offset + 4 * (index + bet_size_index(pot, to_call)))
+        roll *= 65535
+        return "fold" if roll < fold else "call" if roll < call else "raise"
+
+    @staticmethod
+    def write(path: str, edges: List[List[float]], strategies: List[Tuple[float, float, float]], iterations: int):
+        """edges per street; strategies as (fold, call, raise) in (street, bucket, bet size) order"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        thresholds = []
+        for fold, call, _ in strategies:
+            thresholds.extend((round(fold * 65535), round(min(fold + call, 1.0) * 65535)))
+        with open(path, "wb") as f:
+            f.write(STRATEGY_HEADER.pack(STRATEGY_MAGIC, 1, len(edges), len(edges[0]) + 1,
+                                         len(STRATEGY_BET_SIZES), iterations))
+            f.write(struct.pack(f"<{sum(map(len, edges))}f", *(edge for street in edges for edge in street)))
+            f.write(struct.pack(f"<{len(thresholds)}H", *thresholds))
+
+strategy_table = StrategyTable()
+
+# Enemies that read the player's range (HandRange) instead of playing their own cards blind
+RANGE_AWARE_ABILITIES = ("Card Counting", "Bluff Master")
+
+# The 1326 two-card holdings, with the weight sums and masks score_holdings takes
+COMBOS = list(combinations(range(52), 2))
+COMBO_MASKS = [CARD_BITS[a] | CARD_BITS[b] for a, b in COMBOS]
+COMBO_HOLDINGS = [(_CARD_WEIGHTS[a] + _CARD_WEIGHTS[b], mask) for (a, b), mask in zip(COMBOS, COMBO_MASKS)]
+
+# How likely a holding at strength percentile p (0 weakest, 1 strongest on the
+# board) is to take each action; pressure grows with the bet relative to the pot
+RANGE_ACTION_LIKELIHOODS = {
+    "bet": lambda p, pressure: 0.2 + 0.8 * p ** (1 + pressure),
+    "raise": lambda p, pressure: 0.2 + 0.8 * p ** (1 + pressure),
+    "call": lambda p, pressure: 0.35 + 0.65 * p,
+    "check": lambda p, pressure: 1 - 0.5 * p ** 3,
+}
+
+class HandRange:
+    """Weighted range over the 1326 two-card holdings an opponent might have.
+
+    Weights start uniform (weights is None until the first update narrows
+    them). observe() queues each action with the board it
+    was taken on; before a query the queue is folded in by scaling every
+    weight by RANGE_ACTION_LIKELIHOODS at the holding's strength percentile
+    on that board: one array multiply with NumPy installed, a list
+    comprehension otherwise.
+    """
+
+    def __init__(self):
+        self._percentiles = {}
+        self.reset()
+
+    def reset(self):
+        self.weights = None
+        self.pending = []
+        # Preflop percentiles don't depend on the hand, keep them
+        self._percentiles = {b"": self._percentiles[b""]} if b"" in self._percentiles else {}
+
+    def observe(self, action: str, board, amount: int = 0, pot: int = 0):
+        if action in RANGE_ACTION_LIKELIHOODS:
+            self.pending.append((action, bytes(board), min(amount / max(pot - amount, 1), 2.0)))
+
+    def percentiles(self, board) -> List[float]:
+        """Each holding's strength percentile on board (holdings using board cards rank lowest)"""
+        key = bytes(board)
+        percentiles = self._percentiles.get(key)
+        if percentiles is None:
+            if board:
+                board_mask = cards_to_mask(board)
+                scores = hand_evaluator.score_holdings(sum(_CARD_WEIGHTS[card] for card in board), board_mask,
+                                                       COMBO_HOLDINGS)
+                strengths = [-1 if mask & board_mask else score for score, mask in zip(scores, COMBO_MASKS)]
+            else:
+                strengths = [heuristic_hand_strength(combo, ()) for combo in COMBOS]
+            ordered = sorted(strengths)
+            last = len(ordered) - 1
+            percentiles = self._percentiles[key] = [bisect_left(ordered, strength) / last for strength in strengths]
+        return percentiles
+
+    def update(self):
+        """Fold queued actions into the weights"""
+        if self.pending and self.weights is None:
+            self.weights = np.ones(len(COMBOS)) if numpy_available() else [1.0] * len(COMBOS)
+        for action, board, pressure in self.pending:
+            likelihood = RANGE_ACTION_LIKELIHOODS[action]
+            percentiles = self.percentiles(board)
+            if np is not None:
+                self.weights *= likelihood(np.asarray(percentiles), pressure)
+            else:
+                self.weights = [weight * likelihood(p, pressure) for weight, p in zip(self.weights, percentiles)]
+        self.pending.clear()
+
+    def equity(self, hole_cards, board=(), samples: int = 400, rng=None) -> EquityResult:
+        """Equity of hole_cards against the range.
+
+        On the river every live holding is counted, by weight (mode "exact").
+        Earlier, `samples` holdings are drawn in proportion to their weight,
+        each with a random runout of its own.
+        """
+        self.update()
+        rng = rng or random
+        hole_cards, board = list(hole_cards), list(board)
+        dead = cards_to_mask(hole_cards + board)
+        if self.weights is None:
+            live = [i for i, mask in enumerate(COMBO_MASKS) if not mask & dead]
+            weights = [1.0] * len(live)
+        else:
+            live = [i for i, mask in enumerate(COMBO_MASKS) if not mask & dead and self.weights[i] > 0]
+            weights = [self.weights[i] for i in live]
+        if not live:
+            return EquityResult(0, 0, 0, mode="exact")
+        board_total = sum(_CARD_WEIGHTS[card] for card in board)
+        hole_total = sum(_CARD_WEIGHTS[card] for card in hole_cards)
+        score_total = hand_evaluator.score_total
+
+        if len(board) == 5:
+            hero = score_total(board_total + hole_total, dead)
+            board_mask = cards_to_mask(board)
+            scores = hand_evaluator.score_holdings(board_total, board_mask, [COMBO_HOLDINGS[i] for i in live])
+            # Weights scaled so an unnarrowed range counts one per holding
+            scale = len(live) / sum(weights)
+            wins = sum(weight for weight, score in zip(weights, scores) if hero > score) * scale
+            ties = sum(weight for weight, score in zip(weights, scores) if hero == score) * scale
+            return EquityResult(wins, ties, len(live) - wins - ties, mode="exact")
+
+        unseen = [card for card in range(52) if not dead & CARD_BITS[card]]
+        missing = 5 - len(board)
+        wins = ties = losses = 0
+        for i in rng.choices(live, weights=weights, k=samples):
+            pair_total, pair_mask = COMBO_HOLDINGS[i]
+            runout = [card for card in rng.sample(unseen, missing + 2) if not pair_mask & CARD_BITS[card]][:missing]
+            total = board_total + sum(_CARD_WEIGHTS[card] for card in runout)
+            mask = dead | cards_to_mask(runout)
+            hero = score_total(total + hole_total, mask)
+            villain = score_total(total + pair_total, (mask & ~cards_to_mask(hole_cards)) | pair_mask)
+            if hero > villain:
+                wins += 1
+            elif hero == villain:
+                ties += 1
+            else:
+                losses += 1
+        return EquityResult(wins, ties, losses, mode="monte_carlo")
+
+class HandEvaluationCache:
+    """Memo of hand evaluations for the hand in progress.
+
+    Entries are keyed on what was asked for plus the hole cards and board, and
+    are dropped whenever cards are dealt. hits and misses keep counting across
+    hands so redundant evaluations show up in the totals.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+
+    def lookup(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def store(self, key, value):
+        self.entries[key] = value
+        return value
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
 class Item:
+    __slots__ = ("name", "description", "effect", "value", "used")
+
     def __init__(self, name: str, description: str, effect: str, value: int):
         self.name = name
         self.description = description
@@ -202,22 +1246,44 @@ class Item:
     def __str__(self):
         return f"{Colors.YELLOW}{self.name}{Colors.END}: {self.description}"
 
+# (name, description, effect, value) of every item that can drop
+ITEM_TYPES = (
+    ("Lucky Charm", "Slightly improves hand strength", "luck", 1),
+    ("Coin Pouch", "Grants 25 chips", "chip_bonus", 25),
+    ("Magic Elixir", "Restores health", "heal", 50),
+    ("Rabbit's Foot", "Major luck boost", "luck", 2),
+    ("Golden Coin", "Grants 50 chips", "chip_bonus", 50),
+    ("Phoenix Feather", "Full health restoration", "heal", 100),
+)
+
 class GameStats:
+    """Run counters, all ints so snapshots can pack them (see RoguelikePoker.snapshot)"""
+    __slots__ = ("hands_played", "hands_won", "enemies_defeated", "highest_level", "total_chips_won",
+                 "best_hand_score", "lucky_escapes", "perfect_games")
+
     def __init__(self):
         self.hands_played = 0
         self.hands_won = 0
         self.enemies_defeated = 0
         self.highest_level = 0
         self.total_chips_won = 0
-        self.best_hand = None
+        self.best_hand_score = 0  # packed score of the best showdown hand, 0 before one
         self.lucky_escapes = 0
         self.perfect_games = 0
     
     def win_rate(self):
         return (self.hands_won / self.hands_played * 100) if self.hands_played > 0 else 0
 
+    @property
+    def best_hand_rank(self) -> Optional[HandRank]:
+        return HandRank(self.best_hand_score >> 20) if self.best_hand_score else None
+
 class Enemy:
-    def __init__(self, name: str, level: int):
+    __slots__ = ("rng", "name", "level", "chips", "aggression", "bluff_rate", "special_ability", "ability_used",
+                 "strategy")
+
+    def __init__(self, name: str, level: int, rng=None):
+        self.rng = rng or random
         self.name = name
         self.level = level
         self.chips = 50 + (level * 25)
@@ -225,6 +1291,8 @@ class Enemy:
         self.bluff_rate = min(0.1 + (level * 0.05), 0.4)
         self.special_ability = self._get_special_ability()
         self.ability_used = False
+        # The top tiers answer bets from the trained strategy table when it's installed
+        self.strategy = strategy_table if enemy_type_for_level(level) in CFR_ENEMY_TYPES else None
     
     def _get_special_ability(self):
         abilities = {
@@ -320,7 +1388,10 @@ class Enemy:
         self.ability_used = True
         return self.special_ability
     
-    def decide_action(self, hand_strength: float, pot: int, to_call: int) -> str:
+    def decide_action(self, hand_strength: float, pot: int, to_call: int, street: Optional[int] = None) -> str:
+        if street is not None and to_call > 0 and self.strategy is not None and self.strategy.available():
+            return self.strategy.action(street, hand_strength, pot, to_call, self.rng.random())
+
         # Enhanced AI with more sophisticated decision making
         chip_ratio = to_call / max(self.chips, 1)
         pot_odds = to_call / (pot + to_call) if (pot + to_call) > 0 else 0
@@ -329,14 +1400,14 @@ class Enemy:
         aggression_modifier = self.aggression * (1 + self.level * 0.05)
         
         if hand_strength > 0.8:
-            if random.random() < 0.7:
+            if self.rng.random() < 0.7:
                 return "raise"
             else:
                 return "call"
         elif hand_strength > 0.6:
             if chip_ratio < 0.2 or pot_odds > hand_strength:
                 return "call" if to_call > 0 else "check"
-            elif random.random() < aggression_modifier:
+            elif self.rng.random() < aggression_modifier:
                 return "raise"
             else:
                 return "call" if to_call > 0 else "check"
@@ -345,31 +1416,48 @@ class Enemy:
                 return "check"
             elif pot_odds > hand_strength and chip_ratio < 0.1:
                 return "call"
-            elif random.random() < self.bluff_rate:
-                return "raise" if random.random() < 0.4 else "call"
+            elif self.rng.random() < self.bluff_rate:
+                return "raise" if self.rng.random() < 0.4 else "call"
             else:
                 return "fold"
         else:
-            if random.random() < self.bluff_rate * aggression_modifier:
-                return "raise" if random.random() < 0.3 else "call"
+            if self.rng.random() < self.bluff_rate * aggression_modifier:
+                return "raise" if self.rng.random() < 0.3 else "call"
             elif to_call == 0:
                 return "check"
             else:
                 return "fold"
 
-def display_cards_horizontal(cards):
+def heuristic_hand_strength(hole_cards, board) -> float:
+    """Rank-based 0..1 strength estimate; preflop it reads the equity table when present"""
+    if not board and preflop_table.available():
+        strength = preflop_table.equity(*hole_cards)
+    elif not board:
+        ranks = sorted([CARD_RANKS[card] for card in hole_cards], reverse=True)
+        if ranks[0] == ranks[1]:
+            strength = min(0.5 + (ranks[0] / 26), 0.95)
+        elif ranks[0] >= 10 or (ranks[0] >= 7 and ranks[1] >= 7):
+            strength = 0.4 + (sum(ranks) / 52)
+        else:
+            strength = 0.1 + (sum(ranks) / 78)
+    else:
+        rank, value = hand_evaluator.evaluate([*hole_cards, *board])
+        base_strength = rank.value / 10.0
+
+        if rank in [HandRank.HIGH_CARD, HandRank.PAIR]:
+            kicker_bonus = sum(value[:2]) / 52.0
+            strength = min(base_strength + kicker_bonus, 0.95)
+        else:
+            strength = min(base_strength, 0.95)
+
+    return strength
+
+def display_cards_horizontal(cards, colored: bool = True):
     """Display cards side by side"""
     if not cards:
         return
     
-    card_lines = [card.get_ascii_card() for card in cards]
-    
-    # Print each line of all cards
-    for line_idx in range(7):  # Cards are 7 lines tall
-        line = ""
-        for card_art in card_lines:
-            line += card_art[line_idx] + " "
-        print(line)
+    renderer.write(render_card_row(cards, colored))
 
 def display_title():
     title = f"""
@@ -382,7 +1470,7 @@ def display_title():
 ╚══════════════════════════════════════════════════════════════╝
 {Colors.END}
     """
-    print(title)
+    renderer.write(title)
 
 def display_level_banner(level):
     banner = f"""
@@ -392,7 +1480,7 @@ def display_level_banner(level):
     ╚═══════════════════════════════════════════════════╝
 {Colors.END}
     """
-    print(banner)
+    renderer.write(banner)
 
 def display_pot_and_chips(pot, player_chips, enemy_chips=None, enemy_name=""):
     pot_display = f"""
@@ -408,201 +1496,1181 @@ def display_pot_and_chips(pot, player_chips, enemy_chips=None, enemy_name=""):
     pot_display += f"""
 └─────────────────────────────────────────────┘{Colors.END}"""
     
-    print(pot_display)
+    renderer.write(pot_display)
 
 def display_inventory(items):
     if not items:
-        print(f"{Colors.GRAY}🎒 Inventory: Empty{Colors.END}")
+        renderer.write(f"{Colors.GRAY}🎒 Inventory: Empty{Colors.END}")
         return
     
-    print(f"{Colors.YELLOW + Colors.BOLD}🎒 INVENTORY:{Colors.END}")
+    renderer.write(f"{Colors.YELLOW + Colors.BOLD}🎒 INVENTORY:{Colors.END}")
     for i, item in enumerate(items, 1):
         status = f"{Colors.GRAY}(used){Colors.END}" if item.used else f"{Colors.GREEN}(ready){Colors.END}"
-        print(f"  {i}. {item} {status}")
+        renderer.write(f"  {i}. {item} {status}")
 
-class RoguelikePoker:
-    def __init__(self):
-        self.player_chips = 100
-        self.level = 1
-        self.victories = 0
-        self.deck = Deck()
-        self.inventory = []
-        self.stats = GameStats()
-        self.difficulty = "normal"
-        self.reset_game()
-        self.load_high_score()
-    
-    def reset_game(self):
-        self.pot = 0
-        self.player_bet = 0
-        self.enemy_bet = 0
-        self.player_hand = []
-        self.enemy_hand = []
-        self.community_cards = []
-        self.game_phase = "pre_flop"
-        self.deck.reset()
-    
-    def load_high_score(self):
-        try:
-            with open("poker_save.json", "r") as f:
-                data = json.load(f)
-                self.high_score = data.get("high_score", 0)
-                self.best_run_stats = data.get("best_run_stats", {})
-        except FileNotFoundError:
-            self.high_score = 0
-            self.best_run_stats = {}
-    
-    def save_high_score(self):
-        try:
-            data = {
-                "high_score": max(self.high_score, self.level),
-                "best_run_stats": self.best_run_stats if self.level > self.high_score else {
-                    "level": self.level,
-                    "chips": self.player_chips,
-                    "hands_won": self.stats.hands_won,
-                    "win_rate": self.stats.win_rate(),
-                    "date": datetime.now().isoformat()
-                }
-            }
-            with open("poker_save.json", "w") as f:
-                json.dump(data, f)
-        except Exception as e:
-            print(f"{Colors.RED}Could not save progress: {e}{Colors.END}")
-    
-    def add_item(self, item):
-        self.inventory.append(item)
-        animated_text(f"🎁 Found: {item.name}!", Colors.YELLOW)
-    
-    def use_item(self, item_index):
-        if 0 <= item_index < len(self.inventory):
-            item = self.inventory[item_index]
+DIFFICULTY_STARTING_CHIPS = {"easy": 150, "normal": 100, "hard": 75, "nightmare": 50}
+
+# Enemy chip and aggression scaling per difficulty (see create_enemy)
+ENEMY_DIFFICULTY_MULTIPLIERS = {"easy": 0.8, "normal": 1.0, "hard": 1.3, "nightmare": 1.6}
+
+ENEMY_TYPES = [
+    ("Bandit", 1), ("Rogue", 2), ("Mercenary", 3), ("Assassin", 4),
+    ("Warlord", 5), ("Shadow", 6), ("Vampire", 7), ("Demon", 8),
+    ("Dragon", 9), ("Lich", 10)
+]
+
+def enemy_type_for_level(level: int) -> str:
+    enemy_type = "Bandit"
+    for enemy_name, min_level in ENEMY_TYPES:
+        if level >= min_level:
+            enemy_type = enemy_name
+    return enemy_type
+
+REPLAY_PATH = "poker_replay.bin"
+REPLAY_MAGIC = b"PKRL"
+REPLAY_VERSION = 2  # 2: the deck shuffles as it deals, so version 1 games deal differently
+REPLAY_HEADER = struct.Struct("<4sBQBBI")  # magic, version, seed, difficulty, strength model, hand cap
+STRENGTH_MODELS = ["heuristic", "equity"]
+ACTION_CODES = ["check", "call", "bet", "raise", "fold", "item", "short"]
+OUTCOME_CODES = ["defeat", "victory", "quit", "stalled"]
+
+class ActionLog:
+    """Compact binary record of one game: its seed and setup, then every
+    deal, player action and enemy response, then the outcome.
+
+    Each event is a tag byte followed by its fields:
+      D count card...         cards drawn from the deck, burns included
+      P action amount         player action; amount is the bet size or item slot
+      E action amount         enemy answer to a bet
+      X outcome level chips   end of the game
+    Numbers are LEB128 varints (chips zigzag encoded), so a typical hand
+    takes a few dozen bytes.
+    """
+
+    def __init__(self, seed: int, difficulty: str = "normal", strength_model: str = "equity",
+                 max_hands_per_level: int = 0):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.strength_model = strength_model
+        self.max_hands_per_level = max_hands_per_level  # 0 when levels are never cut short
+        self.data = bytearray()
+
+    def _varint(self, value: int):
+        while value > 0x7F:
+            self.data.append(value & 0x7F | 0x80)
+            value >>= 7
+        self.data.append(value)
+
+    def deal(self, cards):
+        self.data += b"D"
+        self.data.append(len(cards))
+        self.data += bytes(cards)
+
+    def player_action(self, action: str, amount: int):
+        self.data += b"P"
+        self.data.append(ACTION_CODES.index(action))
+        self._varint(amount)
+
+    def enemy_action(self, action: str, amount: int):
+        self.data += b"E"
+        self.data.append(ACTION_CODES.index(action))
+        self._varint(amount)
+
+    def finish(self, outcome: str, level: int, chips: int):
+        self.data += b"X"
+        self.data.append(OUTCOME_CODES.index(outcome))
+        self._varint(level)
+        self._varint(chips * 2 if chips >= 0 else -chips * 2 - 1)
+
+    def events(self):
+        """Decode the log into ("deal", cards), ("player"|"enemy", action, amount)
+        and ("end", outcome, level, chips) tuples"""
+        data, pos = self.data, 0
+
+        def varint():
+            nonlocal pos
+            value = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    return value
+
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            if tag == ord("D"):
+                count = data[pos]
+                yield "deal", bytes(data[pos + 1:pos + 1 + count])
+                pos += 1 + count
+            elif tag in (ord("P"), ord("E")):
+                action = ACTION_CODES[data[pos]]
+                pos += 1
+                yield "player" if tag == ord("P") else "enemy", action, varint()
+            elif tag == ord("X"):
+                outcome = OUTCOME_CODES[data[pos]]
+                pos += 1
+                level = varint()
+                chips = varint()
+                yield "end", outcome, level, chips >> 1 if not chips & 1 else -(chips >> 1) - 1
+            else:
+                raise ValueError(f"Corrupt action log: unknown event tag {tag!r} at byte {pos - 1}")
+
+    def player_actions(self) -> List[Tuple[str, int]]:
+        return [(event[1], event[2]) for event in self.events() if event[0] == "player"]
+
+    def outcome(self) -> Optional[Tuple[str, int, int]]:
+        """(outcome, level, chips) of a finished game, None if it never ended"""
+        ends = [event[1:] for event in self.events() if event[0] == "end"]
+        return ends[-1] if ends else None
+
+    def to_bytes(self) -> bytes:
+        header = REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed,
+                                    list(DIFFICULTY_STARTING_CHIPS).index(self.difficulty),
+                                    STRENGTH_MODELS.index(self.strength_model), self.max_hands_per_level)
+        return header + bytes(self.data)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "ActionLog":
+        magic, version, seed, difficulty, strength_model, max_hands = REPLAY_HEADER.unpack_from(blob)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a poker replay file")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Replay format {version} is not supported (expected {REPLAY_VERSION})")
+        log = cls(seed, list(DIFFICULTY_STARTING_CHIPS)[difficulty], STRENGTH_MODELS[strength_model], max_hands)
+        log.data = bytearray(blob[REPLAY_HEADER.size:])
+        return log
+
+    def save(self, path: str = REPLAY_PATH):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str = REPLAY_PATH) -> "ActionLog":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+HISTORY_PATH = "poker_runs.bin"
+LEGACY_SAVE_PATH = "poker_save.json"
+HISTORY_MAGIC = b"PKRH"
+HISTORY_PREFIX = struct.Struct("<4sI")  # magic, version
+HISTORY_SLOT = struct.Struct("<QIIQQI")  # sequence, runs, high score, best run offset, end, crc32 of the rest
+HISTORY_RECORD = struct.Struct("<II")  # payload length, crc32 of the payload
+HISTORY_START = HISTORY_PREFIX.size + 2 * HISTORY_SLOT.size
+HISTORY_MAX_RUNS = 100000  # past this, compaction keeps the best run and the latest HISTORY_KEEP_RUNS
+HISTORY_KEEP_RUNS = 50000
+
+class RunHistory:
+    """Append-only file of finished runs, one JSON record each, behind a small header index.
+
+    The header holds the run count, the high score, the offset of the best
+    run and where the last complete record ends. It is kept in two
+    checksummed slots written alternately, so a header write torn by a
+    crash leaves the previous slot valid. A run is appended past the end
+    and fsynced before a header write publishes it. A crash therefore loses
+    at most that run and never touches earlier ones.
+
+    Loading the high score reads the header and one record, however long
+    the history is. compact() rewrites the file beside itself and renames
+    it into place.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self.sequence = 0
+        self.runs = 0
+        self.high_score = 0
+        self.best_offset = 0
+        self.end = HISTORY_START
+        self._read_header()
+
+    def _read_header(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(HISTORY_START)
+        except FileNotFoundError:
+            return
+        if len(header) < HISTORY_START or HISTORY_PREFIX.unpack_from(header) != (HISTORY_MAGIC, 1):
+            raise ValueError(f"{self.path} is not a run history file")
+        slots = []
+        for offset in (HISTORY_PREFIX.size, HISTORY_PREFIX.size + HISTORY_SLOT.size):
+            *fields, crc = HISTORY_SLOT.unpack_from(header, offset)
+            if zlib.crc32(header[offset:offset + HISTORY_SLOT.size - 4]) == crc:
+                slots.append(fields)
+        if slots:
+            self.sequence, self.runs, self.high_score, self.best_offset, self.end = max(slots)
+
+    def _write_header(self, f):
+        self.sequence += 1
+        body = HISTORY_SLOT.pack(self.sequence, self.runs, self.high_score, self.best_offset, self.end, 0)[:-4]
+        f.seek(HISTORY_PREFIX.size + (self.sequence % 2) * HISTORY_SLOT.size)
+        f.write(body + struct.pack("<I", zlib.crc32(body)))
+        f.flush()
+        os.fsync(f.fileno())
+
+    @staticmethod
+    def _encode(run: Dict) -> bytes:
+        import json
+        payload = json.dumps(run, separators=(",", ":")).encode()
+        return HISTORY_RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _read_record(self, f, offset: int) -> Tuple[Dict, int]:
+        import json
+        f.seek(offset)
+        length, crc = HISTORY_RECORD.unpack(f.read(HISTORY_RECORD.size))
+        payload = f.read(length)
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt run record at byte {offset} of {self.path}")
+        return json.loads(payload), offset + HISTORY_RECORD.size + length
+
+    def best_run(self) -> Dict:
+        if not self.runs:
+            return {}
+        with open(self.path, "rb") as f:
+            return self._read_record(f, self.best_offset)[0]
+
+    def append(self, run: Dict):
+        """Add a finished run; run["level"] is what the high score tracks"""
+        if not os.path.exists(self.path):
+            with open(self.path, "wb") as f:
+                f.write(HISTORY_PREFIX.pack(HISTORY_MAGIC, 1) + bytes(2 * HISTORY_SLOT.size))
+        with open(self.path, "r+b") as f:
+            record = self._encode(run)
+            f.seek(self.end)
+            f.write(record)
+            f.truncate()  # whatever a crash left past the end
+            f.flush()
+            os.fsync(f.fileno())
+            if run["level"] > self.high_score or not self.runs:
+                self.high_score, self.best_offset = run["level"], self.end
+            self.runs += 1
+            self.end += len(record)
+            self._write_header(f)
+        if self.runs > HISTORY_MAX_RUNS:
+            self.compact(HISTORY_KEEP_RUNS)
+
+    def __iter__(self):
+        """Every run, oldest first"""
+        if not self.runs:
+            return
+        with open(self.path, "rb") as f:
+            offset = HISTORY_START
+            while offset < self.end:
+                run, offset = self._read_record(f, offset)
+                yield run
+
+    def compact(self, keep: Optional[int] = None):
+        """Rewrite the history without torn tails, keeping the best run and
+        the latest `keep` runs (all of them when keep is None)"""
+        runs = list(self)
+        best = self.best_run()
+        if keep is not None and len(runs) > keep:
+            runs = runs[-keep:] if best in runs[-keep:] else [best] + runs[-keep:]
+        temp_path = self.path + ".tmp"
+        # A crashed compaction can leave a temp file behind; never read it back
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        compacted = RunHistory(temp_path)
+        with open(temp_path, "wb") as f:
+            f.write(HISTORY_PREFIX.pack(HISTORY_MAGIC, 1) + bytes(2 * HISTORY_SLOT.size))
+            for run in runs:
+                record = self._encode(run)
+                if run["level"] > compacted.high_score or not compacted.runs:
+                    compacted.high_score, compacted.best_offset = run["level"], compacted.end
+                f.write(record)
+                compacted.runs += 1
+                compacted.end += len(record)
+            compacted.sequence = self.sequence
+            compacted._write_header(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        # Make the rename itself durable
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.sequence, self.runs, self.high_score, self.best_offset, self.end = (
+            compacted.sequence, compacted.runs, compacted.high_score, compacted.best_offset, compacted.end)
+
+ANALYTICS_PATH = "poker_analytics.db"
+# Action letters in a hand's action string: player moves are upper case,
+# enemy answers lower case, and "/" marks each new street
+ACTION_LETTERS = {"check": "k", "call": "c", "bet": "b", "raise": "r", "fold": "f", "item": "i", "short": "s"}
+PLAYER_ACTION_LETTERS = {action: letter.upper() for action, letter in ACTION_LETTERS.items()}
+
+class HandDatabase:
+    """SQLite store of every run and hand outcome, with queries over them.
+
+    Hand rows and runs are buffered and written with one executemany per
+    batch_size hands, in a single short transaction. Call flush() or
+    close() to make the tail visible. Several processes can log
+    to the same file: the database runs in WAL mode, and a writer waits for
+    the lock. A bulk writer drops the secondary indexes before its first
+    batch and rebuilds them in one pass on close() or the next query, which
+    halves the cost of each insert.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            seed TEXT,
+            difficulty TEXT,
+            strength_model TEXT,
+            outcome TEXT,
+            final_level INTEGER,
+            final_chips INTEGER,
+            started TEXT
+        );
+        CREATE TABLE IF NOT EXISTS hands (
+            run_id INTEGER REFERENCES runs(id),
+            hand INTEGER,
+            level INTEGER,
+            won INTEGER,
+            player_rank INTEGER,
+            enemy_rank INTEGER,
+            pot INTEGER,
+            actions TEXT,
+            PRIMARY KEY (run_id, hand)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS enemies (
+            level INTEGER PRIMARY KEY,
+            enemy TEXT
+        );
+    """
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS hands_by_level ON hands(level, won);
+        CREATE INDEX IF NOT EXISTS hands_by_player_rank ON hands(player_rank) WHERE player_rank IS NOT NULL;
+    """
+
+    def __init__(self, path: str = ANALYTICS_PATH, batch_size: int = 2000, bulk: bool = False):
+        import sqlite3
+
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA + self.INDEXES)
+        # The enemy type follows from the level, so hands only store the level
+        self.connection.executemany("INSERT OR IGNORE INTO enemies VALUES (?, ?)",
+                                    [(level, enemy_type_for_level(level)) for level in range(1, 12)])
+        self.connection.commit()
+        self.pending = []
+        self.runs = {}
+        self.bulk = bulk
+        self.indexed = True
+
+    def start_run(self, seed: int, difficulty: str, strength_model: str) -> int:
+        # Random ids need no round trip, and processes sharing the file can't collide
+        from datetime import datetime
+        run_id = int.from_bytes(os.urandom(8), "little") >> 1
+        self.runs[run_id] = [run_id, str(seed), difficulty, strength_model, None, None, None,
+                             datetime.now().isoformat()]
+        return run_id
+
+    def finish_run(self, run_id: int, outcome: str, level: int, chips: int):
+        self.runs[run_id][4:7] = outcome, level, chips
+
+    def add_hand(self, row: Tuple):
+        """row: (run_id, hand, level, won, player_rank, enemy_rank, pot, actions); ranks are None
+        when the hand ended before a showdown"""
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending and self.bulk and self.indexed:
+            self.connection.executescript("DROP INDEX IF EXISTS hands_by_level; "
+                                          "DROP INDEX IF EXISTS hands_by_player_rank;")
+            self.indexed = False
+        if self.pending:
+            self.connection.executemany("INSERT INTO hands (run_id, hand, level, won, player_rank, enemy_rank, pot, "
+                                        "actions) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.pending.clear()
+        if self.runs:
+            # Runs still going are written now and replaced when they finish
+            self.connection.executemany("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                        list(self.runs.values()))
+            self.runs = {run_id: run for run_id, run in self.runs.items() if run[4] is None}
+        self.connection.commit()
+
+    def _ensure_indexes(self):
+        self.flush()
+        if not self.indexed:
+            self.connection.executescript(self.INDEXES)
+            self.indexed = True
+
+    def close(self):
+        self._ensure_indexes()
+        self.connection.close()
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        self._ensure_indexes()
+        return self.connection.execute(sql, params).fetchall()
+
+    def win_rate_by_level(self) -> List[Tuple[int, int, float]]:
+        """(level, hands, win rate) for every level played"""
+        return self.query("SELECT level, COUNT(*), AVG(won) FROM hands GROUP BY level ORDER BY level")
+
+    def win_rate_by_enemy(self) -> List[Tuple[str, int, float]]:
+        """(enemy type, hands, win rate), in the order enemies appear"""
+        return self.query("SELECT enemy, SUM(hands), SUM(wins) * 1.0 / SUM(hands) FROM "
+                          "(SELECT level, COUNT(*) AS hands, SUM(won) AS wins FROM hands GROUP BY level) "
+                          "JOIN enemies USING (level) GROUP BY enemy ORDER BY MIN(level)")
+
+    def hand_rank_frequency(self, enemy: bool = False) -> List[Tuple[str, int, float]]:
+        """(hand rank, showdowns, share of showdowns) for the player's or the enemy's hands"""
+        column = "enemy_rank" if enemy else "player_rank"
+        rows = self.query(f"SELECT {column}, COUNT(*) FROM hands WHERE {column} IS NOT NULL "
+                          f"GROUP BY {column} ORDER BY {column}")
+        total = sum(count for _, count in rows) or 1
+        return [(HandRank(rank).name, count, count / total) for rank, count in rows]
+
+    def run_outcomes(self) -> List[Tuple[str, int, float]]:
+        """(outcome, runs, average final level) over finished runs"""
+        return self.query("SELECT outcome, COUNT(*), AVG(final_level) FROM runs WHERE outcome IS NOT NULL "
+                          "GROUP BY outcome ORDER BY COUNT(*) DESC")
+
+    def summary(self) -> str:
+        lines = [f"{outcome:<8} runs {runs:>7,}  average level {level:.1f}"
+                 for outcome, runs, level in self.run_outcomes()]
+        lines.append("Level  Hands       Win rate")
+        lines += [f"{level:>5}  {hands:<10,}  {rate:>6.1%}" for level, hands, rate in self.win_rate_by_level()]
+        lines.append("Enemy       Hands       Win rate")
+        lines += [f"{enemy:<10}  {hands:<10,}  {rate:>6.1%}" for enemy, hands, rate in self.win_rate_by_enemy()]
+        lines.append("Showdown hand     Count       Share")
+        lines += [f"{rank.replace('_', ' ').title():<16}  {count:<10,}  {share:>6.1%}"
+                  for rank, count, share in self.hand_rank_frequency()]
+        return "\n".join(lines)
+
+HAND_HISTORY_DIR = "hand_histories"
+HAND_HISTORY_SITE = "Roguelike Poker"
+HERO = "Hero"
+CARD_CODES = tuple("A23456789TJQK"[card % 13] + "hdcs"[card // 13] for card in range(52))
+CARD_FROM_CODE = {code: card for card, code in enumerate(CARD_CODES)}
+# Action string letter -> (whether the player moved, action)
+LETTER_ACTIONS = {**{letter: (False, action) for action, letter in ACTION_LETTERS.items()},
+                  **{letter: (True, action) for action, letter in PLAYER_ACTION_LETTERS.items()}}
+RANK_TITLES = {rank.value: rank.name.replace("_", " ").title() for rank in HandRank}
+HISTORY_STREETS = ("FLOP", "TURN", "RIVER")
+HISTORY_VERBS = {"checks": "check", "calls": "call", "bets": "bet", "raises": "raise", "folds": "fold",
+                 "uses": "item", "is": "short"}
+
+def card_codes(cards) -> str:
+    return " ".join([CARD_CODES[card] for card in cards])
+
+def format_hand_history(game: "RoguelikePoker", enemy: "Enemy", won: bool, started: str) -> str:
+    """The hand just played as PokerStars-style text.
+
+    Amounts on bets and raises are what was put in on top of the call, as
+    the duel's rules count them. Player moves come from the hand's action
+    string (see ACTION_LETTERS).
+    """
+    board, enemy_name = [CARD_CODES[card] for card in game.community_cards], enemy.name
+    player_stack, enemy_stack = game.hand_start_chips
+    lines = [f"{HAND_HISTORY_SITE} Hand #{game.stats.hands_played}: Hold'em No Limit (Level {game.level}) - {started}",
+             f"Table '{game.seed:016x}' 2-max",
+             f"Seat 1: {HERO} ({player_stack} in chips)",
+             f"Seat 2: {enemy_name} ({enemy_stack} in chips)",
+             "*** HOLE CARDS ***",
+             f"Dealt to {HERO} [{card_codes(game.player_hand)}]"]
+    # Bets so far this hand, tracked as the rules do to price the player's calls
+    player_in = enemy_in = street = 0
+    append = lines.append
+    for token in game.hand_actions:
+        if token == "/":
+            if street == 0:
+                cards = f"[{' '.join(board[:3])}]"
+            else:  # the board so far, then the new card
+                cards = f"[{' '.join(board[:2 + street])}] [{board[2 + street]}]"
+            append(f"*** {HISTORY_STREETS[street]} *** {cards}")
+            street += 1
+            continue
+        player, action = LETTER_ACTIONS[token[0]]
+        amount = int(token[1:]) if len(token) > 1 else 0
+        if player:
+            name = HERO
+            if action in ("bet", "raise"):
+                player_in = enemy_in + amount
+            elif action == "call" and enemy_in > player_in:
+                amount, player_in = enemy_in - player_in, enemy_in
+            elif action == "call":
+                action = "check"
+        else:
+            name = enemy_name
+            if action == "call":
+                enemy_in = player_in
+            elif action == "raise":
+                enemy_in += amount
+        if action in ("bet", "raise", "call"):
+            append(f"{name}: {action}s {amount}")
+        elif action == "item":
+            append(f"{name}: uses {game.inventory[amount].name}")
+        elif action == "short":
+            append(f"{name}: is short of chips")
+        else:
+            append(f"{name}: {action}s")
+
+    pot = game.pot
+    if game.showdown_outcome is not None:
+        player_rank, enemy_rank = game.showdown_ranks
+        lines += ["*** SHOW DOWN ***",
+                  f"{HERO}: shows [{card_codes(game.player_hand)}] ({RANK_TITLES[player_rank]})",
+                  f"{enemy_name}: shows [{card_codes(game.enemy_hand)}] ({RANK_TITLES[enemy_rank]})"]
+        if game.showdown_outcome == "tie":
+            lines += [f"{HERO} collected {pot // 2} from pot", f"{enemy_name} collected {pot - pot // 2} from pot"]
+        else:
+            append(f"{HERO if won else enemy_name} collected {pot} from pot")
+    else:
+        append(f"{HERO if won else enemy_name} collected {pot} from pot")
+    lines += ["*** SUMMARY ***", f"Total pot {pot} | Rake 0"]
+    if board:
+        append(f"Board [{' '.join(board)}]")
+    append("")
+    return "\n".join(lines)
+
+class HandHistoryWriter:
+    """Buffered writer of hand histories into numbered files that rotate by size.
+
+    Hands collect in memory and go out in one write per buffer_size
+    characters, and a new file is started once the current one holds
+    max_bytes. File names carry the start time, process id and a random
+    tag, so concurrent writers never share a file.
+    """
+
+    def __init__(self, directory: str = HAND_HISTORY_DIR, max_bytes: int = 64 << 20, buffer_size: int = 1 << 20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.stem = f"hands-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{os.urandom(2).hex()}"
+        self.paths = []
+        self.file = None
+        self.file_bytes = 0
+        self.pending = []
+        self.pending_size = 0
+        self.stamp_second = None
+        self.stamp = ""
+
+    def timestamp(self) -> str:
+        # Formatting the time costs more than the rest of a hand; redo it once a second
+        now = int(time.time())
+        if now != self.stamp_second:
+            self.stamp_second, self.stamp = now, time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(now))
+        return self.stamp
+
+    def write(self, text: str):
+        """Queue one hand's text; hands are separated by two blank lines"""
+        self.pending.append(text)
+        self.pending.append("\n\n")
+        self.pending_size += len(text) + 2
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.directory, f"{self.stem}-{len(self.paths) + 1:04d}.txt")
+        self.file = open(path, "xb")
+        self.paths.append(path)
+        self.file_bytes = 0
+
+    def flush(self):
+        if not self.pending:
+            return
+        data = "".join(self.pending).encode()
+        self.pending.clear()
+        self.pending_size = 0
+        if self.file is None or self.file_bytes >= self.max_bytes:
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class HistoryHand:
+    """One hand read back from a hand history file"""
+
+    def __init__(self):
+        self.hand_id = 0
+        self.level = 0
+        self.started = ""
+        self.table = ""
+        self.stacks = {}  # seat name -> chips at the start of the hand
+        self.hole = []  # the hero's cards
+        self.board = []
+        self.actions = []  # (street, name, action, amount); amount is None for items
+        self.shown = {}  # name -> cards shown down
+        self.collected = {}  # name -> chips won
+        self.pot = 0
+
+    @property
+    def enemy(self) -> str:
+        return next((name for name in self.stacks if name != HERO), "")
+
+def _cards_in_brackets(text: str) -> List[int]:
+    return [CARD_FROM_CODE[code] for code in text.replace("[", " ").replace("]", " ").split()]
+
+def parse_hand_history(lines: List[str]) -> HistoryHand:
+    """A HistoryHand from the lines of one hand (see format_hand_history)"""
+    hand = HistoryHand()
+    street = "preflop"
+    for line in lines:
+        if line.startswith("*** "):
+            marker, _, rest = line[4:].partition(" ***")
+            if marker in HISTORY_STREETS:
+                street = marker.lower()
+                hand.board = _cards_in_brackets(rest)
+            elif marker == "SUMMARY":
+                street = "summary"
+        elif street == "summary":
+            if line.startswith("Total pot "):
+                hand.pot = int(line.split()[2])
+            elif line.startswith("Board "):
+                hand.board = _cards_in_brackets(line[6:])
+        elif " Hand #" in line and not hand.hand_id:
+            hand.hand_id = int(line[line.index("#") + 1:line.index(":")])
+            if "(Level " in line:
+                hand.level = int(line[line.index("(Level ") + 7:line.index(")")])
+            hand.started = line.rpartition(" - ")[2]
+        elif line.startswith("Table '"):
+            hand.table = line[7:line.index("'", 7)]
+        elif line.startswith("Seat ") and line.endswith(" in chips)"):
+            name, _, stack = line[line.index(": ") + 2:].rpartition(" (")
+            hand.stacks[name] = int(stack.split()[0])
+        elif line.startswith("Dealt to "):
+            hand.hole = _cards_in_brackets(line[line.index("["):])
+        elif " collected " in line:
+            name, _, rest = line.partition(" collected ")
+            hand.collected[name] = hand.collected.get(name, 0) + int(rest.split()[0])
+        elif ": shows [" in line:
+            name, _, rest = line.partition(": shows ")
+            hand.shown[name] = _cards_in_brackets(rest[:rest.index("]") + 1])
+        elif ": " in line:
+            name, _, rest = line.rpartition(": ")
+            words = rest.split()
+            action = HISTORY_VERBS.get(words[0], words[0])
+            amount = int(words[1]) if action in ("bet", "raise", "call") else None if action == "item" else 0
+            hand.actions.append((street, name, action, amount))
+    return hand
+
+def _history_files(paths) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".txt"))
+        else:
+            files.append(path)
+    return files
+
+def read_hand_histories(*paths: str):
+    """Yield HistoryHands one at a time from history files or directories of them.
+
+    Files are read line by line and only the current hand is held, so memory
+    use doesn't grow with the size of the archive.
+    """
+    for path in _history_files(paths):
+        with open(path, encoding="utf-8") as f:
+            lines = []
+            for line in f:
+                line = line.rstrip("\n")
+                if line:
+                    lines.append(line)
+                elif lines:
+                    yield parse_hand_history(lines)
+                    lines = []
+            if lines:
+                yield parse_hand_history(lines)
+
+def summarize_hand_histories(*paths: str) -> str:
+    """A streaming pass over history files: hands, pots won and showdowns"""
+    hands = won = showdowns = biggest = 0
+    start = time.perf_counter()
+    for hand in read_hand_histories(*paths):
+        hands += 1
+        won += HERO in hand.collected
+        showdowns += bool(hand.shown)
+        biggest = max(biggest, hand.pot)
+    elapsed = time.perf_counter() - start
+    return (f"Hands: {hands:,}  {HERO} took the pot in {won / max(hands, 1):.1%}  "
+            f"showdowns {showdowns / max(hands, 1):.1%}  biggest pot {biggest:,}\n"
+            f"Read in {elapsed:.2f}s ({hands / elapsed if elapsed > 0 else 0:,.0f} hands/sec)")
+
+def suggested_bets(to_call: int, chips: int) -> List[int]:
+    """The bet or raise sizes betting_round offers the player"""
+    return [max(10, to_call), max(25, to_call * 2), max(50, chips // 4)]
+
+class ActionAdvice:
+    """Expected chips won or lost by each betting action, from `samples` deals"""
+
+    def __init__(self, evs: Dict[str, float], samples: int, complete: bool):
+        self.evs = evs
+        self.samples = samples
+        self.complete = complete  # False when the time ran out mid-search
+
+    @property
+    def best(self) -> str:
+        return max(self.evs, key=self.evs.get)
+
+    def __str__(self):
+        best = self.best
+        return "  ".join(f"{Colors.BOLD if label == best else ''}{label} {ev:+.1f}{Colors.END}"
+                         for label, ev in self.evs.items())
+
+class BettingAdvisor:
+    """Expectimax over the player's betting actions, sampled on a worker thread.
+
+    start() copies what the player can see: hole cards, board, pot, chips,
+    what is to call and who the enemy is. A background thread then deals
+    the enemy random hole cards and a random runout, over and over, until
+    time_budget runs out. On every deal the enemy answers each suggested
+    bet the way Enemy.decide_action would, judging its strength with
+    heuristic_hand_strength (strategy_strength for the table-driven tiers).
+    If it raises, the player calls or folds, whichever pays more summed
+    over all deals, as it has to be chosen without seeing the enemy's
+    cards. The rest of the board is checked down. EVs are in chips
+    relative to folding now, and the game's own random streams are never
+    touched.
+    """
+
+    def __init__(self, time_budget: float = 0.15, max_samples: int = 20000, batch_size: int = 64):
+        self.time_budget = time_budget
+        self.max_samples = max_samples
+        self.batch_size = batch_size
+        self.rng = random.Random()
+        self.latest = None
+        self._spot = None
+        self._done = None
+        self._cancel = None
+
+    def start(self, game: "RoguelikePoker", enemy: Enemy, to_call: int):
+        """Begin searching the spot the player is in, unless it is the spot already searched.
+
+        Any earlier search of a different spot is dropped.
+        """
+        import threading
+
+        key = (tuple(game.player_hand), tuple(game.community_cards), game.pot, game.player_chips, to_call,
+               enemy.name, enemy.level, enemy.chips)
+        if key == self._spot:
+            return
+        self.stop()
+        self._spot = key
+        profile = Enemy(enemy.name, enemy.level, random.Random(self.rng.getrandbits(64)))
+        profile.chips = enemy.chips
+        spot = (list(game.player_hand), list(game.community_cards), game.pot, game.player_chips, to_call, profile,
+                random.Random(self.rng.getrandbits(64)))
+        self.latest = None
+        self._done, self._cancel = threading.Event(), threading.Event()
+        threading.Thread(target=self._search, args=(spot, time.perf_counter() + self.time_budget,
+                                                    self._done, self._cancel), daemon=True).start()
+
+    def stop(self):
+        self._spot = None
+        if self._cancel is not None:
+            self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self._done is not None and not self._done.is_set()
+
+    def advice(self, timeout: Optional[float] = None) -> Optional[ActionAdvice]:
+        """Latest estimate, waiting up to timeout (default time_budget) for the search to end"""
+        if self._done is not None:
+            self._done.wait(self.time_budget if timeout is None else timeout)
+        return self.latest
+
+    def _search(self, spot, deadline, done, cancel):
+        try:
+            self._run(spot, deadline, cancel)
+        finally:
+            done.set()
+
+    def _run(self, spot, deadline, cancel):
+        hole, board, pot, chips, to_call, profile, rng = spot
+        score = hand_evaluator.score
+        street = street_index(board)
+        strength_of = strategy_strength if profile.strategy is not None and profile.strategy.available() \
+            else heuristic_hand_strength
+        known = cards_to_mask(hole + board)
+        unseen = [card for card in range(52) if not known & CARD_BITS[card]]
+        missing = 5 - len(board)
+
+        bets = sorted({size for size in suggested_bets(to_call, chips) if to_call + size <= chips})
+        verb = "raise" if to_call > 0 else "bet"
+        labels = ["fold", "call" if to_call > 0 else "check"] + [f"{verb} {size}" for size in bets]
+        # Per action: summed EV where the enemy doesn't raise, then summed EV of
+        # calling and of folding its raises
+        sums = [[0.0, 0.0, 0.0] for _ in labels]
+        raised = [0] * len(labels)
+        samples = 0
+
+        while samples < self.max_samples and not cancel.is_set():
+            for _ in range(self.batch_size):
+                dealt = rng.sample(unseen, 2 + missing)
+                enemy_hole = dealt[:2]
+                final_board = board + dealt[2:]
+                player_score = score(hole + final_board)
+                enemy_score = score(enemy_hole + final_board)
+                if player_score > enemy_score:
+                    share = 1.0
+                elif (player_score >> 20) == (enemy_score >> 20):
+                    share = 0.5
+                else:
+                    share = 0.0
+                strength = strength_of(enemy_hole, board)
+
+                if chips >= to_call:
+                    sums[1][0] += share * (pot + to_call) - to_call
+                for i, size in enumerate(bets, 2):
+                    put_in = to_call + size
+                    bet_pot = pot + put_in
+                    action = profile.decide_action(strength, bet_pot, size, street)
+                    if action == "raise" and profile.chips <= 0:
+                        action = "call"
+                    if action == "raise":
+                        raise_amount = min(size * 2, profile.chips)
+                        facing = raise_amount - size
+                        raised_pot = bet_pot + raise_amount
+                        raised[i] += 1
+                        if facing <= 0:
+                            sums[i][1] += share * raised_pot - put_in
+                        elif chips - put_in >= facing:
+                            sums[i][1] += share * (raised_pot + facing) - put_in - facing
+                        else:
+                            sums[i][1] -= float("inf")
+                        sums[i][2] -= put_in
+                    elif action == "call" and profile.chips >= size:
+                        sums[i][0] += share * (bet_pot + size) - put_in
+                    else:
+                        # A fold or a short call leaves the pot as it is, and the hand still goes to showdown
+                        sums[i][0] += share * bet_pot - put_in
+            samples += self.batch_size
+            evs = {}
+            # In the prompt's order, so a tie goes to checking rather than folding
+            for i in (*range(1, len(labels)), 0):
+                if i == 1 and chips < to_call:
+                    continue
+                evs[labels[i]] = (sums[i][0] + (max(sums[i][1], sums[i][2]) if raised[i] else 0.0)) / samples
+            if cancel.is_set():
+                return  # a newer search owns latest
+            self.latest = ActionAdvice(evs, samples, samples >= self.max_samples)
+            if time.perf_counter() >= deadline:
+                break
+
+GAME_PHASES = ("pre_flop", "flop", "turn", "river", "showdown")
+# Fixed part of RoguelikePoker.snapshot(): player and enemy chips, pot, both
+# bets, level, phase, the enemy's ability flag, deck cursor, item count, the
+# card counts of both hands, the board and the burn pile, then the GameStats
+# counters. The deck and game random states, the deck, the cards and one
+# used flag per item follow it.
+SNAPSHOT_HEADER = struct.Struct("<5qHBBBH4B8q")
+# random.Random's Mersenne Twister state: 624 words and the position in them
+RANDOM_STATE = struct.Struct("<625I")
+
+def _pack_random(rng: random.Random) -> bytes:
+    return RANDOM_STATE.pack(*rng.getstate()[1])
+
+def _unpack_random(rng: random.Random, state: bytes, offset: int):
+    # The streams never call gauss(), so there is no cached gaussian to keep
+    rng.setstate((3, RANDOM_STATE.unpack_from(state, offset), None))
+
+class RoguelikePoker:
+    history_path = HISTORY_PATH  # RunHistory file behind the high score
+
+    def __init__(self, seed: Optional[int] = None):
+        # Deals and game events (enemy choices, drops, luck) get separate
+        # streams and rollouts are reseeded per spot, so one seed replays a game
+        self.seed = (random.getrandbits(64) if seed is None else seed) % (1 << 64)
+        self.rng = random.Random(self.seed)
+        self.action_log = None
+        self.replay_path = None
+        self.hand_db = None  # a HandDatabase to log runs and hands to
+        self.hand_history = None  # a HandHistoryWriter to write hands to
+        self.db_run_id = None
+        self.hand_actions = []
+        self.action_board = 0
+        self.showdown_ranks = None
+        self.showdown_outcome = None
+        self.hand_start_chips = (0, 0)
+        self.player_chips = 100
+        self.level = 1
+        self.victories = 0
+        self.deck = Deck(random.Random(f"{self.seed}:deck"))
+        self.inventory = []
+        self.stats = GameStats()
+        self.difficulty = "normal"
+        self.enemy_multipliers = ENEMY_DIFFICULTY_MULTIPLIERS
+        # "equity" runs EquityEngine rollouts, "heuristic" the rank-based estimate
+        self.strength_model = "equity"
+        # 300 rollouts keep a flop or turn decision to 2-4 ms once warm_up() has run
+        self.equity_engine = EquityEngine(iterations=300, time_budget=None, rng=random.Random())
+        self.hand_cache = HandEvaluationCache()
+        # What the player's betting says they hold, for enemies that read it
+        self.player_range = HandRange()
+        # Dealt into in place every hand
+        self.player_hand = array('B')
+        self.enemy_hand = array('B')
+        self.community_cards = array('B')
+        self.burned = array('B')
+        # BettingAdvisor whose EVs are shown before each action prompt, if any
+        self.advisor = None
+        self.emit_events = True  # _betting_steps also yields what the terminal shows
+        self.reset_game()
+        self.load_high_score()
+    
+    def reset_game(self):
+        self.hand_actions.clear()
+        self.action_board = 0
+        self.showdown_ranks = None
+        self.showdown_outcome = None
+        self.pot = 0
+        self.player_bet = 0
+        self.enemy_bet = 0
+        del self.player_hand[:], self.enemy_hand[:], self.community_cards[:], self.burned[:]
+        self.game_phase = "pre_flop"
+        self.deck.reset()
+        self.hand_cache.clear()
+        self.player_range.reset()
+    
+    def snapshot(self, enemy: Enemy) -> bytes:
+        """The hand in progress as one buffer that restore() puts back.
+
+        It holds chips, bets, the deck permutation and cursor, every dealt
+        card, the enemy's chips and ability, which items are held and used,
+        and the stats. The deck's and the game's random states are in it too,
+        so a restored hand deals the same cards and the enemy makes the same
+        choices as it did the first time. Logs and caches are left out.
+        """
+        deck = self.deck
+        return b"".join((
+            SNAPSHOT_HEADER.pack(self.player_chips, enemy.chips, self.pot, self.player_bet, self.enemy_bet,
+                                 self.level, GAME_PHASES.index(self.game_phase), enemy.ability_used, deck.cursor,
+                                 len(self.inventory), len(self.player_hand), len(self.enemy_hand),
+                                 len(self.community_cards), len(self.burned),
+                                 *[getattr(self.stats, name) for name in GameStats.__slots__]),
+            _pack_random(deck.rng), _pack_random(self.rng), deck.cards, self.player_hand, self.enemy_hand, self.community_cards, self.burned,
+            bytes([item.used for item in self.inventory]),
+        ))
+
+    def restore(self, state: bytes, enemy: Enemy):
+        """Return to a snapshot() of this game, dropping items found since"""
+        (self.player_chips, enemy.chips, self.pot, self.player_bet, self.enemy_bet, self.level, phase,
+         ability_used, self.deck.cursor, items, *counts) = SNAPSHOT_HEADER.unpack_from(state)
+        counts, stats = counts[:4], counts[4:]
+        self.game_phase = GAME_PHASES[phase]
+        enemy.ability_used = bool(ability_used)
+        for name, value in zip(GameStats.__slots__, stats):
+            setattr(self.stats, name, value)
+        offset = SNAPSHOT_HEADER.size
+        for rng in (self.deck.rng, self.rng):
+            _unpack_random(rng, state, offset)
+            offset += RANDOM_STATE.size
+        for cards, count in zip((self.deck.cards, self.player_hand, self.enemy_hand, self.community_cards,
+                                 self.burned), (len(self.deck.cards), *counts)):
+            del cards[:]
+            cards.frombytes(state[offset:offset + count])
+            offset += count
+        del self.inventory[items:]
+        for item, used in zip(self.inventory, state[offset:]):
+            item.used = bool(used)
+
+    def _start_hand(self, enemy: Enemy):
+        self.reset_game()
+        self.hand_start_chips = (self.player_chips, enemy.chips)
+        self.deal_hands()
+        self.stats.hands_played += 1
+
+    def load_high_score(self):
+        try:
+            self.run_history = RunHistory(self.history_path)
+        except ValueError as e:
+            # Keep the damaged file for inspection and start a new history
+            renderer.write(f"{Colors.RED}Could not load progress: {e}{Colors.END}")
+            os.replace(self.history_path, self.history_path + ".corrupt")
+            self.run_history = RunHistory(self.history_path)
+        if not self.run_history.runs:
+            self._import_legacy_save()
+        self.high_score = self.run_history.high_score
+        self.best_run_stats = self.run_history.best_run()
+
+    def _import_legacy_save(self):
+        """Carry the best run over from the old poker_save.json, once"""
+        import json
+        try:
+            with open(LEGACY_SAVE_PATH, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("high_score", 0) > 0:
+            self.run_history.append({**data.get("best_run_stats", {}), "level": data["high_score"],
+                                     "imported": True})
+
+    def save_high_score(self):
+        """Record the finished run; the history keeps the high score"""
+        from datetime import datetime
+        try:
+            self.run_history.append({
+                "level": self.level,
+                "chips": self.player_chips,
+                "hands_won": self.stats.hands_won,
+                "hands_played": self.stats.hands_played,
+                "win_rate": self.stats.win_rate(),
+                "difficulty": self.difficulty,
+                "seed": self.seed,
+                "date": datetime.now().isoformat()
+            })
+        except Exception as e:
+            renderer.write(f"{Colors.RED}Could not save progress: {e}{Colors.END}")
+    
+    def add_item(self, item):
+        self.inventory.append(item)
+        animated_text(f"🎁 Found: {item.name}!", Colors.YELLOW)
+    
+    def use_item(self, item_index):
+        if 0 <= item_index < len(self.inventory):
+            item = self.inventory[item_index]
             if not item.used:
                 item.used = True
+                self._record_player_action("item", item_index)
                 return self.apply_item_effect(item)
         return False
     
-    def apply_item_effect(self, item):
+    def _apply_item(self, item) -> Tuple[str, int]:
+        """Apply an item's effect and return (effect result, chips gained)"""
         if item.effect == "luck":
             # Get a slight hand strength bonus for this round
-            animated_text(f"✨ {item.name} grants you luck!", Colors.YELLOW)
-            return "luck_boost"
+            return "luck_boost", 0
         elif item.effect == "chip_bonus":
             self.player_chips += item.value
-            animated_text(f"💰 {item.name} grants you {item.value} chips!", Colors.GREEN)
-            return "chips"
+            return "chips", item.value
         elif item.effect == "heal":
             heal_amount = min(item.value, 200 - self.player_chips)
             self.player_chips += heal_amount
-            animated_text(f"💊 {item.name} restores {heal_amount} chips!", Colors.GREEN)
-            return "heal"
-        return False
+            return "heal", heal_amount
+        return False, 0
+    
+    def apply_item_effect(self, item):
+        effect, amount = self._apply_item(item)
+        if effect == "luck_boost":
+            animated_text(f"✨ {item.name} grants you luck!", Colors.YELLOW)
+        elif effect == "chips":
+            animated_text(f"💰 {item.name} grants you {amount} chips!", Colors.GREEN)
+        elif effect == "heal":
+            animated_text(f"💊 {item.name} restores {amount} chips!", Colors.GREEN)
+        return effect
     
     def generate_random_item(self):
-        items = [
-            Item("Lucky Charm", "Slightly improves hand strength", "luck", 1),
-            Item("Coin Pouch", "Grants 25 chips", "chip_bonus", 25),
-            Item("Magic Elixir", "Restores health", "heal", 50),
-            Item("Rabbit's Foot", "Major luck boost", "luck", 2),
-            Item("Golden Coin", "Grants 50 chips", "chip_bonus", 50),
-            Item("Phoenix Feather", "Full health restoration", "heal", 100),
-        ]
-        return random.choice(items)
+        return Item(*self.rng.choice(ITEM_TYPES))
     
     def show_stats(self):
-        print(f"\n{Colors.CYAN + Colors.BOLD}📊 GAME STATISTICS{Colors.END}")
-        print(f"Hands played: {self.stats.hands_played}")
-        print(f"Hands won: {self.stats.hands_won}")
-        print(f"Win rate: {self.stats.win_rate():.1f}%")
-        print(f"Enemies defeated: {self.stats.enemies_defeated}")
-        print(f"Current level: {self.level}")
-        print(f"High score: {self.high_score}")
-        print(f"Total chips won: {self.stats.total_chips_won:,}")
+        renderer.write(f"\n{Colors.CYAN + Colors.BOLD}📊 GAME STATISTICS{Colors.END}")
+        renderer.write(f"Hands played: {self.stats.hands_played}")
+        renderer.write(f"Hands won: {self.stats.hands_won}")
+        renderer.write(f"Win rate: {self.stats.win_rate():.1f}%")
+        renderer.write(f"Enemies defeated: {self.stats.enemies_defeated}")
+        renderer.write(f"Current level: {self.level}")
+        renderer.write(f"High score: {self.high_score}")
+        renderer.write(f"Total chips won: {self.stats.total_chips_won:,}")
     
     def difficulty_selection(self):
-        print(f"\n{Colors.BOLD}⚙️  SELECT DIFFICULTY:{Colors.END}")
-        print(f"1. {Colors.GREEN}Easy{Colors.END} - More chips, weaker enemies")
-        print(f"2. {Colors.YELLOW}Normal{Colors.END} - Balanced gameplay")
-        print(f"3. {Colors.RED}Hard{Colors.END} - Fewer chips, stronger enemies")
-        print(f"4. {Colors.MAGENTA}Nightmare{Colors.END} - Ultimate challenge")
+        renderer.write(f"\n{Colors.BOLD}⚙️  SELECT DIFFICULTY:{Colors.END}")
+        renderer.write(f"1. {Colors.GREEN}Easy{Colors.END} - More chips, weaker enemies")
+        renderer.write(f"2. {Colors.YELLOW}Normal{Colors.END} - Balanced gameplay")
+        renderer.write(f"3. {Colors.RED}Hard{Colors.END} - Fewer chips, stronger enemies")
+        renderer.write(f"4. {Colors.MAGENTA}Nightmare{Colors.END} - Ultimate challenge")
         
         while True:
-            choice = input(f"{Colors.CYAN}Choose difficulty (1-4): {Colors.END}").strip()
-            if choice == "1":
-                self.difficulty = "easy"
-                self.player_chips = 150
-                break
-            elif choice == "2":
-                self.difficulty = "normal"
-                self.player_chips = 100
-                break
-            elif choice == "3":
-                self.difficulty = "hard"
-                self.player_chips = 75
-                break
-            elif choice == "4":
-                self.difficulty = "nightmare"
-                self.player_chips = 50
+            choice = renderer.input(f"{Colors.CYAN}Choose difficulty (1-4): {Colors.END}").strip()
+            difficulties = {"1": "easy", "2": "normal", "3": "hard", "4": "nightmare"}
+            if choice in difficulties:
+                self.difficulty = difficulties[choice]
+                self.player_chips = DIFFICULTY_STARTING_CHIPS[self.difficulty]
                 break
             else:
-                print(f"{Colors.RED}Invalid choice!{Colors.END}")
+                renderer.write(f"{Colors.RED}Invalid choice!{Colors.END}")
+    
+    def _deal(self, target, count: int):
+        start = len(target)
+        self.deck.deal_into(target, count)
+        if self.action_log is not None:
+            self.action_log.deal(target[start:])
     
     def deal_hands(self):
-        self.player_hand = self.deck.draw(2)
-        self.enemy_hand = self.deck.draw(2)
+        self._deal(self.player_hand, 2)
+        self._deal(self.enemy_hand, 2)
+        self.hand_cache.clear()
     
     def deal_flop(self):
-        self.deck.draw(1)
-        self.community_cards.extend(self.deck.draw(3))
+        self._deal(self.burned, 1)
+        self._deal(self.community_cards, 3)
         self.game_phase = "flop"
+        self.hand_cache.clear()
     
     def deal_turn(self):
-        self.deck.draw(1)
-        self.community_cards.extend(self.deck.draw(1))
+        self._deal(self.burned, 1)
+        self._deal(self.community_cards, 1)
         self.game_phase = "turn"
+        self.hand_cache.clear()
     
     def deal_river(self):
-        self.deck.draw(1)
-        self.community_cards.extend(self.deck.draw(1))
+        self._deal(self.burned, 1)
+        self._deal(self.community_cards, 1)
         self.game_phase = "river"
+        self.hand_cache.clear()
     
-    def get_best_hand(self, hole_cards: List[Card]) -> PokerHand:
-        all_cards = hole_cards + self.community_cards
+    def get_best_hand(self, hole_cards) -> PokerHand:
+        key = ("best", bytes(hole_cards), bytes(self.community_cards))
+        best_hand = self.hand_cache.lookup(key)
+        if best_hand is not None:
+            return best_hand
+
+        all_cards = [*hole_cards, *self.community_cards]
         if len(all_cards) < 5:
-            return PokerHand(hole_cards + [Card(2, Suit.HEARTS)] * (5 - len(hole_cards)))
-        
-        from itertools import combinations
-        best_hand = None
-        
-        for combo in combinations(all_cards, 5):
-            hand = PokerHand(list(combo))
-            if best_hand is None or hand > best_hand:
-                best_hand = hand
-        
-        return best_hand
-    
-    def evaluate_hand_strength(self, hole_cards: List[Card], luck_boost=False) -> float:
-        if not self.community_cards:
-            ranks = sorted([card.rank for card in hole_cards], reverse=True)
-            if ranks[0] == ranks[1]:
-                strength = min(0.5 + (ranks[0] / 26), 0.95)
-            elif ranks[0] >= 10 or (ranks[0] >= 7 and ranks[1] >= 7):
-                strength = 0.4 + (sum(ranks) / 52)
-            else:
-                strength = 0.1 + (sum(ranks) / 78)
+            best_hand = PokerHand(card_views(hole_cards) + [Card(2, Suit.HEARTS)] * (5 - len(hole_cards)))
         else:
-            best_hand = self.get_best_hand(hole_cards)
-            base_strength = best_hand.rank.value / 10.0
-            
-            if best_hand.rank in [HandRank.HIGH_CARD, HandRank.PAIR]:
-                kicker_bonus = sum(best_hand.value[:2]) / 52.0
-                strength = min(base_strength + kicker_bonus, 0.95)
-            else:
-                strength = min(base_strength, 0.95)
-        
+            best_hand = hand_evaluator.best_hand(all_cards)
+        return self.hand_cache.store(key, best_hand)
+    
+    def evaluate_hand_strength(self, hole_cards, luck_boost=False, model=None) -> float:
+        strength, _ = self.hand_strength_with_mode(hole_cards, model)
+
         if luck_boost:
             strength = min(strength + 0.15, 0.98)
-        
+
         return strength
+
+    def hand_strength_with_mode(self, hole_cards, model=None) -> Tuple[float, str]:
+        """Strength of hole_cards on the current board and how it was worked out:
+        "exact", "monte_carlo", "preflop_table" or "heuristic" """
+        model = model or self.strength_model
+        key = ("strength", model, bytes(hole_cards), bytes(self.community_cards))
+        result = self.hand_cache.lookup(key)
+        if result is None:
+            result = self.hand_cache.store(key, self._raw_hand_strength(hole_cards, model))
+        return result
+
+    def _raw_hand_strength(self, hole_cards, model: str) -> Tuple[float, str]:
+        if model == "equity" and (self.community_cards or not preflop_table.available()):
+            # Same seed and cards give the same estimate, however often or
+            # in whatever order strengths are asked for (display included)
+            self.equity_engine.rng.seed(self.seed.to_bytes(8, "little") + bytes(hole_cards)
+                                        + bytes(self.community_cards))
+            result = self.equity_engine.equity(hole_cards, self.community_cards)
+            return result.equity, result.mode
+        mode = "heuristic" if self.community_cards or not preflop_table.available() else "preflop_table"
+        return heuristic_hand_strength(hole_cards, self.community_cards), mode
     
     def display_game_state(self, enemy):
         clear_screen()
@@ -610,67 +2678,136 @@ class RoguelikePoker:
         display_level_banner(self.level)
         display_pot_and_chips(self.pot, self.player_chips, enemy.chips, enemy.name)
         
-        print(f"\n{Colors.BOLD}🃏 PHASE: {self.game_phase.upper().replace('_', '-')}{Colors.END}")
+        renderer.write(f"\n{Colors.BOLD}🃏 PHASE: {self.game_phase.upper().replace('_', '-')}{Colors.END}")
         
         if hasattr(self, 'high_score') and self.high_score > 0:
-            print(f"{Colors.GRAY}🏆 Best: Level {self.high_score}{Colors.END}")
+            renderer.write(f"{Colors.GRAY}🏆 Best: Level {self.high_score}{Colors.END}")
         
         # Enemy display
-        print(f"\n{Colors.RED + Colors.BOLD}⚔️  {enemy.name}{Colors.END}")
+        renderer.write(f"\n{Colors.RED + Colors.BOLD}⚔️  {enemy.name}{Colors.END}")
         if enemy.special_ability and not enemy.ability_used:
-            print(f"{Colors.MAGENTA}🔮 Special: {enemy.special_ability}{Colors.END}")
+            renderer.write(f"{Colors.MAGENTA}🔮 Special: {enemy.special_ability}{Colors.END}")
         
         enemy_art = enemy.get_ascii_art()
         for line in enemy_art:
-            print(f"    {line}")
+            renderer.write(f"    {line}")
         
         # Community cards
         if self.community_cards:
-            print(f"\n{Colors.YELLOW + Colors.BOLD}🏛️  COMMUNITY CARDS{Colors.END}")
+            renderer.write(f"\n{Colors.YELLOW + Colors.BOLD}🏛️  COMMUNITY CARDS{Colors.END}")
             display_cards_horizontal(self.community_cards)
         
         # Player hand with strength indicator
-        print(f"\n{Colors.GREEN + Colors.BOLD}🎯 YOUR HAND{Colors.END}")
+        renderer.write(f"\n{Colors.GREEN + Colors.BOLD}🎯 YOUR HAND{Colors.END}")
         display_cards_horizontal(self.player_hand)
         
         # Hand strength indicator
         if self.community_cards:
-            strength = self.evaluate_hand_strength(self.player_hand)
+            strength, mode = self.hand_strength_with_mode(self.player_hand)
             strength_bar = "█" * int(strength * 10) + "░" * (10 - int(strength * 10))
             strength_color = Colors.GREEN if strength > 0.6 else Colors.YELLOW if strength > 0.3 else Colors.RED
-            print(f"💪 Hand Strength: {strength_color}{strength_bar}{Colors.END} ({strength:.1%})")
+            renderer.write(f"💪 Hand Strength: {strength_color}{strength_bar}{Colors.END} ({strength:.1%}"
+                           f"{Colors.GRAY}, {mode.replace('_', ' ')}{Colors.END})")
         
         # Inventory
         display_inventory(self.inventory)
         
         # Show best hands during showdown
         if self.game_phase == "showdown":
-            print(f"\n{Colors.RED + Colors.BOLD}⚔️  {enemy.name.upper()} HAND{Colors.END}")
+            renderer.write(f"\n{Colors.RED + Colors.BOLD}⚔️  {enemy.name.upper()} HAND{Colors.END}")
             display_cards_horizontal(self.enemy_hand)
             
             player_best = self.get_best_hand(self.player_hand)
             enemy_best = self.get_best_hand(self.enemy_hand)
             
-            print(f"\n{Colors.GREEN + Colors.BOLD}🎯 Your Best Hand: {Colors.END}{player_best}")
-            print(f"{Colors.RED + Colors.BOLD}⚔️  Enemy Best Hand: {Colors.END}{enemy_best}")
+            renderer.write(f"\n{Colors.GREEN + Colors.BOLD}🎯 Your Best Hand: {Colors.END}{player_best}")
+            renderer.write(f"{Colors.RED + Colors.BOLD}⚔️  Enemy Best Hand: {Colors.END}{enemy_best}")
     
     def animated_deal(self, phase_name):
-        print(f"\n{Colors.CYAN + Colors.BOLD}🎴 Dealing {phase_name}...{Colors.END}")
+        renderer.write(f"\n{Colors.CYAN + Colors.BOLD}🎴 Dealing {phase_name}...{Colors.END}")
         for i in range(3):
-            print("🎴" * (i + 1))
-            time.sleep(0.3)
-        print(f"{Colors.GREEN}✨ {phase_name} dealt!{Colors.END}")
-        time.sleep(0.5)
+            renderer.write("🎴" * (i + 1))
+            renderer.pause(0.3)
+        renderer.write(f"{Colors.GREEN}✨ {phase_name} dealt!{Colors.END}")
+        renderer.pause(0.5)
     
-    def betting_round(self, enemy: Enemy) -> bool:
+    def _betting_steps(self, enemy: Enemy):
+        """One betting round; returns whether the player is still in the hand"""
         to_call = self.enemy_bet - self.player_bet
-        luck_boost = False
-        
+
         while True:
-            print(f"\n{Colors.YELLOW + Colors.BOLD}💸 BETTING ROUND{Colors.END}")
+            action, amount = yield ("act", to_call, self.pot, self.player_chips)
+
+            if action == "item":
+                effect = self.use_item(amount)
+                if self.emit_events:
+                    yield ("item", amount, effect)
+                continue
+
+            if action in ("bet", "raise"):
+                total_bet = to_call + amount
+                if amount <= 0 or amount > self.player_chips or self.player_chips < total_bet:
+                    action = "call"
+                else:
+                    self._player_bet(total_bet)
+                    self._record_player_action(action, amount)
+                    enemy.use_special_ability(None)
+                    enemy_action, enemy_amount = self._enemy_respond(enemy, amount)
+                    if self.emit_events:
+                        yield ("enemy", enemy_action, enemy_amount)
+                    if enemy_action == "raise":
+                        to_call = self.enemy_bet - self.player_bet
+                        continue
+                    return True
+
+            self._record_player_action(action, 0)
+            if action == "call" and to_call > 0:
+                if self.player_chips < to_call:
+                    return False
+                self._player_call(to_call)
+            return action != "fold"
+
+    def check_action(self, to_call: int, action: str, amount: int = 0):
+        """Raise ValueError for an answer to an "act" request that the spot doesn't allow.
+
+        As in _betting_steps, bet and raise are the same move, amount is
+        what goes in on top of the call, and calling nothing checks.
+        """
+        if action == "item":
+            if not 0 <= amount < len(self.inventory) or self.inventory[amount].used:
+                raise ValueError(f"No unused item in slot {amount}")
+        elif action not in ("check", "call", "bet", "raise", "fold") or (action == "check" and to_call > 0):
+            raise ValueError(f"Choose one of {'call/raise/fold' if to_call > 0 else 'check/bet/fold'} or item")
+        elif action == "call" and to_call > self.player_chips:
+            raise ValueError(f"Not enough chips! You need {to_call} but have {self.player_chips}")
+        elif action in ("bet", "raise") and amount <= 0:
+            raise ValueError("Bet must be positive")
+        elif action in ("bet", "raise") and amount > self.player_chips:
+            raise ValueError(f"Not enough chips! You have {self.player_chips}")
+        elif action in ("bet", "raise") and to_call + amount > self.player_chips:
+            raise ValueError(f"Not enough chips! You need {to_call + amount} but have {self.player_chips}")
+
+    def betting_round(self, enemy: Enemy) -> bool:
+        steps = self._betting_steps(enemy)
+        event = next(steps)
+        try:
+            while True:
+                if event[0] == "act":
+                    event = steps.send(self._prompt_action(enemy, event[1]))
+                    continue
+                if event[0] == "enemy":
+                    self._show_enemy_response(enemy, *event[1:])
+                event = next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+    def _prompt_action(self, enemy: Enemy, to_call: int) -> Tuple[str, int]:
+        """Ask until the player gives an answer the spot allows"""
+        while True:
+            renderer.write(f"\n{Colors.YELLOW + Colors.BOLD}💸 BETTING ROUND{Colors.END}")
             
             if to_call > 0:
-                print(f"💰 To call: {Colors.RED + Colors.BOLD}{to_call}{Colors.END} chips")
+                renderer.write(f"💰 To call: {Colors.RED + Colors.BOLD}{to_call}{Colors.END} chips")
             
             # Show available actions
             actions = []
@@ -682,125 +2819,187 @@ class RoguelikePoker:
             if self.inventory and any(not item.used for item in self.inventory):
                 actions.append("item")
             
-            action_str = "/".join(actions)
-            action = input(f"{Colors.CYAN}🎯 Action ({action_str}): {Colors.END}").lower().strip()
+            if self.advisor is not None:
+                # A no-op unless an item or an enemy raise changed the spot since play_hand started it
+                self.advisor.start(self, enemy, to_call)
+                advice = self.advisor.advice(timeout=0)
+                if advice is not None:
+                    sampling = ", still sampling" if self.advisor.running else ""
+                    renderer.write(f"🧭 EV in chips ({advice.samples:,} deals{sampling}): {advice}")
             
-            if action == "fold":
-                animated_text("🏳️  You fold.", Colors.RED)
-                return False
+            action_str = "/".join(actions)
+            action = renderer.input(f"{Colors.CYAN}🎯 Action ({action_str}): {Colors.END}").lower().strip()
             
-            elif action == "item":
-                self.show_inventory_menu()
+            if action == "item":
+                slot = self.choose_item()
+                if slot is not None:
+                    return "item", slot
                 continue
             
-            elif action in ["call", "check"]:
-                if action == "call" and to_call > 0:
-                    if self.player_chips < to_call:
-                        animated_text(f"❌ Not enough chips! You need {to_call} but have {self.player_chips}", Colors.RED)
-                        continue
-                    self.player_chips -= to_call
-                    self.pot += to_call
-                    self.player_bet = self.enemy_bet
-                
-                animated_text(f"✅ You {action}.", Colors.GREEN)
-                break
-            
-            elif action in ["bet", "raise"]:
-                try:
-                    print(f"Suggested bets: {Colors.GRAY}[{max(10, to_call)}] [{max(25, to_call*2)}] [{max(50, self.player_chips//4)}]{Colors.END}")
-                    amount_input = input(f"💰 Amount (max {self.player_chips}): ").strip()
-                    
-                    if not amount_input:
-                        continue
-                    
-                    amount = int(amount_input)
-                    if amount <= 0:
-                        animated_text("❌ Bet must be positive.", Colors.RED)
-                        continue
-                    if amount > self.player_chips:
-                        animated_text("❌ Not enough chips!", Colors.RED)
-                        continue
-                    
-                    total_bet = to_call + amount
-                    if self.player_chips < total_bet:
-                        animated_text("❌ Not enough chips for that bet!", Colors.RED)
-                        continue
-                    
-                    self.player_chips -= total_bet
-                    self.pot += total_bet
-                    self.player_bet += total_bet
-                    
-                    animated_text(f"🚀 You {'raise' if to_call > 0 else 'bet'} {amount}!", Colors.YELLOW)
-                    
-                    # Enemy response with suspense
-                    print(f"\n{Colors.MAGENTA}🤔 {enemy.name} is thinking...{Colors.END}")
-                    time.sleep(1.5)
-                    
-                    # Check if enemy uses special ability
-                    special = enemy.use_special_ability(None)
-                    if special and not enemy.ability_used:
-                        animated_text(f"🔮 {enemy.name} uses {special}!", Colors.MAGENTA)
-                        time.sleep(1)
-                    
-                    enemy_strength = self.evaluate_hand_strength(self.enemy_hand)
-                    enemy_action = enemy.decide_action(enemy_strength, self.pot, amount)
-                    
-                    if enemy_action == "fold":
-                        animated_text(f"🏳️  {enemy.name} folds.", Colors.GREEN)
-                        return True
-                    elif enemy_action == "call":
-                        if enemy.chips >= amount:
-                            enemy.chips -= amount
-                            self.pot += amount
-                            self.enemy_bet = self.player_bet
-                            animated_text(f"💪 {enemy.name} calls.", Colors.YELLOW)
-                        else:
-                            animated_text(f"💸 {enemy.name} doesn't have enough chips and folds.", Colors.GREEN)
-                        return True
-                    elif enemy_action == "raise":
-                        raise_amount = min(amount * 2, enemy.chips)
-                        enemy.chips -= raise_amount
-                        self.pot += raise_amount
-                        self.enemy_bet += raise_amount
-                        animated_text(f"🔥 {enemy.name} raises to {raise_amount}!", Colors.RED)
-                        to_call = self.enemy_bet - self.player_bet
-                        continue
-                    
-                    break
-                    
-                except ValueError:
-                    animated_text("❌ Please enter a valid number.", Colors.RED)
+            if action in ["bet", "raise"]:
+                amount = self._prompt_amount(to_call)
+                if amount is None:
+                    continue
+                animated_text(f"🚀 You {'raise' if to_call > 0 else 'bet'} {amount}!", Colors.YELLOW)
+                return action, amount
             
+            try:
+                self.check_action(to_call, action)
+            except ValueError as e:
+                animated_text(f"❌ {e}", Colors.RED)
+                continue
+            if action == "fold":
+                animated_text("🏳️  You fold.", Colors.RED)
             else:
-                animated_text("❌ Invalid action. Use the available options.", Colors.RED)
+                animated_text(f"✅ You {action}.", Colors.GREEN)
+            return action, 0
+
+    def _prompt_amount(self, to_call: int) -> Optional[int]:
+        """A bet or raise the player can cover, or None to go back to the action prompt"""
+        suggested = " ".join(f"[{size}]" for size in suggested_bets(to_call, self.player_chips))
+        renderer.write(f"Suggested bets: {Colors.GRAY}{suggested}{Colors.END}")
+        amount_input = renderer.input(f"💰 Amount (max {self.player_chips}): ").strip()
         
-        return True
+        if not amount_input:
+            return None
+        try:
+            amount = int(amount_input)
+        except ValueError:
+            animated_text("❌ Please enter a valid number.", Colors.RED)
+            return None
+        try:
+            self.check_action(to_call, "bet", amount)
+        except ValueError as e:
+            animated_text(f"❌ {e}", Colors.RED)
+            return None
+        return amount
+
+    def _show_enemy_response(self, enemy: Enemy, enemy_action: str, raise_amount: int):
+        # Enemy response with suspense
+        renderer.write(f"\n{Colors.MAGENTA}🤔 {enemy.name} is thinking...{Colors.END}")
+        renderer.pause(1.5)
+        
+        if enemy_action == "fold":
+            animated_text(f"🏳️  {enemy.name} folds.", Colors.GREEN)
+        elif enemy_action == "call":
+            animated_text(f"💪 {enemy.name} calls.", Colors.YELLOW)
+        elif enemy_action == "short":
+            animated_text(f"💸 {enemy.name} doesn't have enough chips and folds.", Colors.GREEN)
+        elif enemy_action == "raise":
+            animated_text(f"🔥 {enemy.name} raises to {raise_amount}!", Colors.RED)
     
-    def show_inventory_menu(self):
+    def _start_action_log(self):
+        self.action_log = ActionLog(self.seed, self.difficulty, self.strength_model)
+
+    def _finish_run(self, outcome: str):
+        if self.hand_db is not None and self.db_run_id is not None:
+            self.hand_db.finish_run(self.db_run_id, outcome, self.level, self.player_chips)
+        if self.action_log is None:
+            return
+        self.action_log.finish(outcome, self.level, self.player_chips)
+        if self.replay_path:
+            self.action_log.save(self.replay_path)
+
+    def _start_hand_db_run(self):
+        if self.hand_db is not None:
+            self.db_run_id = self.hand_db.start_run(self.seed, self.difficulty, self.strength_model)
+
+    def _note_action(self, letters: Dict[str, str], action: str, amount: int):
+        # The player acts on every street, so a new street always shows up here
+        if len(self.community_cards) != self.action_board:
+            self.action_board = len(self.community_cards)
+            self.hand_actions.append("/")
+        self.hand_actions.append(f"{letters[action]}{amount or ''}" if amount else letters[action])
+
+    def _record_hand(self, enemy: Enemy, won: bool):
+        if self.hand_db is not None:
+            player_rank, enemy_rank = self.showdown_ranks or (None, None)
+            self.hand_db.add_hand((self.db_run_id, self.stats.hands_played, self.level, won, player_rank,
+                                   enemy_rank, self.pot, " ".join(self.hand_actions)))
+        if self.hand_history is not None:
+            self.hand_history.write(format_hand_history(self, enemy, won, self.hand_history.timestamp()))
+
+    def _record_player_action(self, action: str, amount: int):
+        if self.action_log is not None:
+            self.action_log.player_action(action, amount)
+        if self.hand_db is not None or self.hand_history is not None:
+            self._note_action(PLAYER_ACTION_LETTERS, action, amount)
+        self.player_range.observe(action, self.community_cards, amount, self.pot)
+
+    def _player_call(self, to_call: int):
+        self.player_chips -= to_call
+        self.pot += to_call
+        self.player_bet = self.enemy_bet
+
+    def _player_bet(self, total_bet: int):
+        self.player_chips -= total_bet
+        self.pot += total_bet
+        self.player_bet += total_bet
+
+    def _enemy_respond(self, enemy: Enemy, amount: int) -> Tuple[str, int]:
+        """Enemy answer to a player bet: fold, call, short (can't cover it) or raise"""
+        enemy_action, enemy_amount = self._enemy_decision(enemy, amount)
+        if self.action_log is not None:
+            self.action_log.enemy_action(enemy_action, enemy_amount)
+        if self.hand_db is not None or self.hand_history is not None:
+            self._note_action(ACTION_LETTERS, enemy_action, enemy_amount)
+        return enemy_action, enemy_amount
+
+    def _enemy_strength(self, enemy: Enemy) -> float:
+        if enemy.strategy is not None and enemy.strategy.available():
+            return strategy_strength(self.enemy_hand, self.community_cards)
+        if enemy.special_ability not in RANGE_AWARE_ABILITIES:
+            return self.evaluate_hand_strength(self.enemy_hand)
+        # Equity against the hands the player's betting points to
+        rng = random.Random(self.seed.to_bytes(8, "little") + bytes(self.enemy_hand)
+                            + bytes(self.community_cards) + b"range")
+        return self.player_range.equity(self.enemy_hand, self.community_cards, rng=rng).equity
+
+    def _enemy_decision(self, enemy: Enemy, amount: int) -> Tuple[str, int]:
+        enemy_strength = self._enemy_strength(enemy)
+        enemy_action = enemy.decide_action(enemy_strength, self.pot, amount, street_index(self.community_cards))
+        if enemy_action == "raise" and enemy.chips <= 0:
+            enemy_action = "call"  # nothing left to raise with, so it comes up short
+
+        if enemy_action == "call":
+            if enemy.chips < amount:
+                return "short", 0
+            enemy.chips -= amount
+            self.pot += amount
+            self.enemy_bet = self.player_bet
+            return "call", amount
+        if enemy_action == "raise":
+            raise_amount = min(amount * 2, enemy.chips)
+            enemy.chips -= raise_amount
+            self.pot += raise_amount
+            self.enemy_bet += raise_amount
+            return "raise", raise_amount
+        return enemy_action, 0
+
+    def choose_item(self) -> Optional[int]:
+        """Slot of the unused item the player picks from the menu, or None"""
         if not self.inventory:
             animated_text("🎒 Your inventory is empty.", Colors.GRAY)
-            return
+            return None
         
-        print(f"\n{Colors.YELLOW + Colors.BOLD}🎒 INVENTORY MENU{Colors.END}")
+        renderer.write(f"\n{Colors.YELLOW + Colors.BOLD}🎒 INVENTORY MENU{Colors.END}")
         usable_items = [i for i, item in enumerate(self.inventory) if not item.used]
         
         if not usable_items:
             animated_text("All items have been used.", Colors.GRAY)
-            return
+            return None
         
         for idx in usable_items:
-            print(f"  {idx + 1}. {self.inventory[idx]}")
+            renderer.write(f"  {idx + 1}. {self.inventory[idx]}")
         
         try:
-            choice = input(f"{Colors.CYAN}Use item (number or 'back'): {Colors.END}").strip()
+            choice = renderer.input(f"{Colors.CYAN}Use item (number or 'back'): {Colors.END}").strip()
             if choice.lower() == 'back':
-                return
+                return None
             
             item_idx = int(choice) - 1
             if item_idx in usable_items:
-                effect = self.use_item(item_idx)
-                if effect == "luck_boost":
-                    return "luck_boost"
+                return item_idx
             else:
                 animated_text("❌ Invalid item or already used.", Colors.RED)
         except ValueError:
@@ -808,13 +3007,17 @@ class RoguelikePoker:
         
         return None
     
+    def _start_advisor(self, enemy: Enemy):
+        # Before the table is drawn, so the search runs while the player reads it
+        if self.advisor is not None:
+            self.advisor.start(self, enemy, self.enemy_bet - self.player_bet)
+
     def play_hand(self, enemy: Enemy) -> bool:
-        self.reset_game()
-        self.deal_hands()
-        self.stats.hands_played += 1
+        self._start_hand(enemy)
         luck_boost = False
         
         # Pre-flop
+        self._start_advisor(enemy)
         self.display_game_state(enemy)
         animated_text("🎴 Cards dealt! Let the battle begin!", Colors.CYAN)
         
@@ -828,6 +3031,7 @@ class RoguelikePoker:
         # Flop
         self.animated_deal("FLOP")
         self.deal_flop()
+        self._start_advisor(enemy)
         self.display_game_state(enemy)
         
         if not self.betting_round(enemy):
@@ -837,6 +3041,7 @@ class RoguelikePoker:
         # Turn
         self.animated_deal("TURN")
         self.deal_turn()
+        self._start_advisor(enemy)
         self.display_game_state(enemy)
         
         if not self.betting_round(enemy):
@@ -846,6 +3051,7 @@ class RoguelikePoker:
         # River
         self.animated_deal("RIVER")
         self.deal_river()
+        self._start_advisor(enemy)
         self.display_game_state(enemy)
         
         if not self.betting_round(enemy):
@@ -862,7 +3068,7 @@ class RoguelikePoker:
         
         # Apply luck boost if active
         if luck_boost and player_best.rank.value <= enemy_best.rank.value:
-            if random.random() < 0.3:  # 30% chance for luck to save you
+            if self.rng.random() < 0.3:  # 30% chance for luck to save you
                 animated_text("✨ Your luck saves you! Cards reshuffled in your favor!", Colors.YELLOW)
                 self.stats.lucky_escapes += 1
                 # Artificially boost player hand for this calculation
@@ -872,40 +3078,29 @@ class RoguelikePoker:
         else:
             player_wins = player_best > enemy_best
         
-        print(f"\n{Colors.BOLD}🎯 Comparing hands...{Colors.END}")
-        time.sleep(2)
+        renderer.write(f"\n{Colors.BOLD}🎯 Comparing hands...{Colors.END}")
+        renderer.pause(2)
         
-        # Update stats for best hand tracking
-        if not self.stats.best_hand or player_best.rank.value > self.stats.best_hand.rank.value:
-            self.stats.best_hand = player_best
+        outcome = self._settle_showdown(enemy, player_best.score, enemy_best.score, player_wins)
         
-        if player_wins:
+        if outcome == "win":
             victory_text = f"""
 {Colors.GREEN + Colors.BOLD}
     🎉 ✨ VICTORY! ✨ 🎉
     
     You win {self.pot} chips!
 {Colors.END}"""
-            print(victory_text)
-            self.player_chips += self.pot
-            self.stats.hands_won += 1
-            self.stats.total_chips_won += self.pot
-            
-            # Chance for item drop
-            if random.random() < 0.3:
-                item = self.generate_random_item()
-                self.add_item(item)
-            
+            renderer.write(victory_text)
+            self._maybe_drop_item()
             return True
-        elif not player_wins and player_best.rank != enemy_best.rank:
+        elif outcome == "loss":
             defeat_text = f"""
 {Colors.RED + Colors.BOLD}
     💀 DEFEAT! 💀
     
     {enemy.name} wins {self.pot} chips!
 {Colors.END}"""
-            print(defeat_text)
-            enemy.chips += self.pot
+            renderer.write(defeat_text)
             return False
         else:
             tie_text = f"""
@@ -914,12 +3109,46 @@ class RoguelikePoker:
     
     Pot is split!
 {Colors.END}"""
-            print(tie_text)
+            renderer.write(tie_text)
+            return True
+
+    def _settle_showdown(self, enemy: Enemy, player_score: int, enemy_score: int, player_wins: bool) -> str:
+        """Move the pot after a showdown and return "win", "loss" or "tie".
+
+        Scores are packed hand scores; equal hand ranks that the player does
+        not win are split.
+        """
+        self.showdown_ranks = (player_score >> 20, enemy_score >> 20)
+        # Update stats for best hand tracking
+        if (player_score >> 20) > (self.stats.best_hand_score >> 20):
+            self.stats.best_hand_score = player_score
+
+        if player_wins:
+            self.player_chips += self.pot
+            self.stats.hands_won += 1
+            self.stats.total_chips_won += self.pot
+            self.showdown_outcome = "win"
+        elif (player_score >> 20) != (enemy_score >> 20):
+            enemy.chips += self.pot
+            self.showdown_outcome = "loss"
+        else:
             self.player_chips += self.pot // 2
             enemy.chips += self.pot - (self.pot // 2)
-            return True
+            self.showdown_outcome = "tie"
+        return self.showdown_outcome
+
+    def _maybe_drop_item(self):
+        # Chance for item drop
+        if self.rng.random() < 0.3:
+            item = self.generate_random_item()
+            self.add_item(item)
     
-    def level_up(self):
+    def _apply_level_up(self) -> Tuple[int, int, int, int]:
+        """Advance a level and pay its rewards.
+
+        Returns the level bonus, the chip total right after it, the low-chips
+        recovery bonus and the perfect game bonus.
+        """
         self.level += 1
         self.victories += 1
         self.stats.enemies_defeated += 1
@@ -931,6 +3160,26 @@ class RoguelikePoker:
         
         bonus_chips = int((50 + (self.level * 10)) * multiplier)
         self.player_chips += bonus_chips
+        chips_after_bonus = self.player_chips
+        
+        # Recovery bonus for low health
+        heal = 0
+        if self.player_chips < 50:
+            heal = 30
+            self.player_chips += heal
+        
+        # Perfect game bonus (didn't lose a single hand)
+        perfect_bonus = 0
+        if hasattr(self, 'perfect_game_tracker') and self.perfect_game_tracker:
+            self.stats.perfect_games += 1
+            perfect_bonus = 25
+            self.player_chips += perfect_bonus
+        
+        self.perfect_game_tracker = True  # Reset for next level
+        return bonus_chips, chips_after_bonus, heal, perfect_bonus
+
+    def level_up(self):
+        bonus_chips, chips_after_bonus, heal, perfect_bonus = self._apply_level_up()
         
         level_up_art = f"""
 {Colors.YELLOW + Colors.BOLD}
@@ -940,57 +3189,33 @@ class RoguelikePoker:
     🎉                           🎉
     ✨   Level: {self.level:2d}              ✨
     🎉   Bonus: +{bonus_chips} chips        🎉
-    ✨   Total: {self.player_chips:,} chips       ✨
+    ✨   Total: {chips_after_bonus:,} chips       ✨
     🎉   Difficulty: {self.difficulty.title():>10}   🎉
     ✨🎉✨🎉✨🎉✨🎉✨🎉✨🎉✨
 {Colors.END}"""
         
         clear_screen()
-        print(level_up_art)
+        renderer.write(level_up_art)
         
-        # Recovery bonus for low health
-        if self.player_chips < 50:
-            heal = 30
-            self.player_chips += heal
-            print(f"{Colors.GREEN}💊 Recovery bonus: +{heal} chips{Colors.END}")
+        if heal:
+            renderer.write(f"{Colors.GREEN}💊 Recovery bonus: +{heal} chips{Colors.END}")
         
-        # Perfect game bonus (didn't lose a single hand)
-        if hasattr(self, 'perfect_game_tracker') and self.perfect_game_tracker:
-            self.stats.perfect_games += 1
-            perfect_bonus = 25
-            self.player_chips += perfect_bonus
-            print(f"{Colors.MAGENTA}🏆 Perfect game bonus: +{perfect_bonus} chips!{Colors.END}")
+        if perfect_bonus:
+            renderer.write(f"{Colors.MAGENTA}🏆 Perfect game bonus: +{perfect_bonus} chips!{Colors.END}")
         
         # Show mini stats
-        print(f"\n{Colors.CYAN}📊 Win Rate: {self.stats.win_rate():.1f}% | Enemies Defeated: {self.stats.enemies_defeated}{Colors.END}")
+        renderer.write(f"\n{Colors.CYAN}📊 Win Rate: {self.stats.win_rate():.1f}% | Enemies Defeated: {self.stats.enemies_defeated}{Colors.END}")
         
-        time.sleep(3)
-        self.perfect_game_tracker = True  # Reset for next level
+        renderer.pause(3)
     
     def create_enemy(self) -> Enemy:
-        enemy_types = [
-            ("Bandit", 1), ("Rogue", 2), ("Mercenary", 3), ("Assassin", 4), 
-            ("Warlord", 5), ("Shadow", 6), ("Vampire", 7), ("Demon", 8), 
-            ("Dragon", 9), ("Lich", 10)
-        ]
-        
-        # Select enemy type based on level
-        enemy_type = "Bandit"
-        for enemy_name, min_level in enemy_types:
-            if self.level >= min_level:
-                enemy_type = enemy_name
+        enemy_type = enemy_type_for_level(self.level)
         
         # Difficulty scaling
-        difficulty_multipliers = {
-            "easy": 0.8,
-            "normal": 1.0,
-            "hard": 1.3,
-            "nightmare": 1.6
-        }
-        multiplier = difficulty_multipliers.get(self.difficulty, 1.0)
+        multiplier = self.enemy_multipliers.get(self.difficulty, 1.0)
         
         name = f"{enemy_type} Lv.{self.level}"
-        enemy = Enemy(name, self.level)
+        enemy = Enemy(name, self.level, self.rng)
         enemy.chips = int(enemy.chips * multiplier)
         enemy.aggression *= multiplier
         
@@ -1014,28 +3239,34 @@ class RoguelikePoker:
     ╚══════════════════════════════════════╝
 {Colors.END}"""
         clear_screen()
-        print(game_over)
+        renderer.write(game_over)
         
         if self.level > self.high_score:
             animated_text("🎉 NEW HIGH SCORE! 🎉", Colors.YELLOW + Colors.BOLD)
         
         self.show_final_stats()
-        time.sleep(3)
+        renderer.pause(3)
     
     def show_final_stats(self):
-        print(f"\n{Colors.CYAN + Colors.BOLD}📊 FINAL STATISTICS{Colors.END}")
-        print(f"┌{'─' * 30}┐")
-        print(f"│ Hands played: {self.stats.hands_played:<13} │")
-        print(f"│ Hands won: {self.stats.hands_won:<16} │")
-        print(f"│ Win rate: {self.stats.win_rate():<17.1f}% │")
-        print(f"│ Enemies defeated: {self.stats.enemies_defeated:<9} │")
-        print(f"│ Total chips won: {self.stats.total_chips_won:<10,} │")
-        if self.stats.best_hand:
-            print(f"│ Best hand: {self.stats.best_hand.rank.name.replace('_', ' ').title():<15} │")
-        print(f"│ Lucky escapes: {self.stats.lucky_escapes:<12} │")
-        print(f"│ Perfect games: {self.stats.perfect_games:<12} │")
-        print(f"└{'─' * 30}┘")
+        renderer.write(f"\n{Colors.CYAN + Colors.BOLD}📊 FINAL STATISTICS{Colors.END}")
+        renderer.write(f"┌{'─' * 30}┐")
+        renderer.write(f"│ Hands played: {self.stats.hands_played:<13} │")
+        renderer.write(f"│ Hands won: {self.stats.hands_won:<16} │")
+        renderer.write(f"│ Win rate: {self.stats.win_rate():<17.1f}% │")
+        renderer.write(f"│ Enemies defeated: {self.stats.enemies_defeated:<9} │")
+        renderer.write(f"│ Total chips won: {self.stats.total_chips_won:<10,} │")
+        if self.stats.best_hand_rank:
+            renderer.write(f"│ Best hand: {self.stats.best_hand_rank.name.replace('_', ' ').title():<15} │")
+        renderer.write(f"│ Lucky escapes: {self.stats.lucky_escapes:<12} │")
+        renderer.write(f"│ Perfect games: {self.stats.perfect_games:<12} │")
+        renderer.write(f"└{'─' * 30}┘")
     
+    def _apply_victory_bonus(self) -> int:
+        # Ultimate victory bonus
+        ultimate_bonus = 500 * (1 if self.difficulty == "easy" else 2 if self.difficulty == "normal" else 3 if self.difficulty == "hard" else 5)
+        self.player_chips += ultimate_bonus
+        return ultimate_bonus
+
     def victory_screen(self):
         self.save_high_score()
         
@@ -1052,15 +3283,13 @@ class RoguelikePoker:
     ✨🏆✨🏆✨🏆✨🏆✨🏆✨🏆✨🏆✨
 {Colors.END}"""
         clear_screen()
-        print(victory)
+        renderer.write(victory)
         
-        # Ultimate victory bonus
-        ultimate_bonus = 500 * (1 if self.difficulty == "easy" else 2 if self.difficulty == "normal" else 3 if self.difficulty == "hard" else 5)
-        self.player_chips += ultimate_bonus
+        ultimate_bonus = self._apply_victory_bonus()
         animated_text(f"🎆 Ultimate Victory Bonus: +{ultimate_bonus:,} chips!", Colors.YELLOW + Colors.BOLD)
         
         self.show_final_stats()
-        time.sleep(5)
+        renderer.pause(5)
     
     def main_menu(self):
         while True:
@@ -1068,15 +3297,15 @@ class RoguelikePoker:
             display_title()
             
             if hasattr(self, 'high_score') and self.high_score > 0:
-                print(f"{Colors.YELLOW}🏆 High Score: Level {self.high_score}{Colors.END}")
+                renderer.write(f"{Colors.YELLOW}🏆 High Score: Level {self.high_score}{Colors.END}")
             
-            print(f"\n{Colors.BOLD}🎮 MAIN MENU{Colors.END}")
-            print(f"1. {Colors.GREEN}Start New Game{Colors.END}")
-            print(f"2. {Colors.CYAN}View Statistics{Colors.END}")
-            print(f"3. {Colors.YELLOW}How to Play{Colors.END}")
-            print(f"4. {Colors.RED}Quit{Colors.END}")
+            renderer.write(f"\n{Colors.BOLD}🎮 MAIN MENU{Colors.END}")
+            renderer.write(f"1. {Colors.GREEN}Start New Game{Colors.END}")
+            renderer.write(f"2. {Colors.CYAN}View Statistics{Colors.END}")
+            renderer.write(f"3. {Colors.YELLOW}How to Play{Colors.END}")
+            renderer.write(f"4. {Colors.RED}Quit{Colors.END}")
             
-            choice = input(f"\n{Colors.CYAN}Choose option (1-4): {Colors.END}").strip()
+            choice = renderer.input(f"\n{Colors.CYAN}Choose option (1-4): {Colors.END}").strip()
             
             if choice == "1":
                 self.difficulty_selection()
@@ -1084,16 +3313,16 @@ class RoguelikePoker:
                 return
             elif choice == "2":
                 self.show_stats()
-                input(f"\n{Colors.CYAN}Press Enter to continue...{Colors.END}")
+                renderer.input(f"\n{Colors.CYAN}Press Enter to continue...{Colors.END}")
             elif choice == "3":
                 self.show_tutorial()
-                input(f"\n{Colors.CYAN}Press Enter to continue...{Colors.END}")
+                renderer.input(f"\n{Colors.CYAN}Press Enter to continue...{Colors.END}")
             elif choice == "4":
                 animated_text("Thanks for playing! 🎴", Colors.YELLOW)
                 return
             else:
                 animated_text("❌ Invalid choice!", Colors.RED)
-                time.sleep(1)
+                renderer.pause(1)
     
     def show_tutorial(self):
         clear_screen()
@@ -1140,7 +3369,7 @@ Battle through 10 levels of enemies using Texas Hold'em poker!
 {Colors.RED + Colors.BOLD}⚠️  ONE LIFE ONLY - No saves, no continues! ⚠️{Colors.END}
         """
         
-        print(tutorial)
+        renderer.write(tutorial)
     
     def play(self):
         clear_screen()
@@ -1161,8 +3390,11 @@ Battle through 10 levels of enemies using Texas Hold'em poker!
 {Colors.END}"""
         
         slow_print(intro_text, 0.02)
-        input(f"\n{Colors.BOLD}Press Enter to begin your journey...{Colors.END}")
+        renderer.input(f"\n{Colors.BOLD}Press Enter to begin your journey...{Colors.END}")
         
+        if self.replay_path:
+            self._start_action_log()
+        self._start_hand_db_run()
         self.perfect_game_tracker = True
         
         while self.player_chips > 0:
@@ -1182,17 +3414,18 @@ Battle through 10 levels of enemies using Texas Hold'em poker!
                 encounter_text += f"\n{Colors.MAGENTA}🔮 Special Ability: {enemy.special_ability}{Colors.END}"
             
             clear_screen()
-            print(encounter_text)
+            renderer.write(encounter_text)
             enemy_art = enemy.get_ascii_art()
             for line in enemy_art:
-                print(f"    {line}")
+                renderer.write(f"    {line}")
             
-            time.sleep(2)
+            renderer.pause(2)
             
             # Battle until someone runs out of chips
             enemy_hands_won = 0
             while self.player_chips > 0 and enemy.chips > 0:
                 won = self.play_hand(enemy)
+                self._record_hand(enemy, won)
                 
                 if not won:
                     enemy_hands_won += 1
@@ -1204,30 +3437,1066 @@ Battle through 10 levels of enemies using Texas Hold'em poker!
                 if enemy.chips <= 0:
                     break
                 
-                input(f"\n{Colors.CYAN}Press Enter for next hand...{Colors.END}")
+                renderer.input(f"\n{Colors.CYAN}Press Enter for next hand...{Colors.END}")
             
             if self.player_chips <= 0:
+                self._finish_run("defeat")
                 self.game_over_screen(enemy.name)
                 break
             else:
                 animated_text(f"🎉 You defeated {enemy.name}!", Colors.GREEN)
-                time.sleep(1)
+                renderer.pause(1)
                 self.level_up()
                 
                 if self.level > 10:
                     self.victory_screen()
+                    self._finish_run("victory")
                     break
                 
-                continue_prompt = input(f"{Colors.CYAN}Continue to next level? (y/n): {Colors.END}").lower()
+                continue_prompt = renderer.input(f"{Colors.CYAN}Continue to next level? (y/n): {Colors.END}").lower()
                 if continue_prompt != 'y':
-                    print(f"{Colors.BOLD}Thanks for playing! Final level: {self.level}{Colors.END}")
+                    self._finish_run("quit")
+                    renderer.write(f"{Colors.BOLD}Thanks for playing! Final level: {self.level}{Colors.END}")
                     self.save_high_score()
                     break
 
-if __name__ == "__main__":
+class PlayerPolicy:
+    """Chooses the player's betting actions when nobody is at the keyboard.
+
+    act() sees the same information betting_round shows a human and returns
+    (action, amount) with action one of check/call/bet/raise/fold and amount
+    the bet or raise size on top of the call, or ("item", inventory slot).
+    """
+
+    def act(self, game: RoguelikePoker, enemy: Enemy, to_call: int) -> Tuple[str, int]:
+        raise NotImplementedError
+
+    def continue_run(self, game: RoguelikePoker) -> bool:
+        """Answer to "Continue to next level?" after a level is cleared"""
+        return True
+
+class EnemyAIPolicy(PlayerPolicy):
+    """Plays the player's seat with the Enemy.decide_action logic.
+
+    Enemies only ever answer bets, so with nothing to call the policy asks
+    how it would answer the smallest suggested bet: hands it would call with
+    open for that amount, hands it would raise with open for the next size up.
+    """
+
+    def __init__(self, level: int = 1):
+        self.profile = Enemy("Mirror", level, random.Random())
+        self.game_seed = None
+
+    def act(self, game, enemy, to_call):
+        strength = game.evaluate_hand_strength(game.player_hand)
+        if self.game_seed != game.seed:
+            # A stream of its own, so the game's draws don't depend on who plays it
+            self.game_seed = game.seed
+            self.profile.rng = random.Random(f"{game.seed}:policy")
+        self.profile.chips = game.player_chips
+        small_bet = max(10, to_call)
+        decision = self.profile.decide_action(strength, game.pot, to_call if to_call > 0 else small_bet)
+
+        if decision in ("raise", "call"):
+            amount = small_bet if decision == "call" or to_call > 0 else max(25, to_call * 2)
+            if to_call <= 0 and amount <= game.player_chips:
+                return "bet", amount
+            if decision == "raise" and to_call + amount <= game.player_chips:
+                return "raise", amount
+            if 0 < to_call <= game.player_chips:
+                return "call", 0
+        if to_call > 0:
+            return "fold", 0
+        return "check", 0
+
+class CheckCallPolicy(PlayerPolicy):
+    """Never bets, calls whatever it can afford"""
+
+    def act(self, game, enemy, to_call):
+        if to_call <= 0:
+            return "check", 0
+        return ("call", 0) if to_call <= game.player_chips else ("fold", 0)
+
+class ReplayPolicy(PlayerPolicy):
+    """Plays back the player actions of a recorded game, in order"""
+
+    def __init__(self, actions: List[Tuple[str, int]]):
+        self.actions = list(actions)
+        self.next_action = 0
+
+    def act(self, game, enemy, to_call):
+        if self.next_action >= len(self.actions):
+            raise RuntimeError("Replay diverged: the game asked for more actions than were recorded")
+        action = self.actions[self.next_action]
+        self.next_action += 1
+        return action
+
+    def continue_run(self, game):
+        # A recorded game only stops between levels when the player quit
+        return self.next_action < len(self.actions)
+
+# Phases HandProfiler times and the game methods that make each one up. The
+# generator methods are HeadlessPoker's steps: their frame stays open while
+# they wait on the player, so the player's decisions nest inside the hand.
+PROFILE_PHASES = {
+    "play_hand": ("play_hand", "_hand_steps"),
+    "betting_round": ("betting_round", "_betting_steps"),
+    "deal": ("deal_hands", "deal_flop", "deal_turn", "deal_river"),
+    "evaluate": ("get_best_hand", "hand_strength_with_mode"),
+    "ai_decision": ("_enemy_decision",),
+    "render": ("display_game_state", "animated_deal"),
+}
+# Timed on the shared renderer
+RENDERER_PHASES = {"render": ("flush",), "io_wait": ("input", "pause", "slow_print")}
+
+class HandProfiler:
+    """Wall time and call counts per phase of a hand, keyed by call stack.
+
+    attach() shadows the methods in PROFILE_PHASES (and the player policy's
+    act) with timed wrappers on the game instance itself, and detach()
+    removes them, so a game that was never attached runs exactly the code it
+    always did. A phase entered again directly inside itself is counted
+    once. Counters are plain ints keyed by stack tuples and can be merged
+    across processes; write() saves them as JSON or as collapsed stacks for
+    flame graph tools. Stacks assume one game played at a time.
+    """
+
+    def __init__(self):
+        self.counters = {}  # stack tuple -> [calls, nanoseconds]
+        self.path = ()
+        self.attached = []
+
+    def _timed(self, phase: str, method):
+        from inspect import isgeneratorfunction
+
+        profiler = self
+        counters = self.counters
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            outer = profiler.path
+            if outer[-1:] == (phase,):
+                return method(*args, **kwargs)
+            path = profiler.path = outer + (phase,)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                entry = counters.get(path) or counters.setdefault(path, [0, 0])
+                entry[0] += 1
+                entry[1] += clock() - start
+                profiler.path = outer
+
+        def timed_steps(*args, **kwargs):
+            outer = profiler.path
+            if outer[-1:] == (phase,):
+                return (yield from method(*args, **kwargs))
+            path = profiler.path = outer + (phase,)
+            start = clock()
+            try:
+                return (yield from method(*args, **kwargs))
+            finally:
+                entry = counters.get(path) or counters.setdefault(path, [0, 0])
+                entry[0] += 1
+                entry[1] += clock() - start
+                profiler.path = outer
+
+        return timed_steps if isgeneratorfunction(method) else timed
+
+    def _wrap(self, target, phases: Dict[str, Tuple[str, ...]]):
+        for phase, names in phases.items():
+            for name in names:
+                method = getattr(target, name, None)
+                if method is not None and name not in vars(target):
+                    setattr(target, name, self._timed(phase, method.__func__).__get__(target))
+                    self.attached.append((target, name))
+
+    def attach(self, game: "RoguelikePoker"):
+        self._wrap(game, PROFILE_PHASES)
+        if getattr(game, "policy", None) is not None:
+            self._wrap(game.policy, {"ai_decision": ("act",)})
+        self._wrap(renderer, RENDERER_PHASES)
+
+    def detach(self):
+        for target, name in self.attached:
+            delattr(target, name)
+        self.attached.clear()
+
+    def merge(self, other: "HandProfiler"):
+        for path, (calls, nanoseconds) in other.counters.items():
+            entry = self.counters.setdefault(path, [0, 0])
+            entry[0] += calls
+            entry[1] += nanoseconds
+
+    def __getstate__(self):
+        # Workers send counters back; the wrapped objects stay behind
+        return {"counters": self.counters, "path": (), "attached": []}
+
+    def self_times(self) -> Dict[Tuple[str, ...], int]:
+        """Nanoseconds spent in each stack outside the phases nested under it"""
+        own = {path: nanoseconds for path, (_, nanoseconds) in self.counters.items()}
+        for path, (_, nanoseconds) in self.counters.items():
+            if path[:-1] in own:
+                own[path[:-1]] -= nanoseconds
+        return own
+
+    def phases(self) -> Dict[str, Tuple[int, float]]:
+        """(calls, seconds) per phase; time a phase spends inside itself is counted once"""
+        totals = {}
+        for path, (calls, nanoseconds) in self.counters.items():
+            if path[-1] not in path[:-1]:
+                before = totals.get(path[-1], (0, 0))
+                totals[path[-1]] = (before[0] + calls, before[1] + nanoseconds)
+        return {phase: (calls, nanoseconds / 1e9) for phase, (calls, nanoseconds) in totals.items()}
+
+    def to_dict(self) -> Dict:
+        own = self.self_times()
+        return {
+            "phases": {phase: {"calls": calls, "seconds": seconds}
+                       for phase, (calls, seconds) in self.phases().items()},
+            "stacks": {";".join(path): {"calls": calls, "seconds": nanoseconds / 1e9,
+                                        "self_seconds": own[path] / 1e9}
+                       for path, (calls, nanoseconds) in self.counters.items()},
+        }
+
+    def collapsed(self) -> str:
+        """One "phase;phase;phase microseconds" line per stack, in self time"""
+        return "".join(f"{';'.join(path)} {nanoseconds // 1000}\n"
+                       for path, nanoseconds in sorted(self.self_times().items()) if nanoseconds >= 1000)
+
+    def write(self, path: str):
+        """JSON if path ends in .json, collapsed stacks otherwise"""
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                import json
+                json.dump(self.to_dict(), f, indent=2)
+            else:
+                f.write(self.collapsed())
+
+    def summary(self) -> str:
+        lines = ["Phase          Calls       Seconds  Per call"]
+        for phase, (calls, seconds) in sorted(self.phases().items(), key=lambda item: -item[1][1]):
+            lines.append(f"{phase:<13}  {calls:<10,}  {seconds:>7.3f}  {seconds / calls * 1e6:>7.1f}us")
+        return "\n".join(lines)
+
+class SimulationReport:
+    """Aggregate results of headless runs"""
+
+    def __init__(self):
+        self.runs = 0
+        self.victories = 0
+        self.stalled = 0
+        self.hands = 0
+        self.elapsed = 0.0
+        self.final_levels = Counter()
+        self.level_hands = Counter()
+        self.level_wins = Counter()
+        self.enemy_hands = Counter()
+        self.enemy_wins = Counter()
+        self.difficulty_runs = Counter()
+        self.difficulty_victories = Counter()
+        self.difficulty_hands = Counter()
+        self.difficulty_wins = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.profile = None  # HandProfiler of the runs, when they were profiled
+
+    def record_hand(self, level: int, enemy: Enemy, won: bool, difficulty: str = "normal"):
+        enemy_type = enemy.name.split()[0]
+        self.hands += 1
+        self.level_hands[level] += 1
+        self.enemy_hands[enemy_type] += 1
+        self.difficulty_hands[difficulty] += 1
+        if won:
+            self.level_wins[level] += 1
+            self.enemy_wins[enemy_type] += 1
+            self.difficulty_wins[difficulty] += 1
+
+    def record_run(self, final_level: int, outcome: str, difficulty: str = "normal"):
+        self.runs += 1
+        self.final_levels[final_level] += 1
+        self.difficulty_runs[difficulty] += 1
+        if outcome == "victory":
+            self.victories += 1
+            self.difficulty_victories[difficulty] += 1
+        elif outcome == "stalled":
+            self.stalled += 1
+
+    def merge(self, other: "SimulationReport"):
+        """Add another report's counts into this one (elapsed time is left alone)"""
+        self.runs += other.runs
+        self.victories += other.victories
+        self.stalled += other.stalled
+        self.hands += other.hands
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        for name in ("final_levels", "level_hands", "level_wins", "enemy_hands", "enemy_wins",
+                     "difficulty_runs", "difficulty_victories", "difficulty_hands", "difficulty_wins"):
+            getattr(self, name).update(getattr(other, name))
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = HandProfiler()
+            self.profile.merge(other.profile)
+
+    @property
+    def hands_per_second(self) -> float:
+        return self.hands / self.elapsed if self.elapsed > 0 else 0.0
+
+    def level_win_rates(self) -> Dict[int, float]:
+        return {level: self.level_wins[level] / hands for level, hands in sorted(self.level_hands.items())}
+
+    def summary(self) -> str:
+        lines = [
+            f"Runs: {self.runs:,}  Victories: {self.victories:,}  Stalled: {self.stalled:,}",
+            f"Hands: {self.hands:,} in {self.elapsed:.2f}s ({self.hands_per_second:,.0f} hands/sec)",
+            f"Evaluation cache: {self.cache_hits:,} hits, {self.cache_misses:,} misses",
+            "Level  Hands      Win rate  Runs ended here",
+        ]
+        for level, rate in self.level_win_rates().items():
+            lines.append(f"{level:>5}  {self.level_hands[level]:<9,}  {rate:>7.1%}  {self.final_levels[level]:,}")
+        if len(self.difficulty_runs) > 1:
+            lines.append("Difficulty  Runs      Victories  Hand win rate")
+            for difficulty, runs in self.difficulty_runs.items():
+                hands = max(self.difficulty_hands[difficulty], 1)
+                lines.append(f"{difficulty:<10}  {runs:<8,}  {self.difficulty_victories[difficulty] / runs:>9.1%}"
+                             f"  {self.difficulty_wins[difficulty] / hands:>13.1%}")
+        return "\n".join(lines)
+
+class HeadlessPoker(RoguelikePoker):
+    """RoguelikePoker with a PlayerPolicy in the player's seat and no I/O.
+
+    Runs follow the same betting, showdown and level-up rules as play(), but
+    never print, sleep, prompt or touch the save file. A level that is still
+    undecided after max_hands_per_level hands ends the run as "stalled".
+    """
+
+    def __init__(self, policy: Optional[PlayerPolicy] = None, difficulty: str = "normal",
+                 strength_model: str = "heuristic", max_hands_per_level: int = 1000,
+                 report: Optional[SimulationReport] = None,
+                 enemy_multipliers: Optional[Dict[str, float]] = None, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.policy = policy or EnemyAIPolicy()
+        self.difficulty = difficulty
+        self.enemy_multipliers = enemy_multipliers or ENEMY_DIFFICULTY_MULTIPLIERS
+        self.player_chips = DIFFICULTY_STARTING_CHIPS[difficulty]
+        self.strength_model = strength_model
+        self.max_hands_per_level = max_hands_per_level
+        self.report = report or SimulationReport()
+        self.emit_events = False  # only requests are yielded to a policy
+        self.enemy = None
+
+    def load_high_score(self):
+        self.high_score = 0
+        self.best_run_stats = {}
+
+    def save_high_score(self):
+        pass
+
+    def add_item(self, item):
+        self.inventory.append(item)
+
+    def _start_action_log(self):
+        self.action_log = ActionLog(self.seed, self.difficulty, self.strength_model, self.max_hands_per_level)
+
+    def apply_item_effect(self, item):
+        return self._apply_item(item)[0]
+
+    # The rules run as generators of event tuples (see EVENT_FIELDS). Requests
+    # ("act", "continue") are answered through send(); the other events are
+    # only yielded when emit_events is set and are resumed with next().
+    # _drive answers requests with the policy, DuelSession lets a frontend
+    # answer them. _betting_steps is RoguelikePoker's, shared with the terminal.
+
+    def _hand_steps(self, enemy: Enemy):
+        """One hand; returns whether the player won or split it"""
+        self.enemy = enemy
+        self._start_hand(enemy)
+        emit = self.emit_events
+        if emit:
+            yield ("hand", self.stats.hands_played, self.level, enemy.name, self.player_chips, enemy.chips)
+            yield ("deal", "pre_flop", tuple(self.player_hand))
+
+        for deal in (None, self.deal_flop, self.deal_turn, self.deal_river):
+            if deal:
+                deal()
+                if emit:
+                    yield ("deal", self.game_phase, tuple(self.community_cards))
+            if not (yield from self._betting_steps(enemy)):
+                enemy.chips += self.pot
+                if emit:
+                    yield ("hand_over", False, self.pot, self.player_chips, enemy.chips)
+                return False
+
+        self.game_phase = "showdown"
+        player_score = hand_evaluator.score([*self.player_hand, *self.community_cards])
+        enemy_score = hand_evaluator.score([*self.enemy_hand, *self.community_cards])
+        outcome = self._settle_showdown(enemy, player_score, enemy_score, player_score > enemy_score)
+        if emit:
+            yield ("showdown", outcome, HandRank(player_score >> 20).name, HandRank(enemy_score >> 20).name,
+                   tuple(self.enemy_hand))
+        if outcome == "win":
+            items = len(self.inventory)
+            self._maybe_drop_item()
+            if emit and len(self.inventory) > items:
+                yield ("found", items, self.inventory[items].name)
+        if emit:
+            yield ("hand_over", outcome != "loss", self.pot, self.player_chips, enemy.chips)
+        return outcome != "loss"
+
+    def _run_steps(self):
+        """One full run; returns "victory", "defeat", "quit" or "stalled" """
+        self._start_hand_db_run()
+        self.perfect_game_tracker = True
+
+        while True:
+            enemy = self.create_enemy()
+            for _ in range(self.max_hands_per_level):
+                won = yield from self._hand_steps(enemy)
+                self.report.record_hand(self.level, enemy, won, self.difficulty)
+                self._record_hand(enemy, won)
+                if not won:
+                    self.perfect_game_tracker = False
+                if self.player_chips <= 0 or enemy.chips <= 0:
+                    break
+
+            if self.player_chips <= 0:
+                outcome = "defeat"
+                break
+            if enemy.chips > 0:
+                outcome = "stalled"
+                break
+            bonus, _, heal, perfect_bonus = self._apply_level_up()
+            if self.emit_events:
+                yield ("level_up", self.level, bonus, heal, perfect_bonus)
+            if self.level > 10:
+                self._apply_victory_bonus()
+                outcome = "victory"
+                break
+            if not (yield ("continue", self.level)):
+                outcome = "quit"
+                break
+
+        self._finish_run(outcome)
+        self.report.record_run(self.level, outcome, self.difficulty)
+        self.report.cache_hits += self.hand_cache.hits
+        self.report.cache_misses += self.hand_cache.misses
+        yield ("run_over", outcome, self.level, self.player_chips)
+        return outcome
+
+    def _drive(self, steps):
+        """Run steps to the end with the policy answering its requests"""
+        send, act = steps.send, self.policy.act
+        event = next(steps)
+        try:
+            while True:
+                if event[0] == "act":
+                    event = send(act(self, self.enemy, event[1]))
+                elif event[0] == "continue":
+                    event = send(self.policy.continue_run(self))
+                else:
+                    event = next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+    def betting_round(self, enemy: Enemy) -> bool:
+        self.enemy = enemy
+        return self._drive(self._betting_steps(enemy))
+
+    def play_hand(self, enemy: Enemy) -> bool:
+        return self._drive(self._hand_steps(enemy))
+
+    def play(self) -> str:
+        """Play one full run and return "victory", "defeat", "quit" or "stalled" """
+        return self._drive(self._run_steps())
+
+DUEL_PORT = 8765
+# Field names of the events HeadlessPoker's step generators yield, after the
+# kind. "act" and "continue" are requests for the player.
+EVENT_FIELDS = {
+    "hand": ("hand", "level", "enemy", "player_chips", "enemy_chips"),
+    "deal": ("street", "cards"),
+    "act": ("to_call", "pot", "player_chips"),
+    "item": ("slot", "effect"),
+    "enemy": ("action", "amount"),
+    "showdown": ("outcome", "player_rank", "enemy_rank", "enemy_cards"),
+    "found": ("slot", "item"),
+    "hand_over": ("won", "pot", "player_chips", "enemy_chips"),
+    "level_up": ("level", "bonus", "heal", "perfect_bonus"),
+    "continue": ("level",),
+    "run_over": ("outcome", "level", "chips"),
+    "error": ("message",),
+}
+
+def event_dict(event: Tuple) -> Dict:
+    """An event tuple as {"event": kind, field: value, ...}"""
+    return {"event": event[0], **dict(zip(EVENT_FIELDS[event[0]], event[1:]))}
+
+class DuelSession:
+    """A HeadlessPoker run played by a frontend, one request at a time.
+
+    Nothing blocks: start(), act() and continue_run() play the game up to its
+    next request and return the events since the last call, ending with the
+    request or with "run_over". Any number of sessions can share a thread
+    or an event loop.
+    """
+
+    def __init__(self, game: HeadlessPoker):
+        self.game = game
+        game.emit_events = True
+        self.steps = game._run_steps()
+        self.request = None
+
+    @property
+    def finished(self) -> bool:
+        return self.request is not None and self.request[0] == "run_over"
+
+    def _advance(self, event) -> List[Tuple]:
+        events = [event]
+        while event[0] not in ("act", "continue", "run_over"):
+            event = next(self.steps)
+            events.append(event)
+        self.request = event
+        return events
+
+    def start(self) -> List[Tuple]:
+        return self._advance(next(self.steps))
+
+    def act(self, action: str, amount: int = 0) -> List[Tuple]:
+        """Answer an "act" request. An action the spot doesn't allow raises
+        ValueError and leaves the game as it was."""
+        if self.request is None or self.request[0] != "act":
+            raise ValueError("The game is not waiting for an action")
+        self.game.check_action(self.request[1], action, amount)
+        return self._advance(self.steps.send((action, amount)))
+
+    def continue_run(self, keep_going: bool) -> List[Tuple]:
+        """Answer a "continue" request"""
+        if self.request is None or self.request[0] != "continue":
+            raise ValueError("The game is not asking whether to continue")
+        return self._advance(self.steps.send(keep_going))
+
+async def drive_session(session: DuelSession, player) -> str:
+    """Play a session to its end and return the outcome.
+
+    player(session, events) is awaited with each batch of events and returns
+    (action, amount) for an "act" request or a bool for "continue". Rejected
+    answers come back as an "error" event followed by the same request. The
+    last batch, ending in "run_over", is passed on too and its answer ignored.
+    """
+    events = session.start()
+    while not session.finished:
+        answer = await player(session, events)
+        try:
+            if session.request[0] == "continue":
+                events = session.continue_run(answer)
+            else:
+                events = session.act(*answer)
+        except ValueError as e:
+            events = [("error", str(e)), session.request]
+    await player(session, events)
+    return session.request[1]
+
+async def play_sessions(games: List[HeadlessPoker], player) -> List[str]:
+    """Play many games at once on the running event loop, see drive_session"""
+    import asyncio
+
+    return await asyncio.gather(*(drive_session(DuelSession(game), player) for game in games))
+
+def parse_answer(line: str, request: Tuple):
+    """A text answer such as "call", "bet 25", "item 0" or "y" as drive_session expects it"""
+    words = line.lower().split()
+    if request[0] == "continue":
+        return bool(words) and words[0] in ("y", "yes")
+    if not words:
+        return "", 0
+    try:
+        return words[0], int(words[1]) if len(words) > 1 else 0
+    except ValueError:
+        return words[0], -1
+
+async def serve_duels(host: str = "127.0.0.1", port: int = DUEL_PORT, **game_options):
+    """Host duels over TCP, one game per connection, all on one event loop.
+
+    The server writes every event as a JSON line and reads one answer line
+    per request, in parse_answer's format. game_options go to HeadlessPoker.
+    """
+    import asyncio
+    import json
+
+    async def handle(reader, writer):
+        async def remote_player(session, events):
+            writer.write(b"".join(json.dumps(event_dict(event)).encode() + b"\n" for event in events))
+            await writer.drain()
+            if session.finished:
+                return None
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError("Player disconnected")
+            return parse_answer(line.decode(errors="replace"), session.request)
+
+        try:
+            await drive_session(DuelSession(HeadlessPoker(None, **game_options)), remote_player)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Serving duels on {host}:{server.sockets[0].getsockname()[1]}")  # port 0 picks a free one
+    async with server:
+        await server.serve_forever()
+
+def simulate_runs(runs: int, difficulty: str = "normal", policy: Optional[PlayerPolicy] = None,
+                  strength_model: str = "heuristic", max_hands_per_level: int = 1000,
+                  enemy_multipliers: Optional[Dict[str, float]] = None,
+                  seed: Optional[int] = None, database: Optional[str] = None,
+                  history: Optional[str] = None, profile: bool = False) -> SimulationReport:
+    """Play `runs` full headless runs and collect throughput and balance numbers.
+
+    With a seed every run gets its own game seed drawn from it, so the whole
+    batch is reproducible. With a database path every run and hand is also
+    logged there (see HandDatabase), and with a history directory every hand
+    is written there as text (see HandHistoryWriter). With profile, the
+    report's profile holds the phase timings of every hand (see HandProfiler).
+    """
+    report = SimulationReport()
+    if profile:
+        report.profile = HandProfiler()
+    seeds = random.Random(seed)
+    hand_db = HandDatabase(database, bulk=True) if database else None
+    hand_history = HandHistoryWriter(history) if history else None
+    start = time.perf_counter()
+    for _ in range(runs):
+        game = HeadlessPoker(policy, difficulty, strength_model, max_hands_per_level, report,
+                             enemy_multipliers, seeds.getrandbits(64))
+        game.hand_db = hand_db
+        game.hand_history = hand_history
+        if profile:
+            report.profile.attach(game)
+        game.play()
+        if profile:
+            report.profile.detach()
+    if hand_db is not None:
+        hand_db.close()
+    if hand_history is not None:
+        hand_history.close()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def _tournament_chunk(task) -> SimulationReport:
+    """Worker entry point: one seeded batch of runs at one difficulty"""
+    (seed, difficulty, runs, policy, strength_model, max_hands_per_level, enemy_multipliers, database, history,
+     profile) = task
+    return simulate_runs(runs, difficulty, policy, strength_model, max_hands_per_level, enemy_multipliers, seed,
+                         database, history, profile)
+
+def replay_game(path: str = REPLAY_PATH) -> Tuple[bool, str]:
+    """Re-run a recorded game headlessly and check it plays out the same.
+
+    The recorded seed, setup and player actions are fed to HeadlessPoker,
+    whose own log must match the recording byte for byte. A recording cut
+    short by an interruption only has to match as far as it goes. Returns
+    (matched, description).
+    """
+    recorded = ActionLog.load(path)
+    policy = ReplayPolicy(recorded.player_actions())
+    game = HeadlessPoker(policy, recorded.difficulty,
+                         recorded.strength_model, recorded.max_hands_per_level or sys.maxsize,
+                         seed=recorded.seed)
+    game._start_action_log()
+    start = time.perf_counter()
+    try:
+        game.play()
+        error = None
+    except RuntimeError as e:
+        error = str(e)
+    elapsed = time.perf_counter() - start
+
+    expected, actual = list(recorded.events()), list(game.action_log.events())
+    if recorded.outcome() is None and policy.next_action == len(policy.actions):
+        # The player stopped here; whatever the replay did after its last action was never recorded
+        error, actual = None, actual[:len(expected)]
+    if error is None and expected == actual:
+        outcome, level, chips = recorded.outcome() or ("unfinished", game.level, game.player_chips)
+        return True, (f"Replay matches: {outcome} at level {level} with {chips} chips "
+                      f"({game.stats.hands_played} hands in {elapsed * 1000:.1f} ms)")
+
+    mismatch = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                    min(len(expected), len(actual)))
+    details = [f"Replay diverged at event {mismatch}:"]
+    if mismatch < len(expected):
+        details.append(f"  recorded: {expected[mismatch]}")
+    if mismatch < len(actual):
+        details.append(f"  replayed: {actual[mismatch]}")
+    if error:
+        details.append(f"  {error}")
+    return False, "\n".join(details)
+
+def run_tournament(runs: int, difficulties=("normal",), workers: Optional[int] = None, seed: int = 0,
+                   policy: Optional[PlayerPolicy] = None, strength_model: str = "heuristic",
+                   max_hands_per_level: int = 1000, enemy_multipliers: Optional[Dict[str, float]] = None,
+                   chunk_size: int = 25, database: Optional[str] = None,
+                   history: Optional[str] = None, profile: bool = False) -> SimulationReport:
+    """Spread `runs` headless runs per difficulty over a process pool.
+
+    Runs are cut into chunks of chunk_size, and each chunk seeds its own
+    random stream from (seed, difficulty, chunk number). Results therefore
+    don't depend on the worker count or on scheduling. Workers send back
+    SimulationReport counters, never game logs, and they are merged here.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = []
+    for difficulty in difficulties:
+        for chunk, first_run in enumerate(range(0, runs, chunk_size)):
+            chunk_seed = random.Random(f"{seed}:{difficulty}:{chunk}").getrandbits(64)
+            tasks.append((chunk_seed, difficulty, min(chunk_size, runs - first_run), policy,
+                          strength_model, max_hands_per_level, enemy_multipliers, database, history, profile))
+
+    report = SimulationReport()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=hand_evaluator.precompute) as pool:
+        for chunk_report in pool.map(_tournament_chunk, tasks):
+            report.merge(chunk_report)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def resolve_side_pots(contributions: List[int], folded: List[bool]) -> List[Tuple[int, List[int]]]:
+    """Split what each seat put in into (amount, eligible seats) pots, main pot first.
+
+    Every distinct amount a live seat put in closes a layer: each seat pays
+    into a layer up to its own contribution, and live seats that covered it
+    can win it. Chips above the last live contribution (an uncalled bet, or
+    dead money from folds) join the layer below.
+    """
+    levels = sorted({amount for amount, out in zip(contributions, folded) if not out and amount > 0})
+    pots = []
+    previous = 0
+    for level in levels:
+        amount = sum(min(paid, level) - min(paid, previous) for paid in contributions)
+        eligible = [seat for seat, paid in enumerate(contributions) if not folded[seat] and paid >= level]
+        pots.append((amount, eligible))
+        previous = level
+    leftover = sum(paid - min(paid, previous) for paid in contributions)
+    if leftover:
+        if pots:
+            amount, eligible = pots[-1]
+            pots[-1] = (amount + leftover, eligible)
+        else:  # everyone folded; the money goes back to whoever put it in
+            pots = [(paid, [seat]) for seat, paid in enumerate(contributions) if paid]
+    return pots
+
+def award_pots(pots: List[Tuple[int, List[int]]], scores: List[int]) -> List[int]:
+    """Chips won by each seat: each pot goes to its best eligible score, split
+    evenly on ties with odd chips to the earliest seats"""
+    winnings = [0] * len(scores)
+    for amount, eligible in pots:
+        best = max(scores[seat] for seat in eligible)
+        winners = [seat for seat in eligible if scores[seat] == best]
+        share, odd = divmod(amount, len(winners))
+        for i, seat in enumerate(winners):
+            winnings[seat] += share + (1 if i < odd else 0)
+    return winnings
+
+class TableReport:
+    """Aggregate results of multi-seat table hands"""
+
+    def __init__(self):
+        self.hands = 0
+        self.showdowns = 0
+        self.rebuys = 0
+        self.elapsed = 0.0
+        self.pot_counts = Counter()
+        self.seat_hands = Counter()
+        self.seat_wins = Counter()
+        self.seat_net = Counter()
+
+    @property
+    def hands_per_second(self) -> float:
+        return self.hands / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"Hands: {self.hands:,} in {self.elapsed:.2f}s ({self.hands_per_second:,.0f} hands/sec)",
+            f"Showdowns: {self.showdowns:,}  Rebuys: {self.rebuys:,}",
+            "Pots per hand: " + ", ".join(f"{pots}: {count:,}" for pots, count in sorted(self.pot_counts.items())),
+            "Enemy       Hands      Won      Net chips/hand",
+        ]
+        for enemy_type, _ in ENEMY_TYPES:
+            hands = self.seat_hands[enemy_type]
+            if hands:
+                lines.append(f"{enemy_type:<10}  {hands:<9,}  {self.seat_wins[enemy_type] / hands:>6.1%}"
+                             f"  {self.seat_net[enemy_type] / hands:>+10.2f}")
+        return "\n".join(lines)
+
+class PokerTable:
+    """A 2 to 9 seat hold'em table where every seat is an Enemy AI.
+
+    Hands follow table rules rather than the roguelike duel: a rotating
+    button, blinds, betting rounds that close once every live seat has
+    matched the bet (at most MAX_RAISES raises a street), all-ins and side
+    pots. All live hands are scored in a single pass at showdown. Seats that
+    bust buy back in for starting_chips so the table stays full.
+    """
+
+    MAX_RAISES = 4
+
+    def __init__(self, seats: int = 6, starting_chips: int = 200, blinds: Tuple[int, int] = (5, 10),
+                 strength_model: str = "heuristic", seed: Optional[int] = None,
+                 levels: Optional[List[int]] = None, report: Optional[TableReport] = None):
+        if not 2 <= seats <= 9:
+            raise ValueError("A table seats 2 to 9 players")
+        self.seed = (random.getrandbits(64) if seed is None else seed) % (1 << 64)
+        self.rng = random.Random(self.seed)
+        self.deck = Deck(random.Random(f"{self.seed}:deck"))
+        self.equity_engine = EquityEngine(iterations=300, time_budget=None,
+                                          rng=random.Random(f"{self.seed}:equity"))
+        self.strength_model = strength_model
+        self.starting_chips = starting_chips
+        self.small_blind, self.big_blind = blinds
+        levels = levels or [seat % 10 + 1 for seat in range(seats)]
+        self.enemies = [Enemy(f"{enemy_type_for_level(level)} Lv.{level}", level, self.rng) for level in levels]
+        for enemy in self.enemies:
+            enemy.chips = starting_chips
+        self.button = 0
+        self.report = report or TableReport()
+        self.holes = [array('B') for _ in range(seats)]
+        self.board = array('B')
+        self.burned = array('B')
+
+    def _strength(self, seat: int, opponents: int, to_call: int) -> float:
+        # The strategy table only answers bets; with nothing to call decide_action
+        # falls back to thresholds that strategy_strength isn't scaled for
+        strategy = self.enemies[seat].strategy
+        table = to_call > 0 and strategy is not None and strategy.available()
+        key = (seat, len(self.board), table)
+        strength = self.strengths.get(key)
+        if strength is None:
+            if table:
+                strength = strategy_strength(self.holes[seat], self.board)
+            elif self.strength_model == "equity":
+                strength = self.equity_engine.equity(self.holes[seat], self.board, opponents).equity
+            else:
+                strength = heuristic_hand_strength(self.holes[seat], self.board)
+            self.strengths[key] = strength
+        return strength
+
+    def _commit(self, seat: int, amount: int):
+        amount = min(amount, self.enemies[seat].chips)
+        self.enemies[seat].chips -= amount
+        self.street_bets[seat] += amount
+        self.contributions[seat] += amount
+
+    def _betting_round(self, first: int, current_bet: int):
+        seats = len(self.enemies)
+        min_raise = self.big_blind
+        raises = 0
+        pending = {seat for seat in range(seats) if not self.folded[seat] and self.enemies[seat].chips > 0}
+        seat = first
+        while pending and self.live > 1:
+            if seat in pending:
+                pending.discard(seat)
+                enemy = self.enemies[seat]
+                to_call = current_bet - self.street_bets[seat]
+                action = enemy.decide_action(self._strength(seat, self.live - 1, to_call),
+                                             sum(self.contributions), to_call, street_index(self.board))
+                if action == "raise" and raises < self.MAX_RAISES and enemy.chips > to_call:
+                    self._commit(seat, to_call + max(min_raise, current_bet))
+                    if self.street_bets[seat] > current_bet:
+                        min_raise = max(min_raise, self.street_bets[seat] - current_bet)
+                        current_bet = self.street_bets[seat]
+                        raises += 1
+                        pending = {other for other in range(seats) if other != seat
+                                   and not self.folded[other] and self.enemies[other].chips > 0}
+                elif action == "fold" and to_call > 0:
+                    self.folded[seat] = True
+                    self.live -= 1
+                else:
+                    self._commit(seat, to_call)
+            seat = (seat + 1) % seats
+
+    def play_hand(self) -> List[int]:
+        """Play one hand and return each seat's net chip change"""
+        seats = len(self.enemies)
+        for enemy in self.enemies:
+            if enemy.chips <= 0:
+                enemy.chips = self.starting_chips
+                self.report.rebuys += 1
+        chips_before = [enemy.chips for enemy in self.enemies]
+
+        self.deck.reset()
+        del self.board[:], self.burned[:]
+        for hole in self.holes:
+            del hole[:]
+            self.deck.deal_into(hole, 2)
+        self.strengths = {}
+        self.contributions = [0] * seats
+        self.street_bets = [0] * seats
+        self.folded = [False] * seats
+        self.live = seats
+
+        # Heads-up the button posts the small blind
+        small = self.button if seats == 2 else (self.button + 1) % seats
+        big = (small + 1) % seats
+        self._commit(small, self.small_blind)
+        self._commit(big, self.big_blind)
+        self._betting_round((big + 1) % seats, self.big_blind)
+
+        for count in (3, 1, 1):
+            if self.live == 1:
+                break
+            self.deck.deal_into(self.burned, 1)
+            self.deck.deal_into(self.board, count)
+            self.street_bets = [0] * seats
+            # Once all but one live seat are all in there is nobody left to bet against
+            if sum(not out and enemy.chips > 0 for out, enemy in zip(self.folded, self.enemies)) > 1:
+                self._betting_round((self.button + 1) % seats, 0)
+
+        pots = resolve_side_pots(self.contributions, self.folded)
+        if self.live > 1:
+            score = hand_evaluator.score
+            scores = [-1 if out else score([*hole, *self.board]) for hole, out in zip(self.holes, self.folded)]
+            self.report.showdowns += 1
+        else:
+            scores = [0] * seats
+        for seat, won in enumerate(award_pots(pots, scores)):
+            self.enemies[seat].chips += won
+
+        self.button = (self.button + 1) % seats
+        net = [enemy.chips - before for enemy, before in zip(self.enemies, chips_before)]
+        self.report.hands += 1
+        self.report.pot_counts[len(pots)] += 1
+        for enemy, change in zip(self.enemies, net):
+            enemy_type = enemy.name.split()[0]
+            self.report.seat_hands[enemy_type] += 1
+            self.report.seat_net[enemy_type] += change
+            if change > 0:
+                self.report.seat_wins[enemy_type] += 1
+        return net
+
+def simulate_table(hands: int, seats: int = 6, strength_model: str = "heuristic",
+                   seed: Optional[int] = None, starting_chips: int = 200) -> TableReport:
+    """Play `hands` hands at one table of enemy AIs and report throughput and results"""
+    table = PokerTable(seats, starting_chips, strength_model=strength_model, seed=seed)
+    start = time.perf_counter()
+    for _ in range(hands):
+        table.play_hand()
+    table.report.elapsed = time.perf_counter() - start
+    return table.report
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Roguelike Poker")
+    parser.add_argument("--simulate", type=int, metavar="RUNS",
+                        help="play RUNS headless runs with the enemy AI in your seat and report hands/sec")
+    parser.add_argument("--table", type=int, choices=range(2, 10), metavar="SEATS",
+                        help="with --simulate, play that many hands at a table of 2-9 enemy AIs instead")
+    parser.add_argument("--difficulty", choices=list(DIFFICULTY_STARTING_CHIPS) + ["all"], default="normal",
+                        help="difficulty to simulate, or all of them")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for --simulate (0 uses every core)")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the game, or the base seed for --simulate (default 0 there)")
+    parser.add_argument("--record", nargs="?", const=REPLAY_PATH, metavar="PATH",
+                        help=f"save an action log of the game for --replay (default {REPLAY_PATH})")
+    parser.add_argument("--replay", metavar="PATH", help="re-run a recorded game headlessly and verify it")
+    parser.add_argument("--strength-model", choices=["heuristic", "equity"], default="heuristic",
+                        help="hand strength model for simulated decisions")
+    parser.add_argument("--speed", type=float, default=1.0, metavar="SCALE",
+                        help="multiply animation delays by SCALE (0 turns animation off)")
+    parser.add_argument("--analytics", nargs="?", const=ANALYTICS_PATH, metavar="PATH",
+                        help=f"log every run and hand to a SQLite database (default {ANALYTICS_PATH})")
+    parser.add_argument("--stats", nargs="?", const=ANALYTICS_PATH, metavar="PATH",
+                        help="print win rates and hand frequencies from an analytics database")
+    parser.add_argument("--history", nargs="?", const=HAND_HISTORY_DIR, metavar="DIR",
+                        help=f"write every hand as a text hand history under DIR (default {HAND_HISTORY_DIR})")
+    parser.add_argument("--read-history", nargs="+", metavar="PATH",
+                        help="stream hand history files or directories and print a summary")
+    parser.add_argument("--serve", type=int, nargs="?", const=DUEL_PORT, metavar="PORT",
+                        help=f"host duels over TCP as JSON lines (default port {DUEL_PORT})")
+    parser.add_argument("--advisor", type=float, nargs="?", const=150, metavar="MS",
+                        help="show each betting action's EV before you act, searched for MS milliseconds "
+                             "(default 150)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="time the phases of every hand and write them to PATH: JSON if it ends in .json, "
+                             "otherwise collapsed stacks for flame graph tools")
+    args = parser.parse_args()
+    if args.profile and (args.table or args.serve is not None):
+        parser.error("--profile covers the game and --simulate, not --table or --serve")
+
+    if args.stats:
+        hand_db = HandDatabase(args.stats)
+        print(hand_db.summary())
+        hand_db.close()
+        return
+
+    if args.read_history:
+        print(summarize_hand_histories(*args.read_history))
+        return
+
+    if args.replay:
+        matched, description = replay_game(args.replay)
+        print(description)
+        sys.exit(0 if matched else 1)
+
+    if args.serve is not None:
+        import asyncio
+
+        difficulty = "normal" if args.difficulty == "all" else args.difficulty
+        asyncio.run(serve_duels(port=args.serve, difficulty=difficulty, strength_model=args.strength_model))
+        return
+
+    if args.simulate and args.table:
+        print(simulate_table(args.simulate, args.table, args.strength_model, args.seed).summary())
+        return
+
+    if args.simulate:
+        difficulties = list(DIFFICULTY_STARTING_CHIPS) if args.difficulty == "all" else [args.difficulty]
+        report = run_tournament(args.simulate, difficulties, args.workers or None, args.seed or 0,
+                                strength_model=args.strength_model, database=args.analytics,
+                                history=args.history, profile=bool(args.profile))
+        print(report.summary())
+        if report.profile is not None:
+            report.profile.write(args.profile)
+            print(report.profile.summary())
+        return
+
+    import threading
+
+    # The title screen and menus hide it
+    threading.Thread(target=warm_up, daemon=True).start()
+    game = RoguelikePoker(args.seed)
+    game.replay_path = args.record
+    if args.analytics:
+        game.hand_db = HandDatabase(args.analytics)
+    if args.history:
+        # Every hand goes to disk as it ends
+        game.hand_history = HandHistoryWriter(args.history, buffer_size=0)
+    if args.advisor:
+        game.advisor = BettingAdvisor(time_budget=args.advisor / 1000)
+    profiler = HandProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.attach(game)
+    renderer.delay_scale = args.speed
     try:
-        game = RoguelikePoker()
         game.main_menu()
+    finally:
+        renderer.flush()
+        if game.action_log is not None and game.replay_path:
+            # A game cut short by Ctrl-C or a crash is the one most worth replaying
+            game.action_log.save(game.replay_path)
+        if profiler is not None:
+            profiler.detach()
+            profiler.write(args.profile)
+        if game.hand_db is not None:
+            game.hand_db.close()
+        if game.hand_history is not None:
+            game.hand_history.close()
+
+if __name__ == "__main__":
+    try:
+        main()
     except KeyboardInterrupt:
         print(f"\n{Colors.YELLOW}Game interrupted. Thanks for playing!{Colors.END}")
     except Exception as e:
@@ -0,0 +1,539 @@
+"""Tests for poker.py, run with `python -m pytest test_poker.py`."""
+import random
+
+import pytest
+
+import poker
+
+
+def test_compact_ignores_leftover_temp_file(tmp_path):
+    path = str(tmp_path / "runs.bin")
+    history = poker.RunHistory(path)
+    for level in range(5):
+        history.append({"level": level})
+    leftover = poker.RunHistory(path + ".tmp")
+    for _ in range(5):
+        leftover.append({"level": 9})
+
+    history.compact()
+    reloaded = poker.RunHistory(path)
+    assert (reloaded.runs, reloaded.high_score) == (5, 4)
+    assert [run["level"] for run in reloaded] == [0, 1, 2, 3, 4]
+
+    open(path + ".tmp", "wb").close()
+    history.compact()
+    assert [run["level"] for run in poker.RunHistory(path)] == [0, 1, 2, 3, 4]
+
+
+def test_corrupt_history_is_moved_aside(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "runs.bin")
+    with open(path, "wb") as f:
+        f.write(b"not a history")
+    monkeypatch.setattr(poker.RoguelikePoker, "history_path", path)
+    game = poker.RoguelikePoker(seed=1)
+    assert game.high_score == 0
+    assert (tmp_path / "runs.bin.corrupt").exists()
+
+
+def test_hand_evaluator_matches_poker_hand_on_every_five_card_hand():
+    assert poker.verify_hand_evaluator(seven_card_samples=2000) == 2598960 + 2000
+
+
+def test_batch_evaluator_matches_scalar_evaluators():
+    pytest.importorskip("numpy")
+    assert poker.verify_batch_evaluator(samples=20000) == 60000
+
+
+@pytest.mark.parametrize("size", [0, 8, 100, poker.PREFLOP_HEADER.size + 4 * 169 + 4])
+def test_preflop_table_of_wrong_length_is_missing(tmp_path, size):
+    path = str(tmp_path / "preflop.bin")
+    data = poker.PREFLOP_HEADER.pack(poker.PREFLOP_MAGIC, 1, 169, 1000) + bytes(4 * 170)
+    with open(path, "wb") as f:
+        f.write(data[:size])
+    assert not poker.PreflopTable(path).available()
+
+
+def test_preflop_table_round_trips(tmp_path):
+    path = str(tmp_path / "preflop.bin")
+    poker.PreflopTable.write(path, [index / 169 for index in range(169)], 1000)
+    table = poker.PreflopTable(path)
+    assert table.available()
+    index = poker.starting_hand_index(0, 13)
+    assert table.equity(0, 13) == pytest.approx(index / 169)
+
+
+def _uniform_strategy(buckets=3):
+    edges = [[(bucket + 1) / buckets for bucket in range(buckets - 1)] for _ in range(poker.STRATEGY_STREETS)]
+    strategies = [(0.2, 0.5, 0.3)] * (poker.STRATEGY_STREETS * buckets * len(poker.STRATEGY_BET_SIZES))
+    return edges, strategies
+
+
+def test_strategy_table_round_trips(tmp_path):
+    path = str(tmp_path / "strategy.bin")
+    poker.StrategyTable.write(path, *_uniform_strategy(), 10)
+    table = poker.StrategyTable(path)
+    assert table.available()
+    assert table.action(1, 0.5, pot=20, to_call=10, roll=0.1) == "fold"
+    assert table.action(1, 0.5, pot=20, to_call=10, roll=0.5) == "call"
+    assert table.action(1, 0.5, pot=20, to_call=10, roll=0.9) == "raise"
+
+
+@pytest.mark.parametrize("trim", [1, 4, -4])
+def test_strategy_table_of_wrong_length_is_missing(tmp_path, trim):
+    path = str(tmp_path / "strategy.bin")
+    poker.StrategyTable.write(path, *_uniform_strategy(), 10)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-trim] if trim > 0 else data + bytes(-trim))
+    assert not poker.StrategyTable(path).available()
+
+
+@pytest.mark.parametrize("size", [0, 8])
+def test_strategy_table_with_short_header_is_missing(tmp_path, size):
+    path = str(tmp_path / "strategy.bin")
+    with open(path, "wb") as f:
+        f.write(poker.STRATEGY_MAGIC.ljust(size, b"\0")[:size])
+    assert not poker.StrategyTable(path).available()
+
+
+def test_strategy_table_without_buckets_is_missing(tmp_path):
+    path = str(tmp_path / "strategy.bin")
+    with open(path, "wb") as f:
+        f.write(poker.STRATEGY_HEADER.pack(poker.STRATEGY_MAGIC, 1, poker.STRATEGY_STREETS, 0,
+                                           len(poker.STRATEGY_BET_SIZES), 10))
+    assert not poker.StrategyTable(path).available()
+
+
+def test_advisor_keeps_searching_the_same_spot(tmp_path, monkeypatch):
+    monkeypatch.setattr(poker.RoguelikePoker, "history_path", str(tmp_path / "runs.bin"))
+    game = poker.RoguelikePoker(seed=5)
+    enemy = game.create_enemy()
+    game._start_hand(enemy)
+    game.advisor = poker.BettingAdvisor(time_budget=5, max_samples=640)
+    game._start_advisor(enemy)
+    cancel = game.advisor._cancel
+    game._start_advisor(enemy)
+    assert game.advisor._cancel is cancel
+    advice = game.advisor.advice()
+    assert advice.complete and advice.samples == 640
+
+    game.player_chips += 25  # a Coin Pouch changes the spot
+    game._start_advisor(enemy)
+    assert cancel.is_set() and game.advisor._cancel is not cancel
+    game.advisor.stop()
+
+
+def test_terminal_betting_round_rejects_a_check_facing_a_bet(tmp_path, monkeypatch):
+    import io
+
+    monkeypatch.setattr(poker.RoguelikePoker, "history_path", str(tmp_path / "runs.bin"))
+    monkeypatch.setattr(poker.renderer, "delay_scale", 0)
+    monkeypatch.setattr(poker.renderer, "stream", io.StringIO())
+    answers = iter(["check", "call"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    game = poker.RoguelikePoker(seed=2)
+    enemy = game.create_enemy()
+    game._start_hand(enemy)
+    game.enemy_bet, game.player_bet, game.pot, game.player_chips = 20, 0, 20, 100
+
+    assert game.betting_round(enemy) is True
+    assert (game.player_chips, game.pot, game.player_bet) == (80, 40, 20)
+    assert "Choose one of call/raise/fold" in poker.renderer.stream.getvalue()
+
+
+def test_side_pots_with_all_ins_and_folded_contributors():
+    # Seats 0 and 1 are all in for 50 and 100, seat 4 folded after putting in 30
+    pots = poker.resolve_side_pots([50, 100, 200, 200, 30], [False, False, False, False, True])
+    assert pots == [(230, [0, 1, 2, 3]), (150, [1, 2, 3]), (200, [2, 3])]
+    # The short stack wins the main pot, seats 2 and 3 split the rest
+    assert poker.award_pots(pots, [9, 1, 5, 5, -1]) == [230, 0, 175, 175, 0]
+
+
+def test_side_pots_keep_dead_money_above_the_last_live_contribution():
+    # Seat 1 folded having put in more than seat 0's all in
+    pots = poker.resolve_side_pots([40, 100, 100], [False, True, False])
+    assert pots == [(120, [0, 2]), (120, [2])]
+    assert poker.award_pots(pots, [7, -1, 3]) == [120, 0, 120]
+
+
+def test_side_pots_return_an_uncalled_bet_and_folded_pots():
+    assert poker.resolve_side_pots([100, 300], [False, False]) == [(200, [0, 1]), (200, [1])]
+    assert poker.resolve_side_pots([10, 5, 0], [True, True, True]) == [(10, [0]), (5, [1])]
+
+
+def test_award_pots_gives_odd_chips_to_the_earliest_seats():
+    assert poker.award_pots([(101, [0, 1, 2])], [5, 5, 5]) == [34, 34, 33]
+    assert poker.award_pots([(30, [0, 1, 2]), (7, [1, 2])], [4, 6, 6]) == [0, 19, 18]
+
+
+def test_table_hands_conserve_chips_through_all_ins():
+    table = poker.PokerTable(seats=5, starting_chips=40, seed=11)
+    for _ in range(300):
+        assert sum(table.play_hand()) == 0
+        assert len(table.board) == 5 or table.live == 1
+    assert table.report.pot_counts.keys() - {1}
+
+
+def test_restored_snapshot_deals_and_decides_the_same():
+    game = poker.HeadlessPoker(seed=8)
+    enemy = game.create_enemy()
+    game._start_hand(enemy)
+    game.deal_flop()
+    state = game.snapshot(enemy)
+
+    def play_on():
+        game.deal_turn()
+        game.deal_river()
+        return bytes(game.community_cards), bytes(game.burned), enemy.decide_action(0.5, 40, 10, 3)
+
+    first = play_on()
+    game.restore(state, enemy)
+    assert play_on() == first
+    game.restore(state, enemy)
+    assert game.snapshot(enemy) == state
+
+
+class _ItemFirstPolicy(poker.EnemyAIPolicy):
+    """EnemyAIPolicy that uses every item as soon as it has one"""
+
+    def act(self, game, enemy, to_call):
+        for slot, item in enumerate(game.inventory):
+            if not item.used:
+                return "item", slot
+        return super().act(game, enemy, to_call)
+
+
+class _HistoryRecorder:
+    """Stands in for a HandHistoryWriter, keeping each hand's text next to the game state it came from"""
+
+    def __init__(self, game):
+        self.game = game
+        self.hands = []
+
+    def timestamp(self):
+        return "2026/01/01 00:00:00"
+
+    def write(self, text):
+        game = self.game
+        self.hands.append((text, list(game.player_hand), list(game.enemy_hand), list(game.community_cards),
+                           game.pot, list(game.hand_actions), game.showdown_outcome))
+
+
+def _moves(actions):
+    # The player's call of nothing is written as a check, and calls carry what they cost
+    return [(street, name, "call" if action == "check" and name == poker.HERO else action,
+             0 if action == "call" else amount) for street, name, action, amount in actions]
+
+
+def test_hand_histories_parse_back_to_the_hands_played():
+    streets = ("preflop", "flop", "turn", "river")
+    seen = set()
+    for seed in (*range(6), 43):  # 43 has an enemy short of chips for a bet
+        game = poker.HeadlessPoker(_ItemFirstPolicy(), difficulty="hard", max_hands_per_level=60, seed=seed)
+        game.hand_history = recorder = _HistoryRecorder(game)
+        game.play()
+        for text, hole, enemy_hole, board, pot, tokens, showdown in recorder.hands:
+            hand = poker.parse_hand_history(text.splitlines())
+            assert (hand.hole, hand.board, hand.pot) == (hole, board, pot)
+            assert sum(hand.collected.values()) == pot
+
+            expected, street = [], 0
+            for token in tokens:
+                if token == "/":
+                    street += 1
+                    continue
+                player, action = poker.LETTER_ACTIONS[token[0]]
+                amount = int(token[1:]) if len(token) > 1 else 0
+                expected.append((streets[street], poker.HERO if player else hand.enemy, action,
+                                 None if action == "item" else amount if action in ("bet", "raise") else 0))
+            assert _moves(hand.actions) == _moves(expected)
+            seen.update(action for _, _, action, _ in expected)
+
+            if showdown is not None:
+                assert hand.shown == {poker.HERO: hole, hand.enemy: enemy_hole}
+                seen.add(showdown)
+                if showdown == "tie":
+                    assert sorted(hand.collected.values()) == sorted([pot // 2, pot - pot // 2])
+    assert {"item", "short", "tie", "raise"} <= seen
+
+
+@pytest.mark.parametrize("iterations", [1, 63, 300, 600])
+def test_equity_rollouts_stop_at_the_requested_iterations(iterations):
+    engine = poker.EquityEngine(iterations=iterations, time_budget=None, rng=random.Random(4))
+    assert engine.equity([0, 13], [5, 20, 33]).samples == iterations
+
+
+@pytest.mark.parametrize("cards, name", [(("Th", "Td"), "TT"), (("Th", "9h"), "T9s"), (("Jc", "Td"), "JTo"),
+                                         (("Kh", "Qh"), "KQs"), (("2s", "2d"), "22")])
+def test_starting_hand_names_use_one_letter_per_rank(cards, name):
+    index = poker.starting_hand_index(*(poker.CARD_FROM_CODE[code] for code in cards))
+    assert poker.starting_hand_name(index) == name
+
+
+def test_interrupted_game_is_recorded_and_replays(tmp_path, monkeypatch):
+    import io
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(poker.renderer, "stream", io.StringIO())
+    actions = iter(["bet", "call", "check", "bet", "call", "check", "call", "check"])
+
+    def answer(prompt=""):
+        if "option" in prompt:
+            return "1"
+        if "difficulty" in prompt:
+            return "2"
+        if "Amount" in prompt:
+            return "10"
+        if "Action" in prompt:
+            try:
+                return next(actions)
+            except StopIteration:
+                raise KeyboardInterrupt from None
+        return ""
+
+    monkeypatch.setattr("builtins.input", answer)
+    path = str(tmp_path / "game.pkrl")
+    monkeypatch.setattr("sys.argv", ["poker.py", "--seed", "7", "--speed", "0", "--record", path])
+    with pytest.raises(KeyboardInterrupt):
+        poker.main()
+
+    recorded = poker.ActionLog.load(path)
+    assert recorded.outcome() is None and recorded.player_actions()
+    matched, description = poker.replay_game(path)
+    assert matched, description
+
+
+def _brute_force_equity(hole, board):
+    """Win, tie and loss shares over every runout and opponent holding, scored one hand at a time"""
+    from itertools import combinations
+
+    unseen = [card for card in range(52) if card not in hole and card not in board]
+    counts = [0, 0, 0]
+    for runout in combinations(unseen, 5 - len(board)):
+        full = [*board, *runout]
+        hero = poker.hand_evaluator.score([*hole, *full])
+        for villain_hole in combinations([card for card in unseen if card not in runout], 2):
+            villain = poker.hand_evaluator.score([*villain_hole, *full])
+            counts[0 if hero > villain else 1 if hero == villain else 2] += 1
+    total = sum(counts)
+    return [count / total for count in counts]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_exact_river_equity_matches_brute_force(seed):
+    cards = random.Random(seed).sample(range(52), 7)
+    result = poker.EquityEngine().equity(cards[:2], cards[2:])
+    assert result.mode == "exact"
+    assert [result.win, result.tie, result.loss] == pytest.approx(_brute_force_equity(cards[:2], cards[2:]))
+
+
+def test_exact_turn_equity_matches_brute_force():
+    cards = random.Random(11).sample(range(52), 6)
+    result = poker.EquityEngine().equity(cards[:2], cards[2:], exact=True)
+    assert result.mode == "exact"
+    assert [result.win, result.tie, result.loss] == pytest.approx(_brute_force_equity(cards[:2], cards[2:]))
+
+
+def test_exact_equity_is_one_opponent_only():
+    with pytest.raises(ValueError):
+        poker.EquityEngine().equity([0, 1], [2, 3, 4, 5, 6], opponents=2, exact=True)
+
+
+def test_exact_river_equity_splits_a_board_nobody_can_beat():
+    # Quads with a king kicker; kings are the top rank, aces the bottom
+    board = [poker.CARD_FROM_CODE[code] for code in ("9h", "9d", "9c", "9s", "Ks")]
+    result = poker.EquityEngine().equity([poker.CARD_FROM_CODE["2h"], poker.CARD_FROM_CODE["3d"]], board)
+    assert (result.mode, result.tie) == ("exact", 1.0)
+
+
+def test_hand_range_weights_follow_the_observed_actions():
+    board = [poker.CARD_FROM_CODE[code] for code in ("2h", "7d", "Jc")]
+    hand_range = poker.HandRange()
+    hand_range.observe("fold", board)  # says nothing about the range
+    hand_range.update()
+    assert hand_range.weights is None
+
+    hand_range.observe("bet", board, amount=20, pot=60)  # a bet of half the pot before it
+    hand_range.observe("call", board)
+    hand_range.update()
+    percentiles = hand_range.percentiles(board)
+    bet, call = poker.RANGE_ACTION_LIKELIHOODS["bet"], poker.RANGE_ACTION_LIKELIHOODS["call"]
+    expected = [bet(p, 0.5) * call(p, 0) for p in percentiles]
+    assert list(hand_range.weights) == pytest.approx(expected)
+    strongest, weakest = percentiles.index(max(percentiles)), percentiles.index(min(percentiles))
+    assert hand_range.weights[strongest] > hand_range.weights[weakest]
+
+    hand_range.reset()
+    assert hand_range.weights is None and not hand_range.pending
+
+
+def test_hand_range_narrowed_by_bets_lowers_a_medium_hands_equity():
+    board = [poker.CARD_FROM_CODE[code] for code in ("2h", "7d", "Jc", "4s", "9h")]
+    hole = [poker.CARD_FROM_CODE["Jh"], poker.CARD_FROM_CODE["5c"]]  # top pair, weak kicker
+    uniform = poker.HandRange().equity(hole, board)
+    narrowed = poker.HandRange()
+    for street in (3, 4, 5):
+        narrowed.observe("bet", board[:street], amount=60, pot=80)
+    betting = narrowed.equity(hole, board)
+    assert uniform.mode == betting.mode == "exact"
+    assert betting.equity < uniform.equity
+
+
+def test_table_tier_seat_bets_a_full_house_when_checked_to():
+    assert poker.strategy_table.available()
+    table = poker.PokerTable(seats=2, levels=[9, 1], strength_model="equity", seed=5)
+    dragon = table.enemies[0]
+    assert dragon.strategy is poker.strategy_table
+    table.holes[0][:] = poker.array("B", [poker.CARD_FROM_CODE["9h"], poker.CARD_FROM_CODE["9d"]])
+    table.holes[1][:] = poker.array("B", [poker.CARD_FROM_CODE["Kc"], poker.CARD_FROM_CODE["2s"]])
+    table.board[:] = poker.array("B", [poker.CARD_FROM_CODE[code] for code in ("9c", "4s", "4d")])
+    table.strengths = {}
+
+    bets = 0
+    for _ in range(200):
+        strength = table._strength(0, 1, 0)
+        bets += dragon.decide_action(strength, 20, 0, poker.street_index(table.board)) == "raise"
+    assert strength > 0.8
+    assert bets > 100
+
+
+def _hand_indexes(db):
+    return {name for (name,) in db.connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'hands'")}
+
+
+def test_bulk_hand_database_drops_indexes_while_writing_and_rebuilds_them_for_queries(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    indexes = {"hands_by_level", "hands_by_player_rank"}
+    db = poker.HandDatabase(path, batch_size=3, bulk=True)
+    assert _hand_indexes(db) == indexes
+    first, second = db.start_run(1, "normal", "heuristic"), db.start_run(2, "hard", "equity")
+    db.add_hand((first, 1, 1, 1, 7, 2, 40, "c"))
+    db.add_hand((first, 2, 1, 0, None, None, 20, "f"))
+    assert _hand_indexes(db) == indexes
+    db.add_hand((first, 3, 2, 1, 2, 1, 60, "c/c"))  # fills the batch
+    assert _hand_indexes(db) == set()
+    assert db.connection.execute("SELECT COUNT(*) FROM hands").fetchone() == (3,)
+    db.add_hand((second, 1, 5, 0, 2, 3, 80, "b20c"))
+    db.finish_run(first, "lost", 2, 0)
+    db.finish_run(second, "won", 5, 500)
+
+    assert db.win_rate_by_level() == [(1, 2, 0.5), (2, 1, 1.0), (5, 1, 0.0)]
+    assert _hand_indexes(db) == indexes
+    by_enemy = db.win_rate_by_enemy()
+    assert [enemy for enemy, _, _ in by_enemy] == list(dict.fromkeys(
+        poker.enemy_type_for_level(level) for level in (1, 2, 5)))
+    assert sum(hands for _, hands, _ in by_enemy) == 4
+    assert db.hand_rank_frequency() == [("PAIR", 2, 2 / 3), ("FULL_HOUSE", 1, 1 / 3)]
+    assert db.hand_rank_frequency(enemy=True) == [("HIGH_CARD", 1, 1 / 3), ("PAIR", 1, 1 / 3),
+                                                  ("TWO_PAIR", 1, 1 / 3)]
+    assert sorted(db.run_outcomes()) == [("lost", 1, 2.0), ("won", 1, 5.0)]
+
+    # Writing again drops them again, and close() puts them back
+    third = db.start_run(3, "easy", "heuristic")
+    for hand in range(1, 4):
+        db.add_hand((third, hand, 1, 1, None, None, 10, "c"))
+    assert _hand_indexes(db) == set()
+    db.close()
+    db = poker.HandDatabase(path)
+    assert _hand_indexes(db) == indexes
+    assert db.connection.execute("SELECT COUNT(*) FROM hands").fetchone() == (7,)
+    assert "Level  Hands" in db.summary()
+    db.close()
+
+
+def test_hand_database_keeps_its_indexes_unless_bulk(tmp_path):
+    db = poker.HandDatabase(str(tmp_path / "analytics.db"), batch_size=1)
+    run = db.start_run(1, "normal", "heuristic")
+    db.add_hand((run, 1, 1, 1, 2, 1, 40, "c"))
+    assert _hand_indexes(db) == {"hands_by_level", "hands_by_player_rank"}
+    assert db.win_rate_by_level() == [(1, 1, 1.0)]
+    db.close()
+
+
+def test_deck_stays_a_permutation_across_resets_and_deals():
+    rng = random.Random(19)
+    deck = poker.Deck(random.Random(7))
+    for _ in range(500):
+        deck.reset()
+        assert len(deck) == 52
+        dealt = []
+        for count in (rng.randrange(1, 6) for _ in range(rng.randrange(1, 12))):
+            before = len(deck)
+            target = poker.array("B") if rng.random() < 0.5 else []
+            deck.deal_into(target, count)
+            assert len(target) == before - len(deck) == min(count, before)
+            dealt += target
+        assert len(set(dealt)) == len(dealt)
+        # Dealt cards are the tail of the buffer, last dealt lowest
+        assert list(deck.cards[len(deck):]) == dealt[::-1]
+        assert sorted(deck.cards) == list(range(52))
+    deck.reset()
+    assert sorted(deck.draw(60)) == list(range(52))
+    assert len(deck) == 0 and len(deck.draw()) == 0
+
+
+def test_deck_deals_every_card_first_about_equally_often():
+    deck = poker.Deck(random.Random(3))
+    counts = [0] * 52
+    for _ in range(52 * 200):
+        deck.reset()
+        counts[deck.draw()[0]] += 1
+    assert 130 < min(counts) and max(counts) < 270
+
+
+def _policy_answer(session):
+    game = session.game
+    return game.policy.act(game, game.enemy, session.request[1])
+
+
+def test_duel_session_plays_a_run_one_request_at_a_time():
+    session = poker.DuelSession(poker.HeadlessPoker(difficulty="easy", seed=6))
+    events = session.start()
+    assert events[0][0] == "hand" and events[-1] is session.request
+    assert session.request[0] == "act" and not session.finished
+    with pytest.raises(ValueError):
+        session.continue_run(True)
+    while session.request[0] == "act":
+        events = session.act(*_policy_answer(session))
+        assert events[-1] is session.request
+    assert [event[0] for event in events[-2:]] == ["level_up", "continue"]
+    assert session.request == ("continue", 2)
+    with pytest.raises(ValueError):
+        session.act("call")
+
+    events = session.continue_run(False)
+    assert events == [("run_over", "quit", 2, session.game.player_chips)]
+    assert session.finished
+    with pytest.raises(ValueError):
+        session.act("call")
+    with pytest.raises(ValueError):
+        session.continue_run(True)
+
+
+def test_duel_session_rejects_actions_the_spot_does_not_allow():
+    session = poker.DuelSession(poker.HeadlessPoker(seed=4))
+    session.start()
+    game = session.game
+    assert session.request == ("act", 0, 0, 100)
+    request, state = session.request, game.snapshot(game.enemy)
+    for action, amount in [("bet", 0), ("bet", -5), ("bet", 101), ("raise", 500), ("shove", 0), ("item", 0)]:
+        with pytest.raises(ValueError):
+            session.act(action, amount)
+        assert session.request is request and game.snapshot(game.enemy) == state
+    session.act("bet", 100)  # all in is allowed
+
+    session = poker.DuelSession(poker.HeadlessPoker(seed=0))
+    session.start()
+    while session.request[0] == "act" and session.request[1] <= 0:
+        session.act(*_policy_answer(session))
+    _, to_call, _, chips = session.request
+    assert 0 < to_call < chips
+    state = session.game.snapshot(session.game.enemy)
+    for action, amount in [("check", 0), ("raise", chips - to_call + 1)]:
+        with pytest.raises(ValueError):
+            session.act(action, amount)
+    assert session.game.snapshot(session.game.enemy) == state
+    session.act("raise", chips - to_call)
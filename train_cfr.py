@@ -0,0 +1,191 @@
+"""Train poker_data/cfr_strategy.bin, the strategy table Dragon and Lich enemies play from.
+
+Runs external-sampling Monte Carlo CFR over an abstracted heads-up version
+of the duel in poker.py. Each player's cards are reduced to a bucket of
+strategy_strength per street. The player opens every street by checking or betting
+one of STRATEGY_BET_SIZES times the pot. The enemy answers a bet by
+folding, calling or raising to twice the bet (as _enemy_decision does),
+and the player then calls or folds. Training runs in rounds: workers in a
+process pool each play a seeded batch of iterations against the current
+regrets, and their regret and strategy changes are summed.
+
+    python train_cfr.py --iterations 100000 --workers 4
+"""
+import argparse
+import os
+import random
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+from poker import (STRATEGY_ACTIONS, STRATEGY_BET_SIZES, STRATEGY_STREETS, STRATEGY_TABLE_PATH,
+                   StrategyTable, hand_evaluator, strategy_strength)
+
+STRIDE = 4  # regret slots per infoset: the player's opening node has the most actions
+OPEN_ACTIONS = 1 + len(STRATEGY_BET_SIZES)  # check, then each bet size
+STARTING_POT = 2.0
+
+def deal_strengths(rng):
+    """strategy_strength of both hands on every street, and who wins the showdown (1, 0 or -1)"""
+    cards = rng.sample(range(52), 9)
+    holes, board = (cards[0:2], cards[2:4]), cards[4:]
+    strengths = [[strategy_strength(hole, board[:shown]) for shown in (0, 3, 4, 5)] for hole in holes]
+    # River strengths are the final hand scores
+    player, enemy = strengths[0][-1], strengths[1][-1]
+    return strengths, (player > enemy) - (player < enemy)
+
+def bucket_edges(buckets, samples, seed):
+    """Per-street strength quantiles splitting random hands into equal buckets"""
+    rng = random.Random(seed)
+    by_street = [[] for _ in range(STRATEGY_STREETS)]
+    for _ in range(samples):
+        strengths, _ = deal_strengths(rng)
+        for street in range(STRATEGY_STREETS):
+            by_street[street].append(strengths[0][street])
+    edges = []
+    for values in by_street:
+        values.sort()
+        edges.append([values[len(values) * bucket // buckets] for bucket in range(1, buckets)])
+    return edges
+
+class AbstractGame:
+    """Infoset layout and one external-sampling CFR traversal of the abstract duel"""
+
+    def __init__(self, edges, regrets, rng):
+        self.edges = edges
+        self.buckets = len(edges[0]) + 1
+        self.regrets = regrets
+        self.strategy_sums = [0.0] * len(regrets)
+        self.rng = rng
+        self.iteration = 1  # later iterations weigh more in the average strategy, as in CFR+
+
+    @staticmethod
+    def size(buckets):
+        sizes = len(STRATEGY_BET_SIZES)
+        return STRIDE * STRATEGY_STREETS * buckets * (1 + sizes + sizes)
+
+    def _player_infoset(self, street, bucket, node):
+        # node 0 opens the street, 1 + size faces a raise of that bet size
+        return ((street * self.buckets + bucket) * (1 + len(STRATEGY_BET_SIZES)) + node) * STRIDE
+
+    def enemy_infoset(self, street, bucket, size):
+        base = STRATEGY_STREETS * self.buckets * (1 + len(STRATEGY_BET_SIZES))
+        return (base + (street * self.buckets + bucket) * len(STRATEGY_BET_SIZES) + size) * STRIDE
+
+    def _strategy(self, infoset, actions):
+        positive = [max(self.regrets[infoset + a], 0.0) for a in range(actions)]
+        total = sum(positive)
+        return [p / total for p in positive] if total > 0 else [1.0 / actions] * actions
+
+    def _node(self, infoset, actions, player, value_of):
+        """Traverser's nodes try every action and update regrets; the other side samples one"""
+        strategy = self._strategy(infoset, actions)
+        if player != self.traverser:
+            for a, p in enumerate(strategy):
+                self.strategy_sums[infoset + a] += p * self.iteration
+            return value_of(self.rng.choices(range(actions), strategy)[0])
+        values = [value_of(a) for a in range(actions)]
+        node_value = sum(p * v for p, v in zip(strategy, values))
+        sign = 1 if player == 0 else -1
+        for a in range(actions):
+            # Regret-matching+: negative regrets are dropped as they happen
+            self.regrets[infoset + a] = max(self.regrets[infoset + a] + sign * (values[a] - node_value), 0.0)
+        return node_value
+
+    def _street(self, street, pot):
+        """Player's payoff from the start of a street, pot split evenly so far"""
+        if street == STRATEGY_STREETS:
+            return self.winner * pot / 2
+
+        def open_value(action):
+            if action == 0:
+                return self._street(street + 1, pot)
+            return self._facing_bet(street, pot, action - 1)
+
+        infoset = self._player_infoset(street, self.player_buckets[street], 0)
+        return self._node(infoset, OPEN_ACTIONS, 0, open_value)
+
+    def _facing_bet(self, street, pot, size):
+        bet = STRATEGY_BET_SIZES[size] * pot
+
+        def enemy_value(action):
+            if action == 0:  # fold
+                return pot / 2
+            if action == 1:  # call
+                return self._street(street + 1, pot + 2 * bet)
+            infoset = self._player_infoset(street, self.player_buckets[street], 1 + size)
+            # raise: the enemy puts in twice the bet and the player folds or calls the difference
+            return self._node(infoset, 2, 0, lambda call: (self._street(street + 1, pot + 4 * bet) if call
+                                                           else -(pot / 2 + bet)))
+
+        infoset = self.enemy_infoset(street, self.enemy_buckets[street], size)
+        return self._node(infoset, len(STRATEGY_ACTIONS), 1, enemy_value)
+
+    def iterate(self):
+        """One dealt hand, traversed once for each player"""
+        strengths, self.winner = deal_strengths(self.rng)
+        self.player_buckets, self.enemy_buckets = (
+            [bisect_left(self.edges[street], strength[street]) for street in range(STRATEGY_STREETS)]
+            for strength in strengths)
+        for self.traverser in (0, 1):
+            self._street(0, STARTING_POT)
+        self.iteration += 1
+
+def _train_batch(task):
+    """Worker entry point: a seeded batch of iterations from the current regrets"""
+    edges, regrets, first_iteration, iterations, seed = task
+    game = AbstractGame(edges, list(regrets), random.Random(seed))
+    game.iteration = first_iteration
+    for _ in range(iterations):
+        game.iterate()
+    return [after - before for after, before in zip(game.regrets, regrets)], game.strategy_sums
+
+def train(iterations, workers, rounds, buckets, seed):
+    """Returns bucket edges and the enemy's average (fold, call, raise) per infoset"""
+    edges = bucket_edges(buckets, 20000, seed)
+    size = AbstractGame.size(buckets)
+    regrets, strategy_sums = [0.0] * size, [0.0] * size
+    per_round = max(iterations // rounds, 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=hand_evaluator.precompute) as pool:
+        for round_number in range(rounds):
+            share, extra = divmod(per_round, workers)
+            tasks = [(edges, regrets, round_number * share + 1, share + (worker < extra),
+                      random.Random(f"{seed}:{round_number}:{worker}").getrandbits(64)) for worker in range(workers)]
+            for regret_delta, batch_sums in pool.map(_train_batch, tasks):
+                regrets = [max(r + d, 0.0) for r, d in zip(regrets, regret_delta)]
+                strategy_sums = [s + b for s, b in zip(strategy_sums, batch_sums)]
+
+    layout = AbstractGame(edges, regrets, None)
+    strategies = []
+    for street in range(STRATEGY_STREETS):
+        for bucket in range(buckets):
+            for bet_size in range(len(STRATEGY_BET_SIZES)):
+                infoset = layout.enemy_infoset(street, bucket, bet_size)
+                sums = strategy_sums[infoset:infoset + len(STRATEGY_ACTIONS)]
+                total = sum(sums)
+                strategies.append(tuple(s / total for s in sums) if total > 0 else (0.0, 1.0, 0.0))
+    return edges, strategies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000, help="dealt hands to train on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--rounds", type=int, default=20, help="times worker results are merged")
+    parser.add_argument("--buckets", type=int, default=8, help="strength buckets per street")
+    parser.add_argument("--seed", type=int, default=9)
+    parser.add_argument("--output", default=STRATEGY_TABLE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    edges, strategies = train(args.iterations, args.workers, args.rounds, args.buckets, args.seed)
+    StrategyTable.write(args.output, edges, strategies, args.iterations)
+
+    print(f"Wrote {args.output} in {time.perf_counter() - start:.1f}s")
+    sizes = len(STRATEGY_BET_SIZES)
+    for street, name in enumerate(("Preflop", "Flop", "Turn", "River")):
+        # Answers to a pot-sized bet, weakest bucket to strongest
+        row = strategies[street * args.buckets * sizes + 1::sizes][:args.buckets]
+        print(f"{name:<8}" + " ".join(f"{fold:.2f}/{raise_:.2f}" for fold, _, raise_ in row))
+
+if __name__ == "__main__":
+    main()